@@ -15,16 +15,18 @@ from pathlib import Path
 import yaml
 from charmed_kubeflow_chisme.exceptions import ErrorWithStatus, GenericCharmRuntimeError
 from charmed_kubeflow_chisme.kubernetes import KubernetesResourceHandler as KRH  # noqa N813
-from charmed_kubeflow_chisme.lightkube.batch import delete_many
 from lightkube import Client
 from lightkube.core.exceptions import ApiError
-from lightkube.resources.apiextensions_v1 import CustomResourceDefinition
 from ops import main
 from ops.charm import CharmBase
 from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
 
+from crd_readiness import CRDReadiness
+from hook_timing import HookTimings
 from image_management import parse_image_config, remove_empty_images, update_images
 from lightkube_custom_resources.operator import KnativeEventing_v1beta1  # noqa F401
+from reconcile_state import AppliedManifests, ReconcileGeneration, manifests_digest
+from teardown import delete_resources, resources_to_delete
 
 logger = logging.getLogger(__name__)
 
@@ -45,24 +47,54 @@ class KnativeEventingCharm(CharmBase):
 
         self._app_name = self.app.name
         self._namespace = self.model.name
+        self._lightkube_client = None
         self._resource_handler = None
+        self._hook_timings = HookTimings(self, "hook-timings")
+        self._applied_manifests = AppliedManifests(self, "applied-manifests")
+        self._reconcile_generation = ReconcileGeneration(self, "reconcile-generation")
+        self._crd_readiness = CRDReadiness(
+            self,
+            "crd-readiness",
+            "knativeeventings.operator.knative.dev",
+            lambda: self.lightkube_client,
+        )
 
         self.framework.observe(self.on.install, self._main)
         self.framework.observe(self.on.config_changed, self._main)
+        self.framework.observe(self._crd_readiness.on.crd_created, self._main)
         self.framework.observe(
             self.on["otel-collector"].relation_changed, self._on_otel_collector_relation_changed
         )
         self.framework.observe(self.on.remove, self._on_remove)
+        self.framework.observe(self.on.get_hook_timings_action, self._on_get_hook_timings)
+
+    def _apply_and_set_status(self, digest: str):
+        """Applies the manifests, unless those of `digest` were applied within the interval.
+
+        _main only gets here with unchanged manifests while the charm is not Active yet (eg: on
+        update-status, while waiting for a rollout), where they are not applied again.
 
-    def _apply_and_set_status(self):
+        Args:
+            digest: the digest of the manifests, computed once by _main as its fingerprint.
+        """
         try:
+            if self._applied_manifests.is_up_to_date(digest):
+                logger.info("Manifests are unchanged since they were last applied, skipping")
+                self.unit.status = ActiveStatus()
+                return
             self.unit.status = MaintenanceStatus("Configuring/deploying resources")
-            self.resource_handler.apply()
+            with self._hook_timings.phase("render"):
+                resources = self.resource_handler.render_manifests(force_recompute=False)
+            self._applied_manifests.add_to_inventory(resources)
+            with self._hook_timings.phase("apply"):
+                self.resource_handler.apply()
         except ApiError as e:
+            self._applied_manifests.reset()
             logger.debug(traceback.format_exc())
             logger.error(f"Applying resources failed with ApiError status code {e.status.code}")
             self.unit.status = BlockedStatus(f"ApiError: {e.status.code}")
         except ErrorWithStatus as e:
+            self._applied_manifests.reset()
             logger.error(e.msg)
             self.unit.status = e.status
         else:
@@ -70,6 +102,7 @@ class KnativeEventingCharm(CharmBase):
             # let's use the compute_status() method to set (or not)
             # an active status
             self.unit.status = ActiveStatus()
+            self._applied_manifests.record(digest)
 
     def _get_custom_images(self):
         """Parses custom_images from config and defaults, returning a dict of images."""
@@ -92,36 +125,66 @@ class KnativeEventingCharm(CharmBase):
         return custom_images
 
     def _main(self, event):
-        # Check the KnativeServing CRD is present; otherwise defer
-        lightkube_client = Client()
         try:
-            lightkube_client.get(CustomResourceDefinition, "knativeeventings.operator.knative.dev")
-            self._apply_and_set_status()
-        except ApiError as e:
-            if e.status.code == 404:
+            # Events for a desired state already reconciled in this generation are coalesced
+            fingerprint = manifests_digest(
+                self.resource_handler.template_files, self.resource_handler.context
+            )
+            if self._reconcile_generation.is_reconciled(fingerprint):
+                logger.info(
+                    "Desired state already reconciled in generation "
+                    f"{self._reconcile_generation.generation}, skipping full reconcile"
+                )
+                return
+
+            # The KnativeEventing CRD is created by the knative-operator, if it is missing the
+            # charm is reconciled again once it is created
+            with self._hook_timings.phase("crd-check"):
+                crd_created = self._crd_readiness.wait()
+            if not crd_created:
                 self.model.unit.status = WaitingStatus(
-                    "Waiting for knative-operator CRDs to be present."
+                    "Waiting for knative-operator CRDs, checked again on update-status"
                 )
-                event.defer()
-            else:
-                raise GenericCharmRuntimeError(
-                    f"Lightkube get CRD failed with error code: {e.status.code}"
-                ) from e
+                return
+            self._apply_and_set_status(fingerprint)
+            if isinstance(self.unit.status, ActiveStatus):
+                self._reconcile_generation.record(fingerprint)
+        except ErrorWithStatus as e:
+            logger.error(e.msg)
+            self.unit.status = e.status
+        except ApiError as e:
+            raise GenericCharmRuntimeError(
+                f"Lightkube get CRD failed with error code: {e.status.code}"
+            ) from e
 
-    def _on_otel_collector_relation_changed(self, _):
+    def _on_otel_collector_relation_changed(self, event):
         """Event handler for on['otel-collector'].relation_changed."""
-        self._apply_and_set_status()
+        self._main(event)
+
+    def _on_get_hook_timings(self, event):
+        """Event handler for the get-hook-timings action."""
+        event.set_results({"hooks": json.dumps(self._hook_timings.hooks, indent=2)})
 
     def _on_remove(self, _):
         self.unit.status = MaintenanceStatus("Removing k8s resources")
-        manifests = self.resource_handler.render_manifests()
+        with self._hook_timings.phase("render"):
+            resources = resources_to_delete(self._applied_manifests, lambda: self.resource_handler)
         try:
-            delete_many(self.resource_handler.lightkube_client, manifests)
+            with self._hook_timings.phase("delete"):
+                delete_resources(
+                    self.lightkube_client,
+                    resources,
+                    propagation_policy=self.model.config["delete-propagation-policy"],
+                    on_progress=self._on_remove_progress,
+                )
         except ApiError as e:
-            logger.warning(f"Failed to delete resources: {manifests} with: {e}")
+            logger.warning(f"Failed to delete resources: {resources} with: {e}")
             raise e
         self.unit.status = MaintenanceStatus("K8s resources removed")
 
+    def _on_remove_progress(self, processed: int, total: int):
+        self.unit.status = MaintenanceStatus(f"Removing k8s resources ({processed}/{total})")
+
     @property
     def _otel_collector_relation_data(self):
         """Returns relation data from the otel-collector relation."""
@@ -152,6 +215,19 @@ class KnativeEventingCharm(CharmBase):
             context.update(self._otel_collector_relation_data)
         return context
 
+    @property
+    def lightkube_client(self) -> Client:
+        """Returns the lightkube Client shared by every Kubernetes operation in this hook.
+
+        Sharing one client means the in-cluster config is loaded once and every request reuses
+        the same keep-alive connection pool.
+        """
+        if not self._lightkube_client:
+            self._lightkube_client = self._hook_timings.count_api_calls(
+                Client(field_manager=self._namespace)
+            )
+        return self._lightkube_client
+
     @property
     def resource_handler(self):
         """Returns an instance of KubernetesResourceHandler."""
@@ -160,6 +236,7 @@ class KnativeEventingCharm(CharmBase):
                 template_files=self._template_files,
                 context=self._context,
                 field_manager=self._namespace,
+                lightkube_client=self.lightkube_client,
             )
         return self._resource_handler
 
@@ -0,0 +1,138 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Waiting for a CustomResourceDefinition to be created, without deferring events."""
+
+import logging
+import threading
+from typing import Callable, Optional
+
+from lightkube import Client
+from lightkube.core.exceptions import ApiError
+from lightkube.resources.apiextensions_v1 import CustomResourceDefinition
+from ops.charm import CharmBase
+from ops.framework import EventBase, EventSource, Object, ObjectEvents, StoredState
+
+logger = logging.getLogger(__name__)
+
+# How long a hook watches for a missing CRD before leaving it to update-status, kept short so
+# that a burst of hooks does not stall on each of them
+CRD_WAIT_TIMEOUT = 2
+
+
+class CRDCreatedEvent(EventBase):
+    """Emitted once a CRD that the charm was waiting for has been created."""
+
+
+class CRDReadinessEvents(ObjectEvents):
+    """Events emitted by CRDReadiness."""
+
+    crd_created = EventSource(CRDCreatedEvent)
+
+
+class CRDReadiness(Object):
+    """Waits for a CRD to be created, emitting `crd_created` when it appears later on.
+
+    Rather than deferring events until the CRD exists, which re-runs them on every later hook,
+    a missing CRD is watched for a short while.  If it is still missing, the charm records that
+    it is waiting for it and update-status checks for the CRD, emitting `crd_created` once it is
+    there so the charm reconciles only when it can actually succeed.
+    """
+
+    on = CRDReadinessEvents()
+    _stored = StoredState()
+
+    def __init__(
+        self,
+        charm: CharmBase,
+        key: str,
+        crd_name: str,
+        client: Callable[[], Client],
+        timeout: float = CRD_WAIT_TIMEOUT,
+    ):
+        super().__init__(charm, key)
+        self._crd_name = crd_name
+        self._client = client
+        self._timeout = timeout
+        self._stored.set_default(waiting=False)
+        self.framework.observe(charm.on.update_status, self._on_update_status)
+
+    @property
+    def waiting(self) -> bool:
+        """Returns True if the CRD was missing the last time it was looked for."""
+        return self._stored.waiting
+
+    def wait(self) -> bool:
+        """Returns True once the CRD exists, watching for it for a while if it does not yet.
+
+        Raises:
+            ApiError: if looking for the CRD fails for any reason other than it being missing.
+        """
+        created = self._exists() or wait_for_crd(self._client(), self._crd_name, self._timeout)
+        self._stored.waiting = not created
+        if not created:
+            logger.info(f"CRD {self._crd_name} not found, checking again on update-status")
+        return created
+
+    def _exists(self) -> bool:
+        try:
+            self._client().get(CustomResourceDefinition, self._crd_name)
+        except ApiError as e:
+            if e.status.code == 404:
+                return False
+            raise
+        return True
+
+    def _on_update_status(self, _) -> None:
+        if not self.waiting:
+            return
+        try:
+            created = self._exists()
+        except ApiError as e:
+            logger.warning(f"Failed to look for CRD {self._crd_name}: {e.status.code}")
+            return
+        if created:
+            logger.info(f"CRD {self._crd_name} was created")
+            self._stored.waiting = False
+            self.on.crd_created.emit()
+
+
+def wait_for_crd(client: Client, name: str, timeout: float = CRD_WAIT_TIMEOUT) -> bool:
+    """Watches for the CRD `name` to be created, returning False if it is not within timeout.
+
+    Raises:
+        ApiError: if the watch fails.
+    """
+    watch = _CRDWatch(client, name)
+    watch.start()
+    if not watch.done.wait(timeout):
+        return False
+    if watch.error is not None:
+        raise watch.error
+    return watch.created
+
+
+class _CRDWatch(threading.Thread):
+    """Watches a single CRD by name, setting `done` once it exists or the watch ends."""
+
+    def __init__(self, client: Client, name: str):
+        # Daemon threads do not keep the hook alive if we stop waiting on a timeout
+        super().__init__(daemon=True)
+        self.done = threading.Event()
+        self.created = False
+        self.error: Optional[Exception] = None
+        self._client = client
+        self._name = name
+
+    def run(self):
+        try:
+            for event_type, _ in self._client.watch(
+                CustomResourceDefinition, fields={"metadata.name": self._name}
+            ):
+                if event_type in ("ADDED", "MODIFIED"):
+                    self.created = True
+                    return
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
@@ -0,0 +1,106 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Lightweight per-hook timing of the phases of a charm's reconcile loop."""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import List
+
+import httpx
+from lightkube import Client
+from ops.framework import Object, StoredState
+
+logger = logging.getLogger(__name__)
+
+# Number of past hooks whose timings are kept in stored state
+HOOK_TIMINGS_HISTORY = 10
+
+
+class HookTimings(Object):
+    """Records how long each phase of a hook takes and how many Kubernetes API calls it makes.
+
+    Phases are timed with the `phase` context manager and API calls are counted on the clients
+    passed to `count_api_calls`.  Each phase is written to the debug log as it completes, and
+    when the hook is committed a summary of the hook is kept in stored state (for the last
+    `history` hooks that timed at least one phase) to be returned by the `get-hook-timings`
+    action.
+    """
+
+    _stored = StoredState()
+
+    def __init__(self, parent: Object, key: str, history: int = HOOK_TIMINGS_HISTORY):
+        super().__init__(parent, key)
+        self._history = history
+        self._stored.set_default(hooks="[]")
+        self._started_at = time.monotonic()
+        self._phases = []
+        self._api_calls = 0
+        self._lock = threading.Lock()
+        self.framework.observe(self.framework.on.pre_commit, self._on_pre_commit)
+
+    @property
+    def api_calls(self) -> int:
+        """Returns the number of API calls counted so far in this hook."""
+        return self._api_calls
+
+    @property
+    def hooks(self) -> List[dict]:
+        """Returns the timings of the last recorded hooks, oldest first."""
+        return json.loads(self._stored.hooks)
+
+    def count_api_calls(self, client: Client) -> Client:
+        """Counts every request sent by `client` towards this hook's API calls.
+
+        Returns the client, so that this can wrap the client's creation.
+        """
+        # lightkube does not expose its HTTP client, so only hook into it where it is found
+        http_client = getattr(getattr(client, "_client", None), "_client", None)
+        if isinstance(http_client, httpx.Client):
+            http_client.event_hooks["request"].append(self._on_request)
+        return client
+
+    @contextmanager
+    def phase(self, name: str):
+        """Times the enclosed block as the phase `name` of this hook."""
+        started_at = time.monotonic()
+        api_calls = self._api_calls
+        try:
+            yield
+        finally:
+            timing = {
+                "phase": name,
+                "duration": round(time.monotonic() - started_at, 3),
+                "api-calls": self._api_calls - api_calls,
+            }
+            self._phases.append(timing)
+            logger.debug(f"Hook phase timing: {json.dumps(timing)}")
+
+    def _on_request(self, _request: httpx.Request) -> None:
+        # Requests may be sent concurrently from several threads
+        with self._lock:
+            self._api_calls += 1
+
+    def _on_pre_commit(self, _) -> None:
+        if not self._phases:
+            return
+        timing = {
+            "hook": _hook_name(),
+            "duration": round(time.monotonic() - self._started_at, 3),
+            "api-calls": self._api_calls,
+            "phases": self._phases,
+        }
+        logger.debug(f"Hook timing: {json.dumps(timing)}")
+        hooks = self.hooks + [timing]
+        oldest = max(len(hooks) - self._history, 0)
+        self._stored.hooks = json.dumps(hooks[oldest:])
+
+
+def _hook_name() -> str:
+    """Returns the name of the hook (or action) being dispatched."""
+    dispatch_path = os.environ.get("JUJU_DISPATCH_PATH")
+    return os.path.basename(dispatch_path) if dispatch_path else "unknown"
@@ -0,0 +1,29 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Dependency ordering of Kubernetes resources."""
+
+from typing import List
+
+from charmed_kubeflow_chisme.types import LightkubeResourcesList
+
+# Resources are applied in waves, in this order.  Kinds that are not listed here are applied in
+# a final wave, once everything they may depend on exists.
+APPLY_WAVES = (
+    ("CustomResourceDefinition", "Namespace"),
+    ("ServiceAccount", "ClusterRole", "Role", "ClusterRoleBinding", "RoleBinding"),
+    ("ConfigMap", "Secret"),
+)
+MAX_CONCURRENT_REQUESTS = 8
+
+
+def group_into_waves(resources: LightkubeResourcesList) -> List[LightkubeResourcesList]:
+    """Groups resources into the (non-empty) waves defined by APPLY_WAVES, in order."""
+    waves = [[] for _ in range(len(APPLY_WAVES) + 1)]
+    for resource in resources:
+        wave = next(
+            (i for i, kinds in enumerate(APPLY_WAVES) if resource.kind in kinds),
+            len(APPLY_WAVES),
+        )
+        waves[wave].append(resource)
+    return [wave for wave in waves if wave]
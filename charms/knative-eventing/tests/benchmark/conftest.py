@@ -0,0 +1,49 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import pytest
+from fake_kubernetes import FakeKubernetes
+from lightkube.models.apiextensions_v1 import (
+    CustomResourceDefinitionNames,
+    CustomResourceDefinitionSpec,
+)
+from lightkube.models.meta_v1 import ObjectMeta
+from lightkube.resources.apiextensions_v1 import CustomResourceDefinition
+from ops.testing import Harness
+
+from charm import KnativeEventingCharm
+
+MODEL_NAME = "knative-eventing"
+
+
+@pytest.fixture()
+def fake_kubernetes():
+    """Returns a FakeKubernetes holding the CRDs created by the knative-operator charm."""
+    fake_kubernetes = FakeKubernetes(namespace=MODEL_NAME)
+    fake_kubernetes.add(
+        CustomResourceDefinition(
+            metadata=ObjectMeta(name="knativeeventings.operator.knative.dev"),
+            spec=CustomResourceDefinitionSpec(
+                group="operator.knative.dev",
+                names=CustomResourceDefinitionNames(
+                    kind="KnativeEventing", plural="knativeeventings"
+                ),
+                scope="Namespaced",
+                versions=[],
+            ),
+        )
+    )
+    yield fake_kubernetes
+
+
+@pytest.fixture()
+def harness(fake_kubernetes, mocker):
+    """Returns a harnessed charm whose Kubernetes clients all talk to fake_kubernetes."""
+    mocker.patch("charm.Client", side_effect=fake_kubernetes.client)
+
+    harness = Harness(KnativeEventingCharm)
+    harness.set_model_name(MODEL_NAME)
+    harness.set_leader(True)
+    harness.begin()
+    yield harness
+    harness.cleanup()
@@ -12,9 +12,7 @@ from charm import KnativeEventingCharm
 @pytest.fixture()
 def mocked_lightkube_client_class(mocker):
     """Prevents lightkube clients from being created, returning a mock instead."""
-    mocked_lightkube_client_class = mocker.patch(
-        "charmed_kubeflow_chisme.kubernetes._kubernetes_resource_handler.Client"
-    )
+    mocked_lightkube_client_class = mocker.patch("charm.Client")
     mocked_lightkube_client_class.return_value = mock.MagicMock()
     yield mocked_lightkube_client_class
 
@@ -81,6 +81,11 @@ def test_missing_knative_eventing_crd(lk_client, harness, mocker, mocked_lightku
     harness.charm.on.install.emit()
     assert isinstance(harness.model.unit.status, WaitingStatus)
 
+    # The charm is reconciled once update-status finds the CRD
+    lk_client.return_value.get.side_effect = None
+    harness.charm.on.update_status.emit()
+    assert harness.model.unit.status == ActiveStatus()
+
 
 @patch("charm.Client")
 def test_error_getting_knative_eventing_crd(lk_client, harness, mocker, mocked_lightkube_client):
@@ -90,13 +95,36 @@ def test_error_getting_knative_eventing_crd(lk_client, harness, mocker, mocked_l
     lk_client.return_value.get.side_effect = _FakeApiError(code=403)
 
     # Set the relation to otel-collector
-    rel_id = harness.add_relation("otel-collector", "app")
-    harness.update_relation_data(rel_id, "app", {"some-key": "some-value"})
+    with harness.hooks_disabled():
+        rel_id = harness.add_relation("otel-collector", "app")
+        harness.update_relation_data(rel_id, "app", {"some-key": "some-value"})
 
     with pytest.raises(GenericCharmRuntimeError):
         harness.charm.on.install.emit()
 
 
+def test_lightkube_client_is_shared(harness, mocked_lightkube_client_class):
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+
+    harness.charm.on.install.emit()
+
+    mocked_lightkube_client_class.assert_called_once()
+    assert harness.charm.resource_handler.lightkube_client is harness.charm.lightkube_client
+
+
+def test_get_hook_timings_action(harness, mocked_lightkube_client):
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+
+    harness.charm.on.install.emit()
+    harness.framework.commit()
+    output = harness.run_action("get-hook-timings")
+
+    hooks = json.loads(output.results["hooks"])
+    assert [phase["phase"] for phase in hooks[0]["phases"]] == ["crd-check", "render", "apply"]
+
+
 @pytest.mark.parametrize(
     "apply_error, raised_exception",
     (
@@ -118,23 +146,70 @@ def test_apply_and_set_status_blocked(
     harness.charm.resource_handler.apply = MagicMock()
     harness.charm.resource_handler.apply.side_effect = apply_error
 
-    harness.charm._apply_and_set_status()
+    harness.charm._apply_and_set_status("digest")
     with raised_exception:
         harness.charm.resource_handler.apply()
     assert isinstance(harness.model.unit.status, BlockedStatus)
 
 
+def test_apply_and_set_status_skips_unchanged_manifests(harness, mocked_lightkube_client):
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+
+    harness.charm._apply_and_set_status("digest")
+    harness.charm._apply_and_set_status("digest")
+
+    harness.charm.resource_handler.apply.assert_called_once()
+    assert harness.model.unit.status == ActiveStatus()
+
+
+def test_apply_and_set_status_reapplies_after_failure(harness, mocked_lightkube_client):
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock(side_effect=FakeApiError(400))
+
+    harness.charm._apply_and_set_status("digest")
+    assert isinstance(harness.model.unit.status, BlockedStatus)
+
+    harness.charm.resource_handler.apply.side_effect = None
+    harness.charm._apply_and_set_status("digest")
+    harness.charm._apply_and_set_status("digest")
+
+    assert harness.charm.resource_handler.apply.call_count == 2
+    assert harness.model.unit.status == ActiveStatus()
+
+
+def test_main_coalesces_reconciled_state(harness, mocked_lightkube_client):
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+
+    harness.charm.on.install.emit()
+    harness.charm.on.config_changed.emit()
+
+    # The second event is coalesced, without even checking for the CRD
+    mocked_lightkube_client.get.assert_called_once()
+    harness.charm.resource_handler.apply.assert_called_once()
+    assert harness.model.unit.status == ActiveStatus()
+
+    # A new desired state is reconciled in full
+    harness.update_config({"version": "1.0.0"})
+    # The resource handler (and its context) is only created once per hook
+    harness.charm.resource_handler.context = harness.charm._context
+    harness.charm.on.config_changed.emit()
+    assert mocked_lightkube_client.get.call_count == 2
+    assert harness.charm.resource_handler.apply.call_count == 2
+
+
 def test_otel_collector_relation_changed(harness):
     harness.begin()
-    harness.charm._apply_and_set_status = MagicMock()
+    harness.charm._main = MagicMock()
 
     rel_id = harness.add_relation("otel-collector", "app")
     harness.update_relation_data(rel_id, "app", {"some-key": "some-value"})
 
-    harness.charm._apply_and_set_status.assert_called_once()
+    harness.charm._main.assert_called_once()
 
 
-def test_context_changes(harness):
+def test_context_changes(harness, mocked_lightkube_client):
     harness.begin()
     context = {
         "app_name": harness.charm.app.name,
@@ -197,26 +272,28 @@ def test_custom_images_config_context_with_incorrect_config(harness):
 
 
 @patch("charm.KRH")
-@patch("charm.delete_many")
+@patch("charm.delete_resources")
 def test_on_remove_success(
-    delete_many: MagicMock,
+    delete_resources: MagicMock,
     _: MagicMock,
     harness,
+    mocked_lightkube_client,
 ):
     harness.begin()
     harness.charm.on.remove.emit()
-    delete_many.assert_called()
+    delete_resources.assert_called()
     assert isinstance(harness.charm.model.unit.status, MaintenanceStatus)
 
 
 @patch("charm.KRH")
-@patch("charm.delete_many")
+@patch("charm.delete_resources")
 def test_on_remove_failure(
-    delete_many: MagicMock,
+    delete_resources: MagicMock,
     _: MagicMock,
     harness,
+    mocked_lightkube_client,
 ):
     harness.begin()
-    delete_many.side_effect = _FakeApiError()
+    delete_resources.side_effect = _FakeApiError()
     with pytest.raises(ApiError):
         harness.charm.on.remove.emit()
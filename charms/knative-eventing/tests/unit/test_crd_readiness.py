@@ -0,0 +1,117 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+from charmed_kubeflow_chisme.lightkube.mocking import FakeApiError
+from lightkube.core.exceptions import ApiError
+from ops.charm import CharmBase
+from ops.testing import Harness
+
+from crd_readiness import CRDReadiness, wait_for_crd
+
+CRD_NAME = "knativeeventings.operator.knative.dev"
+
+
+class _CRDReadinessCharm(CharmBase):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.client = MagicMock()
+        self.crd_readiness = CRDReadiness(self, "crd-readiness", CRD_NAME, lambda: self.client)
+        self.crd_created_events = []
+        self.framework.observe(self.crd_readiness.on.crd_created, self._on_crd_created)
+
+    def _on_crd_created(self, event):
+        self.crd_created_events.append(event)
+
+
+@pytest.fixture()
+def harness():
+    harness = Harness(_CRDReadinessCharm, meta="name: test-charm")
+    harness.begin()
+    yield harness
+    harness.cleanup()
+
+
+def _blocking_watch(*_args, **_kwargs):
+    """A watch that never yields any event."""
+    threading.Event().wait()
+    yield
+
+
+def test_wait_for_crd_created():
+    client = MagicMock()
+    client.watch.return_value = iter([("ADDED", MagicMock())])
+
+    assert wait_for_crd(client, CRD_NAME) is True
+    client.watch.assert_called_once()
+    assert client.watch.call_args.kwargs["fields"] == {"metadata.name": CRD_NAME}
+
+
+def test_wait_for_crd_timeout():
+    client = MagicMock()
+    client.watch.side_effect = _blocking_watch
+
+    assert wait_for_crd(client, CRD_NAME, timeout=0.01) is False
+
+
+def test_wait_for_crd_watch_error():
+    client = MagicMock()
+    client.watch.side_effect = FakeApiError(403)
+
+    with pytest.raises(ApiError):
+        wait_for_crd(client, CRD_NAME)
+
+
+def test_wait_existing_crd(harness):
+    crd_readiness = harness.charm.crd_readiness
+
+    assert crd_readiness.wait() is True
+    assert crd_readiness.waiting is False
+    harness.charm.client.watch.assert_not_called()
+
+
+def test_wait_missing_crd(harness):
+    crd_readiness = harness.charm.crd_readiness
+    harness.charm.client.get.side_effect = FakeApiError(404)
+    harness.charm.client.watch.return_value = iter([])
+
+    assert crd_readiness.wait() is False
+    assert crd_readiness.waiting is True
+
+    harness.charm.client.watch.return_value = iter([("ADDED", MagicMock())])
+    assert crd_readiness.wait() is True
+    assert crd_readiness.waiting is False
+
+
+def test_wait_error_getting_crd(harness):
+    harness.charm.client.get.side_effect = FakeApiError(403)
+
+    with pytest.raises(ApiError):
+        harness.charm.crd_readiness.wait()
+
+
+def test_update_status_emits_crd_created(harness):
+    harness.charm.client.get.side_effect = FakeApiError(404)
+    harness.charm.client.watch.return_value = iter([])
+    harness.charm.crd_readiness.wait()
+
+    # Nothing is emitted while the CRD is missing, or if looking for it fails
+    harness.charm.on.update_status.emit()
+    harness.charm.client.get.side_effect = FakeApiError(403)
+    harness.charm.on.update_status.emit()
+    assert harness.charm.crd_created_events == []
+
+    harness.charm.client.get.side_effect = None
+    harness.charm.on.update_status.emit()
+    harness.charm.on.update_status.emit()
+    assert len(harness.charm.crd_created_events) == 1
+    assert harness.charm.crd_readiness.waiting is False
+
+
+def test_update_status_when_not_waiting(harness):
+    harness.charm.on.update_status.emit()
+
+    harness.charm.client.get.assert_not_called()
+    assert harness.charm.crd_created_events == []
@@ -0,0 +1,107 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+from unittest.mock import MagicMock
+
+import pytest
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus
+from charmed_kubeflow_chisme.lightkube.mocking import FakeApiError
+from lightkube.models.meta_v1 import ObjectMeta
+from lightkube.resources.apiextensions_v1 import CustomResourceDefinition
+from lightkube.resources.apps_v1 import Deployment
+from lightkube.resources.core_v1 import ConfigMap, ServiceAccount
+from lightkube.types import CascadeType
+from ops.model import BlockedStatus
+
+from reconcile_state import ResourceReference
+from teardown import delete_resources, resources_to_delete
+
+REFERENCES = [
+    ResourceReference("apiextensions.k8s.io/v1", "CustomResourceDefinition", "crd"),
+    ResourceReference("v1", "ServiceAccount", "sa", "ns"),
+    ResourceReference("apps/v1", "Deployment", "deployment", "ns"),
+    ResourceReference("v1", "ConfigMap", "cm", "ns"),
+]
+
+
+def _deleted(client):
+    return [call.args[:2] for call in client.delete.call_args_list]
+
+
+def test_delete_resources_in_reverse_waves():
+    client = MagicMock()
+    progress = MagicMock()
+
+    delete_resources(client, REFERENCES, on_progress=progress)
+
+    assert _deleted(client) == [
+        (Deployment, "deployment"),
+        (ConfigMap, "cm"),
+        (ServiceAccount, "sa"),
+        (CustomResourceDefinition, "crd"),
+    ]
+    assert client.delete.call_args_list[0].kwargs == {
+        "namespace": "ns",
+        "cascade": CascadeType.BACKGROUND,
+    }
+    assert [call.args for call in progress.call_args_list] == [(1, 4), (2, 4), (3, 4), (4, 4)]
+
+
+@pytest.mark.parametrize(
+    "propagation_policy, cascade",
+    [("Foreground", CascadeType.FOREGROUND), ("Orphan", CascadeType.ORPHAN), ("bad", None)],
+)
+def test_delete_resources_propagation_policy(propagation_policy, cascade):
+    client = MagicMock()
+
+    delete_resources(client, REFERENCES[:1], propagation_policy=propagation_policy)
+
+    expected_cascade = cascade or CascadeType.BACKGROUND
+    assert client.delete.call_args.kwargs["cascade"] == expected_cascade
+
+
+def test_delete_resources_ignores_missing_and_unknown_resources():
+    client = MagicMock()
+    client.delete.side_effect = FakeApiError(404)
+
+    delete_resources(
+        client, REFERENCES + [ResourceReference("example.com/v1", "Unknown", "unknown", "ns")]
+    )
+
+    assert client.delete.call_count == len(REFERENCES)
+
+
+def test_delete_resources_attempts_every_wave_before_raising():
+    client = MagicMock()
+    client.delete.side_effect = FakeApiError(403)
+
+    with pytest.raises(FakeApiError):
+        delete_resources(client, REFERENCES)
+
+    assert client.delete.call_count == len(REFERENCES)
+
+
+def test_resources_to_delete():
+    applied_manifests = MagicMock(inventory=REFERENCES)
+    resource_handler = MagicMock()
+
+    assert resources_to_delete(applied_manifests, resource_handler) == REFERENCES
+    resource_handler.assert_not_called()
+
+
+def test_resources_to_delete_renders_without_inventory():
+    applied_manifests = MagicMock(inventory=[])
+    resource_handler = MagicMock()
+    resource_handler.return_value.render_manifests.return_value = [
+        ConfigMap(metadata=ObjectMeta(name="cm", namespace="ns"))
+    ]
+
+    assert resources_to_delete(applied_manifests, resource_handler) == [
+        ResourceReference("v1", "ConfigMap", "cm", "ns")
+    ]
+
+
+def test_resources_to_delete_without_inventory_and_invalid_config():
+    applied_manifests = MagicMock(inventory=[])
+    resource_handler = MagicMock(side_effect=ErrorWithStatus("Invalid config", BlockedStatus))
+
+    assert resources_to_delete(applied_manifests, resource_handler) == []
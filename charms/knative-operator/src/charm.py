@@ -5,30 +5,50 @@
 """A Juju Charm for knative-operator."""
 
 import glob
+import hashlib
+import json
 import logging
+import re
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, List
 
-from charmed_kubeflow_chisme.exceptions import ErrorWithStatus
-from charmed_kubeflow_chisme.kubernetes import KubernetesResourceHandler as KRH  # noqa N813
-from charmed_kubeflow_chisme.lightkube.batch import delete_many
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus, GenericCharmRuntimeError
+from charmed_kubeflow_chisme.kubernetes import create_charm_default_labels
 from charms.loki_k8s.v1.loki_push_api import LogForwarder
 from charms.observability_libs.v1.kubernetes_service_patch import KubernetesServicePatch
 from charms.prometheus_k8s.v0.prometheus_scrape import MetricsEndpointProvider
 from lightkube import ApiError, Client
 from lightkube.models.core_v1 import ServicePort
+from lightkube.resources.apps_v1 import Deployment
+from lightkube.resources.autoscaling_v2 import HorizontalPodAutoscaler
 from lightkube.resources.core_v1 import ConfigMap, Secret, Service
+from lightkube.resources.discovery_v1 import EndpointSlice
 from ops import main
-from ops.charm import CharmBase
+from ops.charm import CharmBase, PebbleReadyEvent
+from ops.framework import StoredState
 from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus
-from ops.pebble import ChangeError, Layer
-from tenacity import Retrying, stop_after_delay, wait_fixed
+from ops.pebble import ChangeError, CheckLevel, CheckStatus, Layer
+
+from go_runtime import CgroupLimits, go_runtime_environment, read_cgroup_limits
+from hook_timing import HookTimings
+from reconcile_state import AppliedManifests, ReconcileGeneration, manifests_digest
+from resource_patch import container_resources, patch_statefulset_resources
+from resource_waves import ParallelKubernetesResourceHandler as KRH  # noqa N813
+from teardown import delete_resources, resources_to_delete
 
 REQUEST_LOG_TEMPLATE = '{"httpRequest": {"requestMethod": "{{.Request.Method}}", "requestUrl": "{{js .Request.RequestURI}}", "requestSize": "{{.Request.ContentLength}}", "status": {{.Response.Code}}, "responseSize": "{{.Response.Size}}", "userAgent": "{{js .Request.UserAgent}}", "remoteIp": "{{js .Request.RemoteAddr}}", "serverIp": "{{.Revision.PodIP}}", "referer": "{{js .Request.Referer}}", "latency": "{{.Response.Latency}}s", "protocol": "{{.Request.Proto}}"}, "traceId": "{{index .Request.Header "X-B3-Traceid"}}"}'  # noqa: E501
 
 OBSERVABILITY_RESOURCES_FILES = [
     "src/manifests/observability/collector.yaml.j2",
 ]
+# The kinds of the observability objects, labelled so that stale ones are found in the cluster
+OBSERVABILITY_RESOURCE_TYPES = {ConfigMap, Deployment, HorizontalPodAutoscaler, Service}
+# Rendered manifests are cached in the charm directory, which persists across hooks
+MANIFESTS_CACHE_DIR = ".manifests-cache"
 
 logger = logging.getLogger(__name__)
 
@@ -39,32 +59,60 @@ KNATIVE_OPERATOR_WEBHOOK = "knative-operator-webhook"
 KNATIVE_OPERATOR_WEBHOOK_COMMAND = "/ko-app/webhook"
 
 METRICS_PORT = "9090"
+# The operator and its webhook share the pod's network namespace, so they cannot both export
+# their metrics on the default port, which the operator's health check relies on
+WEBHOOK_METRICS_PORT = "9091"
+WEBHOOK_PORT = "8443"
+
+# Pebble restarts a service once its health check fails this many times in a row
+HEALTH_CHECK_PERIOD = "10s"
+HEALTH_CHECK_TIMEOUT = "3s"
+HEALTH_CHECK_THRESHOLD = 3
+HEALTH_CHECKS_FAILING = "Health checks failing"
+# The format of a Go duration, as used in the otel collector's config, eg: 1m30s
+GO_DURATION = re.compile(r"^(\d+(\.\d+)?(ns|us|µs|ms|s|m|h))+$")
+# The format of a metric attribute name, as dropped by the otel collector
+ATTRIBUTE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_.\-]*$")
+# The otel collector addresses are looked up again when the cached ones are older than this
+OTEL_COLLECTOR_IPS_TTL = 5 * 60
 
 
 class KnativeOperatorCharm(CharmBase):
     """A Juju Charm for knative-operator."""
 
+    _stored = StoredState()
+
     def __init__(self, *args):
         super().__init__(*args)
 
         self._app_name = self.model.app.name
         self._namespace = self.model.name
         self._src_dir = Path("src")
+        self._lightkube_client = None
         self._resource_handler = None
         self._observability_resource_handler = None
+        self._hook_timings = HookTimings(self, "hook-timings")
+        self._applied_resources = AppliedManifests(self, "applied-resources")
+        self._applied_observability_resources = AppliedManifests(
+            self, "applied-observability-resources"
+        )
+        self._reconcile_generation = ReconcileGeneration(self, "reconcile-generation")
+        self._stored.set_default(
+            otel_collector_ips=[],
+            otel_collector_ips_updated_at=0.0,
+            layer_hashes={},
+            cgroup_limits={},
+        )
 
         metrics_port = ServicePort(int(METRICS_PORT), name=f"{self._app_name}-metrics")
         self.service_patcher = KubernetesServicePatch(
             self, [metrics_port], service_name=f"{self._app_name}"
         )
         # Instantiate MetricsEndpointProvider for Prometheus scraping
-        targets = [f"*:{METRICS_PORT}"]
-        if self._otel_exporter_ip:
-            targets.append(f"{self._otel_exporter_ip}:8889")
-
+        # The otel collector addresses are read from the cache, see _refresh_otel_collector_ips
         self.prometheus_provider = MetricsEndpointProvider(
             self,
-            jobs=[{"static_configs": [{"targets": targets}]}],
+            jobs=self._scrape_jobs,
             # Note (rgildein): When otel collector relation is created we need to refresh.
             refresh_event=[self.on["otel-collector"].relation_created],
         )
@@ -74,11 +122,6 @@ class KnativeOperatorCharm(CharmBase):
             KNATIVE_OPERATOR_WEBHOOK: self.unit.get_container(KNATIVE_OPERATOR_WEBHOOK),
         }
 
-        self._layer_properties = {
-            KNATIVE_OPERATOR: self._knative_operator_layer,
-            KNATIVE_OPERATOR_WEBHOOK: self._knative_operator_webhook_layer,
-        }
-
         for event in [
             self.on.install,
             self.on.config_changed,
@@ -90,9 +133,32 @@ class KnativeOperatorCharm(CharmBase):
         self.framework.observe(
             self.on["otel-collector"].relation_created, self._on_otel_collector_relation_created
         )
+        for container_name in self._containers:
+            self.framework.observe(
+                self.on[container_name].pebble_check_failed, self._update_health_status
+            )
+            self.framework.observe(
+                self.on[container_name].pebble_check_recovered, self._update_health_status
+            )
+        self.framework.observe(self.on.update_status, self._update_health_status)
+        self.framework.observe(self.on.update_status, self._on_update_status)
         self.framework.observe(self.on.remove, self._on_remove)
+        self.framework.observe(self.on.get_hook_timings_action, self._on_get_hook_timings)
         self._logging = LogForwarder(charm=self)
 
+    @property
+    def lightkube_client(self) -> Client:
+        """Returns the lightkube Client shared by every Kubernetes operation in this hook.
+
+        Sharing one client means the in-cluster config is loaded once and every request reuses
+        the same keep-alive connection pool.
+        """
+        if not self._lightkube_client:
+            self._lightkube_client = self._hook_timings.count_api_calls(
+                Client(field_manager=self._namespace)
+            )
+        return self._lightkube_client
+
     # FIXME: refactor resource handler to use setter, global var
     # and assign a specific name related to its functionality
     @property
@@ -103,6 +169,9 @@ class KnativeOperatorCharm(CharmBase):
                 template_files=self._template_files,
                 context=self._context,
                 field_manager=self._namespace,
+                lightkube_client=self.lightkube_client,
+                cache_dir=self.charm_dir / MANIFESTS_CACHE_DIR,
+                cache_name="resources",
             )
         return self._resource_handler
 
@@ -120,28 +189,76 @@ class KnativeOperatorCharm(CharmBase):
                 template_files=OBSERVABILITY_RESOURCES_FILES,
                 context=self._context,
                 field_manager=self._namespace,
+                labels=create_charm_default_labels(
+                    self._app_name, self._namespace, scope="observability"
+                ),
+                resource_types=OBSERVABILITY_RESOURCE_TYPES,
+                lightkube_client=self.lightkube_client,
+                cache_dir=self.charm_dir / MANIFESTS_CACHE_DIR,
+                cache_name="observability",
             )
         return self._observability_resource_handler
 
     @property
-    def _otel_exporter_ip(self):
-        """Returns the ClusterIP of the otel-export service."""
+    def _otel_collector_ips(self) -> List[str]:
+        """Returns the addresses of the ready otel collector replicas behind otel-export."""
         try:
-            exporter_service = self.resource_handler.lightkube_client.get(
-                res=Service, name="otel-export", namespace=self._namespace
+            endpoint_slices = self.lightkube_client.list(
+                EndpointSlice,
+                namespace=self._namespace,
+                labels={"kubernetes.io/service-name": "otel-export"},
             )
-            exporter_ip = exporter_service.spec.clusterIP
-        except ApiError as e:
-            if e.status.code == 404:
-                logger.info(
-                    "The OpenTelemetry Collector may not be deployed yet."
-                    "This may be temporary or due to a missing otel-collector relation."
-                )
-                return None
+            addresses = {
+                address
+                for endpoint_slice in endpoint_slices
+                for endpoint in endpoint_slice.endpoints or []
+                if endpoint.conditions is None or endpoint.conditions.ready is not False
+                for address in endpoint.addresses
+            }
+        except ApiError:
             logger.error("Something went wrong trying to get the OpenTelemetry Collector")
             raise
-        else:
-            return exporter_ip
+        if not addresses:
+            logger.info(
+                "The OpenTelemetry Collector may not be deployed yet."
+                "This may be temporary or due to a missing otel-collector relation."
+            )
+        return sorted(addresses)
+
+    @property
+    def _scrape_jobs(self):
+        """Returns the Prometheus scrape jobs, using the cached otel collector addresses.
+
+        Every collector replica is scraped, as each only exports the metrics it received.
+        """
+        targets = [f"*:{METRICS_PORT}", f"*:{WEBHOOK_METRICS_PORT}"]
+        targets += [f"{ip}:8889" for ip in self._stored.otel_collector_ips]
+        return [{"static_configs": [{"targets": targets}]}]
+
+    def _refresh_otel_collector_ips(self):
+        """Looks up the otel collector addresses, updating the cache and the scrape jobs.
+
+        No address is found until the collector's pods are Ready (eg: right after it is applied),
+        so an empty result is not cached as fresh, for the next hook to look them up again.
+        """
+        collector_ips = self._otel_collector_ips
+        if collector_ips:
+            self._stored.otel_collector_ips_updated_at = time.time()
+        if collector_ips != list(self._stored.otel_collector_ips):
+            logger.info(f"OpenTelemetry Collector addresses changed to {collector_ips}")
+            self._stored.otel_collector_ips = collector_ips
+            self.prometheus_provider.update_scrape_job_spec(self._scrape_jobs)
+
+    @property
+    def _otel_collector_ips_are_stale(self) -> bool:
+        """Returns True if the cached otel collector addresses have outlived their time to live."""
+        elapsed = time.time() - self._stored.otel_collector_ips_updated_at
+        return elapsed >= OTEL_COLLECTOR_IPS_TTL
+
+    def _on_update_status(self, _):
+        """Refreshes the otel collector addresses, which change as replicas come and go."""
+        if self.model.relations["otel-collector"] and self._otel_collector_ips_are_stale:
+            self._refresh_otel_collector_ips()
 
     @property
     def _context(self):
@@ -150,9 +267,138 @@ class KnativeOperatorCharm(CharmBase):
             "name": self._app_name,
             "requestLogTemplate": REQUEST_LOG_TEMPLATE,
             "otel_collector_image": self.config["otel-collector-image"],
+            **self._otel_collector_context,
         }
         return context
 
+    @property
+    def _otel_collector_context(self) -> dict:
+        """Returns the context of the otel collector's config, validating it.
+
+        Raises:
+            ErrorWithStatus: if the otel collector config is not valid.
+        """
+        context = {
+            "otel_collector_otlp": self.config["otel-collector-otlp"],
+            "otel_collector_batch_size": self.config["otel-collector-batch-size"],
+            "otel_collector_batch_timeout": self.config["otel-collector-batch-timeout"],
+            "otel_collector_memory_limit_mib": self.config["otel-collector-memory-limit-mib"],
+            "otel_collector_memory_spike_limit_mib": self.config[
+                "otel-collector-memory-spike-limit-mib"
+            ],
+            **self._otel_collector_cardinality_context,
+        }
+        if context["otel_collector_batch_size"] <= 0:
+            raise ErrorWithStatus(
+                "Invalid config: otel-collector-batch-size must be positive", BlockedStatus
+            )
+        if not GO_DURATION.match(context["otel_collector_batch_timeout"]):
+            raise ErrorWithStatus(
+                "Invalid config: otel-collector-batch-timeout must be a duration, eg: 200ms",
+                BlockedStatus,
+            )
+        if not (
+            0
+            <= context["otel_collector_memory_spike_limit_mib"]
+            < context["otel_collector_memory_limit_mib"]
+        ):
+            raise ErrorWithStatus(
+                "Invalid config: otel-collector-memory-spike-limit-mib must be less than "
+                "otel-collector-memory-limit-mib",
+                BlockedStatus,
+            )
+        context["otel_collector_config_digest"] = hashlib.sha256(
+            json.dumps(context, sort_keys=True).encode()
+        ).hexdigest()
+        return {**context, **self._otel_collector_scaling_context}
+
+    @property
+    def _otel_collector_cardinality_context(self) -> dict:
+        """Returns the context of the otel collector's attribute drop and metrics allowlist.
+
+        Raises:
+            ErrorWithStatus: if an attribute to drop or a regular expression of the metrics
+                             allowlist is not valid.
+        """
+        drop_attributes = _comma_separated(self.config["otel-collector-drop-attributes"])
+        for attribute in drop_attributes:
+            if not ATTRIBUTE_NAME.match(attribute):
+                raise ErrorWithStatus(
+                    f"Invalid config: otel-collector-drop-attributes {attribute!r} is not an"
+                    " attribute name",
+                    BlockedStatus,
+                )
+        metrics_allowlist = _comma_separated(self.config["otel-collector-metrics-allowlist"])
+        for pattern in metrics_allowlist:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ErrorWithStatus(
+                    f"Invalid config: otel-collector-metrics-allowlist {pattern!r}: {e}",
+                    BlockedStatus,
+                ) from e
+
+        # Metrics are filtered and stripped of attributes before being batched
+        processors = ["memory_limiter"]
+        if metrics_allowlist:
+            processors.append("filter/allowlist")
+        if drop_attributes:
+            processors.append("transform/drop")
+        processors.append("batch")
+        return {
+            "otel_collector_drop_attributes": drop_attributes,
+            "otel_collector_metrics_allowlist": metrics_allowlist,
+            "otel_collector_processors": processors,
+        }
+
+    @property
+    def _otel_collector_scaling_context(self) -> dict:
+        """Returns the context of the otel collector's replicas and resources, validating it.
+
+        Raises:
+            ErrorWithStatus: if the otel collector's replicas or resources config is not valid.
+        """
+        replicas = self.config["otel-collector-replicas"]
+        max_replicas = self.config["otel-collector-max-replicas"]
+        try:
+            resources = container_resources(self.config, "otel-collector")
+        except ValueError as e:
+            raise ErrorWithStatus(f"Invalid config: {e}", BlockedStatus) from e
+        if replicas < 1:
+            raise ErrorWithStatus(
+                "Invalid config: otel-collector-replicas must be at least 1", BlockedStatus
+            )
+        if max_replicas and max_replicas < replicas:
+            raise ErrorWithStatus(
+                "Invalid config: otel-collector-max-replicas must be at least "
+                "otel-collector-replicas",
+                BlockedStatus,
+            )
+        if max_replicas and "cpu" not in resources["requests"]:
+            raise ErrorWithStatus(
+                "Invalid config: otel-collector autoscaling requires otel-collector-cpu-request",
+                BlockedStatus,
+            )
+        return {
+            "otel_collector_replicas": replicas,
+            "otel_collector_autoscaling": bool(max_replicas),
+            "otel_collector_max_replicas": max_replicas,
+            "otel_collector_target_cpu_utilization": self.config[
+                "otel-collector-target-cpu-utilization"
+            ],
+            "otel_collector_resources": {
+                field: values for field, values in resources.items() if values
+            },
+        }
+
+    @property
+    def _layer_properties(self) -> Dict[str, Layer]:
+        """Returns the desired Pebble layer of each workload container."""
+        return {
+            KNATIVE_OPERATOR: self._knative_operator_layer,
+            KNATIVE_OPERATOR_WEBHOOK: self._knative_operator_webhook_layer,
+        }
+
     @property
     def _knative_operator_layer(self) -> Layer:
         """Returns a pre-configured Pebble layer for knative operator."""
@@ -163,20 +409,53 @@ class KnativeOperatorCharm(CharmBase):
                 KNATIVE_OPERATOR: {
                     "override": "replace",
                     "summary": f"entrypoint of the {KNATIVE_OPERATOR} image",
-                    "command": KNATIVE_OPERATOR_COMMAND,
+                    "command": self._knative_operator_command,
                     "startup": "enabled",
                     "environment": {
                         "POD_NAME": self._app_name,
                         "SYSTEM_NAMESPACE": self._namespace,
                         "METRICS_DOMAIN": "knative.dev/operator",
+                        "METRICS_PROMETHEUS_PORT": METRICS_PORT,
                         "CONFIG_LOGGING_NAME": "config-logging",
                         "CONFIG_OBSERVABILITY_NAME": "config-observability",
+                        **self._go_runtime_environment(KNATIVE_OPERATOR),
                     },
+                    "on-check-failure": {f"{KNATIVE_OPERATOR}-up": "restart"},
+                }
+            },
+            "checks": {
+                f"{KNATIVE_OPERATOR}-up": {
+                    **_health_check_properties(),
+                    "http": {"url": f"http://localhost:{METRICS_PORT}/metrics"},
                 }
             },
         }
         return Layer(layer_config)
 
+    @property
+    def _knative_operator_command(self) -> str:
+        """Returns the knative operator's command, with its Kubernetes API rate limits.
+
+        Raises:
+            ErrorWithStatus: if the kube-api-qps or kube-api-burst config is not valid.
+        """
+        qps = self.config["kube-api-qps"]
+        burst = self.config["kube-api-burst"]
+        if qps < 0 or burst < 0:
+            raise ErrorWithStatus(
+                "Invalid config: kube-api-qps and kube-api-burst must be positive", BlockedStatus
+            )
+        if qps and burst and burst < qps:
+            raise ErrorWithStatus(
+                "Invalid config: kube-api-burst must be at least kube-api-qps", BlockedStatus
+            )
+        command = KNATIVE_OPERATOR_COMMAND
+        if qps:
+            command += f" --kube-api-qps={qps:g}"
+        if burst:
+            command += f" --kube-api-burst={burst}"
+        return command
+
     @property
     def _knative_operator_webhook_layer(self) -> Layer:
         """Returns a pre-configured Pebble layer for knative operator's webhook."""
@@ -193,43 +472,182 @@ class KnativeOperatorCharm(CharmBase):
                         "POD_NAME": self._app_name,
                         "SYSTEM_NAMESPACE": self._namespace,
                         "METRICS_DOMAIN": "knative.dev/operator",
+                        "METRICS_PROMETHEUS_PORT": WEBHOOK_METRICS_PORT,
                         "CONFIG_LOGGING_NAME": "config-logging",
                         "CONFIG_OBSERVABILITY_NAME": "config-observability",
                         "WEBHOOK_NAME": "operator-webhook",
-                        "WEBHOOK_PORT": "8443",
+                        "WEBHOOK_PORT": WEBHOOK_PORT,
+                        **self._go_runtime_environment(KNATIVE_OPERATOR_WEBHOOK),
                     },
+                    "on-check-failure": {f"{KNATIVE_OPERATOR_WEBHOOK}-up": "restart"},
+                }
+            },
+            "checks": {
+                f"{KNATIVE_OPERATOR_WEBHOOK}-up": {
+                    **_health_check_properties(),
+                    "tcp": {"port": int(WEBHOOK_PORT)},
                 }
             },
         }
         return Layer(layer_config)
 
-    def _update_layer(self, event, container_name: str) -> None:
-        """Updates the Pebble configuration layer for knative operator if changed."""
-        if not self._containers[container_name].can_connect():
+    def _go_runtime_environment(self, container_name: str) -> dict:
+        """Returns the Go runtime environment variables for the container's cgroup limits.
+
+        Raises:
+            ErrorWithStatus: if the gomaxprocs or gomemlimit config is not valid.
+        """
+        limits = CgroupLimits(**self._stored.cgroup_limits.get(container_name, {}))
+        try:
+            return go_runtime_environment(
+                limits, gomaxprocs=self.config["gomaxprocs"], gomemlimit=self.config["gomemlimit"]
+            )
+        except ValueError as e:
+            raise ErrorWithStatus(f"Invalid config: {e}", BlockedStatus) from e
+
+    def _refresh_cgroup_limits(self, container_name: str) -> None:
+        """Reads and caches the cgroup limits of a container, which only change on restart."""
+        limits = read_cgroup_limits(self._containers[container_name])
+        logger.info(f"cgroup limits of {container_name}: {limits}")
+        self._stored.cgroup_limits[container_name] = limits._asdict()
+
+    @property
+    def _desired_state_fingerprint(self) -> str:
+        """Returns a digest of everything _main reconciles.
+
+        That is the manifests, the Pebble layers and the resources of the workload containers.
+        """
+        digest = hashlib.sha256(
+            manifests_digest(
+                self.resource_handler.template_files, self.resource_handler.context
+            ).encode()
+        )
+        for name, layer in sorted(self._layer_properties.items()):
+            digest.update(f"{name}:{_layer_hash(layer)}".encode())
+        digest.update(json.dumps(self._container_resources, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    @property
+    def _container_resources(self) -> dict:
+        """Returns the resource requests and limits of each workload container, from config.
+
+        Raises:
+            ErrorWithStatus: if the resources config is not valid.
+        """
+        try:
+            return {name: container_resources(self.config, name) for name in self._containers}
+        except ValueError as e:
+            raise ErrorWithStatus(f"Invalid config: {e}", BlockedStatus) from e
+
+    def _patch_resources(self) -> bool:
+        """Patches the workload containers' resources into the charm's StatefulSet.
+
+        The StatefulSet is only patched if its containers' resources differ from the config.
+        Those are compared with the live StatefulSet, rather than remembered, as the charm's
+        local state is lost when the patch rolls its pod out again.
+
+        Returns:
+            True if the pod is still being rolled out with the patched resources.
+        """
+        with self._hook_timings.phase("resources-patch"):
+            return patch_statefulset_resources(
+                self.lightkube_client, self._app_name, self._namespace, self._container_resources
+            )
+
+    def _update_layers(self, event) -> None:
+        """Updates the Pebble configuration layers of the workload containers if changed.
+
+        A container is only contacted if its desired layer differs from the last one applied to
+        it, or if it has just (re)started.  Containers that need a replan are replanned
+        concurrently, and those that are still starting are left to their pebble-ready event.
+        """
+        layer_hashes = {name: _layer_hash(layer) for name, layer in self._layer_properties.items()}
+        workload = event.workload if isinstance(event, PebbleReadyEvent) else None
+        restarted_container = workload.name if workload is not None else None
+        pending = [
+            name
+            for name, layer_hash in layer_hashes.items()
+            if name == restarted_container or self._stored.layer_hashes.get(name) != layer_hash
+        ]
+        if not pending:
+            logger.info("Pebble layers are unchanged, skipping")
+            self.unit.status = ActiveStatus()
+            return
+
+        # Containers that cannot be connected to yet are replanned on their pebble-ready event
+        starting = [name for name in pending if not self._containers[name].can_connect()]
+        pending = [name for name in pending if name not in starting]
+        if not pending:
             self.unit.status = MaintenanceStatus("Waiting for pod startup to complete")
-            event.defer()
             return
 
+        with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+            futures = {name: executor.submit(self._update_layer, name) for name in pending}
+
+        failed_container = None
+        for name, future in futures.items():
+            if future.exception() is None:
+                self._stored.layer_hashes[name] = layer_hashes[name]
+            elif failed_container is None:
+                failed_container = name
+        if failed_container is not None:
+            # TODO: Handle this error like we do elsewhere using ErrorWithStatus?
+            self.unit.status = BlockedStatus(f"Failed to replan for {failed_container}")
+            raise futures[failed_container].exception()
+        if starting:
+            self.unit.status = MaintenanceStatus("Waiting for pod startup to complete")
+            return
+        self.unit.status = ActiveStatus()
+
+    def _update_layer(self, container_name: str) -> None:
+        """Updates the Pebble layer of a container if its services or checks changed."""
+        container = self._containers[container_name]
         # Get current config
-        current_layer = self._containers[container_name].get_plan()
+        current_layer = container.get_plan()
         # Create a new config layer
         new_layer = self._layer_properties[container_name]
-        if current_layer.services != new_layer.services:
-            self._containers[container_name].add_layer(container_name, new_layer, combine=True)
+        if (
+            current_layer.services != new_layer.services
+            or current_layer.checks != new_layer.checks
+        ):
+            container.add_layer(container_name, new_layer, combine=True)
             try:
-                logger.info("Pebble plan updated with new configuration, replanning")
-                self._containers[container_name].replan()
-            except ChangeError as e:
-                # TODO: Handle this error like we do elsewhere using ErrorWithStatus?
+                logger.info(
+                    f"Pebble plan updated with new configuration, replanning {container_name}"
+                )
+                container.replan()
+            except ChangeError:
                 logger.error(traceback.format_exc())
-                self.unit.status = BlockedStatus(f"Failed to replan for {container_name}")
-                raise e
-        self.unit.status = ActiveStatus()
+                raise
+
+    def _apply_resources(self, resource_handler, applied_manifests=None):
+        """Applies the resource handler's manifests, skipping them if already applied.
+
+        Args:
+            resource_handler: the KubernetesResourceHandler to apply
+            applied_manifests: (Optional) the AppliedManifests tracking what was last applied by
+                               resource_handler.  If omitted, resources are always applied.
+        """
+        digest = None
+        if applied_manifests is not None:
+            digest = manifests_digest(resource_handler.template_files, resource_handler.context)
+            if applied_manifests.is_up_to_date(digest):
+                logger.info("Manifests are unchanged since they were last applied, skipping")
+                self.unit.status = ActiveStatus()
+                return
 
-    def _apply_resources(self, resource_handler):
         try:
-            resource_handler.apply()
+            with self._hook_timings.phase("render"):
+                resources = resource_handler.render_manifests(force_recompute=False)
+            if applied_manifests is not None:
+                applied_manifests.add_to_inventory(resources)
+            with self._hook_timings.phase("apply"):
+                resource_handler.apply()
+            if applied_manifests is not None:
+                self._delete_stale_resources(resources, applied_manifests, resource_handler)
         except (ApiError, ErrorWithStatus) as e:
+            if applied_manifests is not None:
+                applied_manifests.reset()
             logger.info(traceback.format_exc())
             if isinstance(e, ApiError):
                 logger.info(f"Applying resources failed with ApiError status code {e.status.code}")
@@ -242,27 +660,146 @@ class KnativeOperatorCharm(CharmBase):
             # let's use the compute_status() method to set (or not)
             # an active status
             self.unit.status = ActiveStatus()
+            if applied_manifests is not None:
+                applied_manifests.record(digest)
+
+    def _delete_stale_resources(self, resources, applied_manifests, resource_handler):
+        """Deletes the applied objects that are no longer rendered, eg: a disabled autoscaler.
+
+        Those are looked up in the inventory of applied_manifests and, if resource_handler
+        labels its objects, among the objects of the model's namespace matching its labels: the
+        inventory is lost with the charm's local state when its pod is restarted.
+        """
+        deployed = []
+        if resource_handler.labels:
+            with self._hook_timings.phase("list-deployed"):
+                for resource_type in resource_handler.resource_types:
+                    deployed += self.lightkube_client.list(
+                        resource_type, namespace=self._namespace, labels=resource_handler.labels
+                    )
+        stale = applied_manifests.stale_references(resources, deployed)
+        if not stale:
+            return
+        logger.info(f"Deleting objects that are no longer rendered: {stale}")
+        with self._hook_timings.phase("delete-stale"):
+            delete_resources(
+                self.lightkube_client, stale, self.model.config["delete-propagation-policy"]
+            )
+        applied_manifests.remove_from_inventory(stale)
 
     def _main(self, event):
-        """Event handler for changing Pebble configuration and applying k8s resources."""
+        """Event handler for changing Pebble configuration and applying k8s resources.
+
+        Events for a desired state that was already reconciled in the current generation are
+        coalesced: only the Pebble layer of a restarted container is checked.
+        """
+        workload = event.workload if isinstance(event, PebbleReadyEvent) else None
+        if workload is not None:
+            self._refresh_cgroup_limits(workload.name)
+
+        try:
+            fingerprint = self._desired_state_fingerprint
+        except ErrorWithStatus as e:
+            logger.error(e.msg)
+            self.unit.status = e.status
+            return
+        if self._reconcile_generation.is_reconciled(fingerprint):
+            logger.info(
+                "Desired state already reconciled in generation "
+                f"{self._reconcile_generation.generation}, skipping full reconcile"
+            )
+            self._replan_restarted_container(event)
+            return
+
+        # Patching the containers' resources rolls the pod out again if they changed
+        try:
+            resources_patch_pending = self._patch_resources()
+        except ApiError as e:
+            logger.info(traceback.format_exc())
+            logger.info(f"Patching resources failed with ApiError status code {e.status.code}")
+            self.unit.status = BlockedStatus(f"ApiError: {e.status.code}")
+            return
+
         # Apply Kubernetes resources
         self.unit.status = MaintenanceStatus("Applying resources")
-        self._apply_resources(resource_handler=self.resource_handler)
+        self._apply_resources(
+            resource_handler=self.resource_handler, applied_manifests=self._applied_resources
+        )
+
+        self._reapply_otel_collector()
 
         # Handle [this race condition](https://github.com/canonical/knative-operators/issues/90)
-        wait_for_required_kubernetes_resources(self._namespace, DEFAULT_RETRYER)
+        with self._hook_timings.phase("wait-resources"):
+            wait_for_required_kubernetes_resources(self.lightkube_client, self._namespace)
+
+        if self.model.relations["otel-collector"] and self._otel_collector_ips_are_stale:
+            with self._hook_timings.phase("otel-collector-ips"):
+                self._refresh_otel_collector_ips()
 
         # Update Pebble configuration layer if it has changed
         self.unit.status = MaintenanceStatus("Configuring Pebble layers")
-        self._update_layer(event, KNATIVE_OPERATOR)
-        self._update_layer(event, KNATIVE_OPERATOR_WEBHOOK)
+        with self._hook_timings.phase("replan"):
+            self._update_layers(event)
+
+        if resources_patch_pending and isinstance(self.unit.status, ActiveStatus):
+            self.unit.status = MaintenanceStatus("Waiting for the resources patch to roll out")
+        if isinstance(self.unit.status, ActiveStatus):
+            self._reconcile_generation.record(fingerprint)
+
+    def _replan_restarted_container(self, event):
+        """Checks the Pebble layer of a container that has just (re)started, if any."""
+        if isinstance(event, PebbleReadyEvent):
+            with self._hook_timings.phase("replan"):
+                self._update_layers(event)
+
+    def _reapply_otel_collector(self):
+        """Keeps the deployed otel collector in line with its otel-collector-* config."""
+        if self.model.relations["otel-collector"] and isinstance(self.unit.status, ActiveStatus):
+            self.unit.status = MaintenanceStatus("Applying observability manifests")
+            self._apply_resources(
+                resource_handler=self.observability_resource_handler,
+                applied_manifests=self._applied_observability_resources,
+            )
+
+    def _update_health_status(self, _):
+        """Surfaces the state of the workloads' Pebble health checks in the unit status.
+
+        Pebble restarts a service once its check fails, so the status only reports the failure
+        until the check recovers.  Failures are only reported while the unit is otherwise active,
+        so that recovering from them never hides another status (eg: Blocked on invalid config).
+        """
+        failing = []
+        for container in self._containers.values():
+            if not container.can_connect():
+                continue
+            failing += [
+                check.name
+                for check in container.get_checks(level=CheckLevel.ALIVE).values()
+                if check.status == CheckStatus.DOWN
+            ]
+        reporting_failures = isinstance(
+            self.unit.status, MaintenanceStatus
+        ) and self.unit.status.message.startswith(HEALTH_CHECKS_FAILING)
+        if failing:
+            logger.warning(f"Pebble health checks failing: {', '.join(sorted(failing))}")
+            if reporting_failures or isinstance(self.unit.status, ActiveStatus):
+                self.unit.status = MaintenanceStatus(
+                    f"{HEALTH_CHECKS_FAILING}: {', '.join(sorted(failing))}"
+                )
+        elif reporting_failures:
+            self.unit.status = ActiveStatus()
 
     def _on_otel_collector_relation_created(self, event):
         """Event handler for on['otel-collector'].relation_changed."""
         # Apply all changes only if the otel collector has not been deployed
-        if not self._otel_exporter_ip:
+        self._refresh_otel_collector_ips()
+        if not self._stored.otel_collector_ips:
             self.unit.status = MaintenanceStatus("Applying observability manifests")
-            self._apply_resources(resource_handler=self.observability_resource_handler)
+            self._apply_resources(
+                resource_handler=self.observability_resource_handler,
+                applied_manifests=self._applied_observability_resources,
+            )
+            self._refresh_otel_collector_ips()
         relation_data = self.model.get_relation("otel-collector", event.relation.id).data[self.app]
         # Update own application bucket with otel collector information
         # This will send data without ensuring the collector is correctly deployed
@@ -276,43 +813,117 @@ class KnativeOperatorCharm(CharmBase):
         )
         self.unit.status = ActiveStatus()
 
+    def _on_get_hook_timings(self, event):
+        """Event handler for the get-hook-timings action."""
+        event.set_results({"hooks": json.dumps(self._hook_timings.hooks, indent=2)})
+
     def _on_remove(self, _):
         self.unit.status = MaintenanceStatus("Removing k8s resources")
-        manifests = self.resource_handler.render_manifests()
-        observability_manifests = self.observability_resource_handler.render_manifests()
-        try:
-            delete_many(self.resource_handler.lightkube_client, manifests)
-            delete_many(
-                self.observability_resource_handler.lightkube_client, observability_manifests
+        with self._hook_timings.phase("render"):
+            resources = resources_to_delete(
+                self._applied_resources, lambda: self.resource_handler
+            ) + resources_to_delete(
+                self._applied_observability_resources, lambda: self.observability_resource_handler
             )
+        try:
+            with self._hook_timings.phase("delete"):
+                delete_resources(
+                    self.lightkube_client,
+                    resources,
+                    propagation_policy=self.model.config["delete-propagation-policy"],
+                    on_progress=self._on_remove_progress,
+                )
         except ApiError as e:
-            logger.warning(f"Failed to delete resources: {manifests} with: {e}")
+            logger.warning(f"Failed to delete resources: {resources} with: {e}")
             raise e
         self.unit.status = MaintenanceStatus("K8s resources removed")
 
+    def _on_remove_progress(self, processed: int, total: int):
+        self.unit.status = MaintenanceStatus(f"Removing k8s resources ({processed}/{total})")
+
 
 REQUIRED_CONFIGMAPS = ["config-observability", "config-logging"]
 REQUIRED_SECRETS = ["operator-webhook-certs"]
-DEFAULT_RETRYER = Retrying(
-    stop=stop_after_delay(15),
-    wait=wait_fixed(3),
-    reraise=True,
-)
-
-
-def wait_for_required_kubernetes_resources(namespace: str, retryer: Retrying):
-    """Waits for required kubernetes resources to be created, raising if we exceed a timeout"""
-    client = Client()
-    for attempt in retryer:
-        with attempt:
-            for cm in REQUIRED_CONFIGMAPS:
-                logger.info(f"Looking for required configmap {cm}")
-                client.get(ConfigMap, name=cm, namespace=namespace)
-                logger.info(f"Found required configmap {cm}")
-            for secret in REQUIRED_SECRETS:
-                logger.info(f"Looking for required secret {secret}")
-                client.get(Secret, name=secret, namespace=namespace)
-                logger.info(f"Found required secret {cm}")
+REQUIRED_RESOURCES_TIMEOUT = 15
+
+
+def wait_for_required_kubernetes_resources(
+    client: Client, namespace: str, timeout: float = REQUIRED_RESOURCES_TIMEOUT
+):
+    """Waits for required kubernetes resources to be created, raising if we exceed a timeout.
+
+    Each required resource is watched rather than polled, so this returns as soon as the last
+    of them is created.
+    """
+    required_resources = [(ConfigMap, name) for name in REQUIRED_CONFIGMAPS] + [
+        (Secret, name) for name in REQUIRED_SECRETS
+    ]
+    watches = {}
+    for resource, name in required_resources:
+        watch = _ResourceWatch(client, resource, name, namespace)
+        watch.start()
+        watches[name] = watch
+
+    deadline = time.monotonic() + timeout
+    for resource, name in required_resources:
+        logger.info(f"Looking for required {resource.__name__} {name}")
+        watch = watches[name]
+        if not watch.done.wait(max(0, deadline - time.monotonic())):
+            raise GenericCharmRuntimeError(
+                f"Timed out waiting for required {resource.__name__} {name}"
+            )
+        if watch.error is not None:
+            raise watch.error
+        logger.info(f"Found required {resource.__name__} {name}")
+
+
+class _ResourceWatch(threading.Thread):
+    """Watches a single resource by name, setting `done` once it exists or the watch fails."""
+
+    def __init__(self, client: Client, resource, name: str, namespace: str):
+        # Daemon threads do not keep the hook alive if we stop waiting on a timeout
+        super().__init__(daemon=True)
+        self.done = threading.Event()
+        self.error = None
+        self._client = client
+        self._resource = resource
+        self._name = name
+        self._namespace = namespace
+
+    def run(self):
+        try:
+            # Without a resource_version, the watch starts with an ADDED event for an existing
+            # resource, so there is no need to get the resource first
+            for event_type, _ in self._client.watch(
+                self._resource, namespace=self._namespace, fields={"metadata.name": self._name}
+            ):
+                if event_type in ("ADDED", "MODIFIED"):
+                    self.done.set()
+                    return
+        except Exception as e:
+            self.error = e
+            self.done.set()
+
+
+def _health_check_properties() -> dict:
+    """Returns the properties shared by the workloads' Pebble health checks."""
+    return {
+        "override": "replace",
+        "level": "alive",
+        "period": HEALTH_CHECK_PERIOD,
+        "timeout": HEALTH_CHECK_TIMEOUT,
+        "threshold": HEALTH_CHECK_THRESHOLD,
+    }
+
+
+def _layer_hash(layer: Layer) -> str:
+    """Returns a digest of a Pebble layer."""
+    return hashlib.sha256(layer.to_yaml().encode()).hexdigest()
+
+
+def _comma_separated(value: str) -> List[str]:
+    """Returns the non-empty, stripped items of a comma-separated config option."""
+    return [item.strip() for item in value.split(",") if item.strip()]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Tuning of the Go runtime of workloads to the cgroup limits of their containers.
+
+Go defaults GOMAXPROCS to the number of cores of the node and sets no soft memory limit, so a
+container limited to a fraction of a big node gets throttled and only collects garbage when the
+heap doubles.  The limits are read from the container's cgroup (v2, falling back to v1) and
+turned into GOMAXPROCS and GOMEMLIMIT environment variables for its Pebble layer.
+"""
+
+import logging
+import math
+import re
+from typing import Dict, NamedTuple, Optional
+
+from ops.model import Container
+from ops.pebble import Error as PebbleError
+
+logger = logging.getLogger(__name__)
+
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V2_MEMORY_MAX = "/sys/fs/cgroup/memory.max"
+CGROUP_V1_CPU_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_CPU_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+CGROUP_V1_MEMORY_LIMIT = "/sys/fs/cgroup/memory/memory.limit_in_bytes"
+# cgroup v1 reports an unlimited memory as a huge page-aligned number, rather than "max"
+CGROUP_V1_UNLIMITED_MEMORY = 2**62
+
+# Share of the memory limit the Go heap is kept under, leaving room for non-heap memory
+GOMEMLIMIT_RATIO = 0.9
+# The format of GOMEMLIMIT, as accepted by the Go runtime
+GOMEMLIMIT_FORMAT = re.compile(r"^\d+(B|KiB|MiB|GiB|TiB)?$")
+
+
+class CgroupLimits(NamedTuple):
+    """The CPU (in cores) and memory (in bytes) limits of a container, None if unlimited."""
+
+    cpu: Optional[float] = None
+    memory: Optional[int] = None
+
+
+def read_cgroup_limits(container: Container) -> CgroupLimits:
+    """Returns the cgroup limits of a running container, read through Pebble."""
+    cpu_max = _read(container, CGROUP_V2_CPU_MAX)
+    if cpu_max is not None:
+        memory_max = _read(container, CGROUP_V2_MEMORY_MAX)
+        return CgroupLimits(cpu=_parse_cpu_max(cpu_max), memory=_parse_memory_max(memory_max))
+
+    quota = _read(container, CGROUP_V1_CPU_QUOTA)
+    period = _read(container, CGROUP_V1_CPU_PERIOD)
+    memory_limit = _read(container, CGROUP_V1_MEMORY_LIMIT)
+    cpu = None
+    if quota is not None and period is not None and int(quota) > 0:
+        cpu = int(quota) / int(period)
+    memory = None
+    if memory_limit is not None and int(memory_limit) < CGROUP_V1_UNLIMITED_MEMORY:
+        memory = int(memory_limit)
+    return CgroupLimits(cpu=cpu, memory=memory)
+
+
+def go_runtime_environment(
+    limits: CgroupLimits, gomaxprocs: int = 0, gomemlimit: str = ""
+) -> Dict[str, str]:
+    """Returns the GOMAXPROCS and GOMEMLIMIT environment variables for a container.
+
+    Args:
+        limits: the cgroup limits of the container.
+        gomaxprocs: (Optional) overrides the GOMAXPROCS derived from the CPU limit, if not 0.
+        gomemlimit: (Optional) overrides the GOMEMLIMIT derived from the memory limit, if set.
+
+    Raises:
+        ValueError: if gomaxprocs or gomemlimit are not valid.
+    """
+    if gomaxprocs < 0:
+        raise ValueError(f"GOMAXPROCS must be a positive number, got {gomaxprocs}")
+    if gomemlimit and not GOMEMLIMIT_FORMAT.match(gomemlimit):
+        raise ValueError(f"GOMEMLIMIT must be a number of bytes, eg: 512MiB, got {gomemlimit}")
+
+    environment = {}
+    if gomaxprocs:
+        environment["GOMAXPROCS"] = str(gomaxprocs)
+    elif limits.cpu is not None:
+        # Rounded down, as the Go runtime would get throttled trying to use a partial core
+        environment["GOMAXPROCS"] = str(max(1, math.floor(limits.cpu)))
+    if gomemlimit:
+        environment["GOMEMLIMIT"] = gomemlimit
+    elif limits.memory is not None:
+        environment["GOMEMLIMIT"] = str(int(limits.memory * GOMEMLIMIT_RATIO))
+    return environment
+
+
+def _read(container: Container, path: str) -> Optional[str]:
+    """Returns the stripped content of a file in the container, or None if it is missing."""
+    try:
+        return container.pull(path).read().strip()
+    except PebbleError:
+        return None
+
+
+def _parse_cpu_max(cpu_max: str) -> Optional[float]:
+    """Parses the `$MAX $PERIOD` of cgroup v2's cpu.max into cores."""
+    quota, _, period = cpu_max.partition(" ")
+    if quota == "max":
+        return None
+    return int(quota) / int(period or 100000)
+
+
+def _parse_memory_max(memory_max: Optional[str]) -> Optional[int]:
+    """Parses cgroup v2's memory.max into bytes."""
+    if memory_max is None or memory_max == "max":
+        return None
+    return int(memory_max)
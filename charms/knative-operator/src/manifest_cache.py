@@ -0,0 +1,128 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Persistent cache of rendered Kubernetes manifests, shared across hook executions."""
+
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Optional
+
+from charmed_kubeflow_chisme.kubernetes import KubernetesResourceHandler
+from charmed_kubeflow_chisme.types import LightkubeResourcesList
+from jinja2 import Template
+from lightkube import codecs
+from lightkube.generic_resource import create_resources_from_crd
+
+from precompiled_manifests import load_precompiled_manifests
+from reconcile_state import manifests_digest
+
+
+class CachedKubernetesResourceHandler(KubernetesResourceHandler):
+    """A KubernetesResourceHandler that persists its rendered manifests on disk.
+
+    Rendering and parsing the templates is skipped whenever a previous hook already rendered
+    the same template files with the same context; the parsed objects are loaded from a JSON
+    cache file instead. The cache holds a single entry per `cache_name`.
+
+    On a cache miss, templates that were precompiled when the charm was packed (see
+    precompiled_manifests) are loaded from their precompiled form instead of being rendered.
+    """
+
+    def __init__(self, *args, cache_dir: Optional[Path] = None, cache_name: str = "", **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_file = Path(cache_dir) / f"{cache_name}.json" if cache_dir else None
+
+    def render_manifests(
+        self,
+        template_files: Optional[Iterable[str]] = None,
+        context: Optional[dict] = None,
+        force_recompute: bool = False,
+        create_resources_for_crds: bool = True,
+    ) -> LightkubeResourcesList:
+        """Renders the manifests, loading them from the on-disk cache when possible.
+
+        See KubernetesResourceHandler.render_manifests for a description of the arguments.
+        """
+        if template_files is not None:
+            self.template_files = template_files
+        if context is not None:
+            self.context = context
+
+        if self._cache_file is None or (self._manifests is not None and not force_recompute):
+            return super().render_manifests(
+                force_recompute=force_recompute,
+                create_resources_for_crds=create_resources_for_crds,
+            )
+
+        digest = manifests_digest(
+            self.template_files, {"context": self.context, "labels": self.labels}
+        )
+        if not force_recompute:
+            cached_manifests = self._read_cache(digest)
+            if cached_manifests is not None:
+                self.log.info("Loading rendered manifests from cache")
+                self._manifests = _load_manifests(cached_manifests, create_resources_for_crds)
+                return self._manifests
+
+        manifests = self._render_templates(create_resources_for_crds)
+        self._write_cache(digest, manifests)
+        return manifests
+
+    def _render_templates(self, create_resources_for_crds: bool) -> LightkubeResourcesList:
+        """Renders the template files, using their precompiled form where one is available."""
+        if self.labels is not None:
+            # Labelling resources is left to KubernetesResourceHandler
+            return super().render_manifests(
+                force_recompute=True, create_resources_for_crds=create_resources_for_crds
+            )
+
+        manifests = []
+        for template_file in self.template_files:
+            precompiled_manifests = load_precompiled_manifests(template_file, self.context)
+            if precompiled_manifests is not None:
+                self.log.info(f"Loading precompiled manifests for {template_file}")
+                manifests.extend(_load_manifests(precompiled_manifests, create_resources_for_crds))
+            else:
+                self.log.debug(f"Rendering manifest for {template_file}")
+                rendered = Template(Path(template_file).read_text()).render(**self.context)
+                manifests.extend(
+                    codecs.load_all_yaml(
+                        rendered, create_resources_for_crds=create_resources_for_crds
+                    )
+                )
+        self._manifests = manifests
+        return manifests
+
+    def _read_cache(self, digest: str) -> Optional[list]:
+        """Returns the cached manifests as a list of dicts, or None if they are not cached."""
+        try:
+            cache = json.loads(self._cache_file.read_text())
+        except (OSError, ValueError):
+            return None
+        if cache.get("digest") != digest:
+            return None
+        return cache.get("manifests")
+
+    def _write_cache(self, digest: str, manifests: LightkubeResourcesList) -> None:
+        """Writes the rendered manifests to the cache file, replacing any previous entry."""
+        cache = {"digest": digest, "manifests": [manifest.to_dict() for manifest in manifests]}
+        tmp_file = self._cache_file.with_suffix(".tmp")
+        try:
+            self._cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file.write_text(json.dumps(cache))
+            os.replace(tmp_file, self._cache_file)
+        except OSError as e:
+            # A missing cache only costs a re-render on the next hook
+            self.log.warning(f"Failed to write manifests cache {self._cache_file}: {e}")
+
+
+def _load_manifests(manifests: list, create_resources_for_crds: bool) -> LightkubeResourcesList:
+    """Loads lightkube objects from their dict representation, as codecs.load_all_yaml does."""
+    resources = []
+    for manifest in manifests:
+        resource = codecs.from_dict(manifest)
+        if create_resources_for_crds and resource.kind == "CustomResourceDefinition":
+            create_resources_from_crd(resource)
+        resources.append(resource)
+    return resources
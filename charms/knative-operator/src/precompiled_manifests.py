@@ -0,0 +1,142 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Build-time precompilation of (mostly static) manifest templates.
+
+Some templates, such as the CRD manifests, are thousands of lines long but only substitute a
+couple of variables.  Rather than running them through Jinja and parsing the resulting YAML in a
+hook, they are parsed once when the charm is packed into a JSON file holding the manifests and the
+location of each `{{ variable }}` placeholder, which are then resolved with the context at runtime.
+
+Usage (at build time):
+    python3 src/precompiled_manifests.py TEMPLATE_FILE OUTPUT_FILE
+"""
+
+import hashlib
+import json
+import logging
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# The only Jinja construct supported in precompiled templates
+PLACEHOLDER = re.compile(r"{{\s*(\w+)\s*}}")
+PRECOMPILED_SUFFIX = ".precompiled.json"
+
+
+def precompiled_file(template_file: Union[str, Path]) -> Path:
+    """Returns the path of the precompiled form of template_file."""
+    template_file = Path(template_file)
+    return template_file.with_name(template_file.name.split(".")[0] + PRECOMPILED_SUFFIX)
+
+
+def precompile(template: str) -> dict:
+    """Parses a manifest template, recording where its placeholders are.
+
+    Args:
+        template: the template's source.  Its only Jinja constructs must be `{{ variable }}`
+                  placeholders within scalar values, which will always be resolved to strings.
+
+    Returns:
+        A dict holding the digest of the template, the parsed manifests (with the placeholders
+        left as is) and the path to every value holding a placeholder.
+
+    Raises:
+        ValueError: if the template cannot be precompiled.
+    """
+    tokenized, placeholders = _tokenize(template)
+    manifests = [manifest for manifest in yaml.safe_load_all(tokenized) if manifest]
+
+    paths = []
+    manifests = [
+        _restore(manifest, [index], placeholders, paths)
+        for index, manifest in enumerate(manifests)
+    ]
+    return {"digest": _digest(template), "manifests": manifests, "placeholders": paths}
+
+
+def _tokenize(template: str) -> Tuple[str, Dict[str, str]]:
+    """Swaps the placeholders of template for tokens that YAML parses as (part of) plain strings.
+
+    Returns:
+        The tokenized template and the placeholder of each token.
+
+    Raises:
+        ValueError: if the template has Jinja constructs other than placeholders.
+    """
+    if "{%" in template or "{#" in template:
+        raise ValueError("Only templates with `{{ variable }}` placeholders can be precompiled")
+
+    placeholders = {}
+
+    def _swap(match):
+        token = f"precompiled-placeholder-{len(placeholders)}-end"
+        placeholders[token] = match.group(0)
+        return token
+
+    tokenized = PLACEHOLDER.sub(_swap, template)
+    if "{{" in tokenized:
+        raise ValueError("Only templates with `{{ variable }}` placeholders can be precompiled")
+    return tokenized, placeholders
+
+
+def _restore(value, path: list, placeholders: Dict[str, str], paths: List[list]):
+    """Restores the placeholders of the tokens within value, appending their paths to paths."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if any(token in str(key) for token in placeholders):
+                raise ValueError(f"Placeholders are not supported in keys, found in {key}")
+            value[key] = _restore(item, path + [key], placeholders, paths)
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            value[index] = _restore(item, path + [index], placeholders, paths)
+    elif isinstance(value, str) and any(token in value for token in placeholders):
+        for token, placeholder in placeholders.items():
+            value = value.replace(token, placeholder)
+        paths.append(path)
+    return value
+
+
+def load_precompiled_manifests(
+    template_file: Union[str, Path], context: dict
+) -> Optional[List[dict]]:
+    """Returns the manifests of template_file rendered from its precompiled form.
+
+    Returns None if template_file has not been precompiled, or has changed since it was.
+    """
+    try:
+        precompiled = json.loads(precompiled_file(template_file).read_text())
+    except (OSError, ValueError):
+        return None
+    if precompiled.get("digest") != _digest(Path(template_file).read_text()):
+        logger.warning(f"Precompiled form of {template_file} is out of date, ignoring it")
+        return None
+
+    manifests = precompiled["manifests"]
+    for path in precompiled["placeholders"]:
+        parent = manifests
+        for key in path[:-1]:
+            parent = parent[key]
+        parent[path[-1]] = PLACEHOLDER.sub(
+            lambda match: str(context[match.group(1)]), parent[path[-1]]
+        )
+    return manifests
+
+
+def _digest(template: str) -> str:
+    return hashlib.sha256(template.encode()).hexdigest()
+
+
+def main(template_file: str, output_file: str) -> None:
+    """Precompiles template_file, writing its compact JSON form to output_file."""
+    precompiled = precompile(Path(template_file).read_text())
+    Path(output_file).write_text(json.dumps(precompiled, separators=(",", ":")))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,126 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Patching the resource requests and limits of the charm's workload containers.
+
+Juju creates the charm's StatefulSet without any resource requests or limits for the workload
+containers, so these are patched into it from the charm's config.  Patching the StatefulSet
+rolls its pod out again, which is reported as pending until the rollout completes.
+"""
+
+import logging
+from typing import Dict, Mapping
+
+from lightkube import Client
+from lightkube.models.apps_v1 import StatefulSet as StatefulSetModel
+from lightkube.resources.apps_v1 import StatefulSet
+from lightkube.types import PatchType
+from lightkube.utils.quantity import equals_canonically, parse_quantity
+
+logger = logging.getLogger(__name__)
+
+RESOURCES = ("cpu", "memory")
+# Config option suffix of each field of a container's resources
+RESOURCE_FIELDS = {"requests": "request", "limits": "limit"}
+
+# The resources of a container, eg: {"requests": {"cpu": "500m"}, "limits": {"memory": "1Gi"}}
+ContainerResources = Dict[str, Dict[str, str]]
+
+
+def container_resources(config: Mapping, container_name: str) -> ContainerResources:
+    """Returns the resources of a container from its config options.
+
+    Each request and limit is read from the `<container>-<cpu|memory>-<request|limit>` option,
+    and left out if the option is not set.
+
+    Raises:
+        ValueError: if a config option is not a valid quantity, or a request exceeds its limit.
+    """
+    resources = {field: {} for field in RESOURCE_FIELDS}
+    for field, suffix in RESOURCE_FIELDS.items():
+        for resource in RESOURCES:
+            option = f"{container_name}-{resource}-{suffix}"
+            value = config.get(option)
+            if not value:
+                continue
+            try:
+                parse_quantity(value)
+            except ValueError:
+                raise ValueError(f"{option} is not a valid quantity: {value}")
+            resources[field][resource] = value
+
+    for resource in RESOURCES:
+        request = resources["requests"].get(resource)
+        limit = resources["limits"].get(resource)
+        if request and limit and parse_quantity(request) > parse_quantity(limit):
+            raise ValueError(f"{container_name} {resource} request {request} exceeds its limit")
+    return resources
+
+
+def patch_statefulset_resources(
+    client: Client, name: str, namespace: str, resources: Dict[str, ContainerResources]
+) -> bool:
+    """Patches the resources of the StatefulSet's containers, unless they are already set.
+
+    Args:
+        client: the lightkube Client to use.
+        name: the name of the StatefulSet.
+        namespace: the namespace of the StatefulSet.
+        resources: the resources of each container, by container name.  Requests and limits
+                   that are not set are removed from the container.
+
+    Returns:
+        True if the StatefulSet was patched and its pods are still being rolled out with the
+        patched resources.  Rollouts of a StatefulSet whose resources already match (eg: an
+        upgrade of the charm) are not reported.
+    """
+    statefulset = client.get(StatefulSet, name, namespace=namespace)
+    if _resources_match(statefulset, resources):
+        return False
+    logger.info(f"Patching the resources of StatefulSet {name}: {resources}")
+    statefulset = client.patch(
+        StatefulSet,
+        name,
+        _resources_patch(resources),
+        namespace=namespace,
+        patch_type=PatchType.STRATEGIC,
+    )
+    return not _rolled_out(statefulset)
+
+
+def _resources_match(statefulset: StatefulSetModel, resources: Dict[str, ContainerResources]):
+    """Returns True if the StatefulSet's containers have exactly the given resources."""
+    current = {
+        container.name: container.resources
+        for container in statefulset.spec.template.spec.containers
+    }
+    for container_name, container_resources in resources.items():
+        current_resources = current.get(container_name)
+        for field, desired in container_resources.items():
+            actual = getattr(current_resources, field, None) or {}
+            if not equals_canonically(actual, desired):
+                return False
+    return True
+
+
+def _resources_patch(resources: Dict[str, ContainerResources]) -> dict:
+    """Returns a strategic merge patch setting the containers' resources."""
+    containers = []
+    for container_name, container_resources in resources.items():
+        # Explicit nulls remove requests and limits that are no longer set
+        patch = {
+            field: {resource: container_resources[field].get(resource) for resource in RESOURCES}
+            for field in RESOURCE_FIELDS
+        }
+        containers.append({"name": container_name, "resources": patch})
+    return {"spec": {"template": {"spec": {"containers": containers}}}}
+
+
+def _rolled_out(statefulset: StatefulSetModel) -> bool:
+    """Returns True if every pod of the StatefulSet runs its latest revision."""
+    status = statefulset.status
+    if status is None:
+        return False
+    if (status.observedGeneration or 0) < (statefulset.metadata.generation or 0):
+        return False
+    return status.updateRevision is None or status.currentRevision == status.updateRevision
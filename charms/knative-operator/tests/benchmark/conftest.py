@@ -0,0 +1,79 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+from unittest.mock import PropertyMock
+
+import pytest
+from charms.observability_libs.v1.kubernetes_service_patch import KubernetesServicePatch
+from fake_kubernetes import FakeKubernetes
+from lightkube.models.apps_v1 import StatefulSetSpec, StatefulSetStatus
+from lightkube.models.core_v1 import Container, PodSpec, PodTemplateSpec, ServicePort, ServiceSpec
+from lightkube.models.meta_v1 import LabelSelector, ObjectMeta
+from lightkube.resources.apps_v1 import StatefulSet
+from lightkube.resources.core_v1 import Service
+from ops.testing import Harness
+
+from charm import KNATIVE_OPERATOR, KNATIVE_OPERATOR_WEBHOOK, KnativeOperatorCharm
+
+MODEL_NAME = "knative-operator"
+
+
+@pytest.fixture()
+def fake_kubernetes():
+    """Returns a FakeKubernetes holding the objects Juju creates for the charm."""
+    fake_kubernetes = FakeKubernetes(namespace=MODEL_NAME)
+    fake_kubernetes.add(
+        Service(
+            metadata=ObjectMeta(name="knative-operator", namespace=MODEL_NAME),
+            spec=ServiceSpec(ports=[ServicePort(port=65535, name="placeholder")]),
+        )
+    )
+    fake_kubernetes.add(
+        StatefulSet(
+            metadata=ObjectMeta(name="knative-operator", namespace=MODEL_NAME, generation=1),
+            spec=StatefulSetSpec(
+                selector=LabelSelector(),
+                serviceName="knative-operator",
+                template=PodTemplateSpec(
+                    spec=PodSpec(
+                        containers=[
+                            Container(name="charm"),
+                            Container(name=KNATIVE_OPERATOR),
+                            Container(name=KNATIVE_OPERATOR_WEBHOOK),
+                        ]
+                    )
+                ),
+            ),
+            status=StatefulSetStatus(
+                replicas=1,
+                observedGeneration=1,
+                currentRevision="knative-operator-1",
+                updateRevision="knative-operator-1",
+            ),
+        )
+    )
+    yield fake_kubernetes
+
+
+@pytest.fixture()
+def harness(fake_kubernetes, mocker, tmp_path):
+    """Returns a harnessed charm whose Kubernetes clients all talk to fake_kubernetes."""
+    mocker.patch("charm.Client", side_effect=fake_kubernetes.client)
+    mocker.patch(
+        "charms.observability_libs.v1.kubernetes_service_patch.Client",
+        side_effect=fake_kubernetes.client,
+    )
+    mocker.patch.object(
+        KubernetesServicePatch, "_namespace", new_callable=PropertyMock, return_value=MODEL_NAME
+    )
+    # Start every benchmark with an empty cache of rendered manifests
+    mocker.patch("charm.MANIFESTS_CACHE_DIR", tmp_path / "manifests-cache")
+
+    harness = Harness(KnativeOperatorCharm)
+    harness.set_model_name(MODEL_NAME)
+    harness.set_leader(True)
+    harness.set_can_connect(KNATIVE_OPERATOR, True)
+    harness.set_can_connect(KNATIVE_OPERATOR_WEBHOOK, True)
+    harness.begin()
+    yield harness
+    harness.cleanup()
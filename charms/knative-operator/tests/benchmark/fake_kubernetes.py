@@ -0,0 +1,266 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""An in-memory stand-in for the Kubernetes API server, used to benchmark the charm's hooks.
+
+FakeKubernetes implements just enough of the API for lightkube: get, list, watch, create,
+replace, (server-side apply and merge) patch and delete of any resource, keyed by its URL.  It
+counts the requests made and the bytes transferred, so that hooks can be checked against a budget
+without a cluster.  Controllers reconciling objects (eg: setting their status) can be stood in for
+by functions called on each object stored.
+"""
+
+import copy
+import itertools
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import httpx
+from lightkube import Client
+from lightkube.codecs import AnyResource
+from lightkube.config.kubeconfig import KubeConfig
+from lightkube.core.resource import NamespacedResource, api_info
+
+SERVER = "https://fake-kubernetes:6443"
+# How long a watch waits for a matching object to be created before ending its stream
+WATCH_TIMEOUT = 1
+
+# (API prefix, namespace, plural) of a collection of resources, eg: ("api/v1", "ns", "pods")
+CollectionKey = Tuple[str, Optional[str], str]
+
+
+class FakeKubernetes:
+    """An in-memory Kubernetes API server serving lightkube Clients through an httpx transport."""
+
+    def __init__(self, namespace: str = "default", watch_timeout: float = WATCH_TIMEOUT):
+        self._namespace = namespace
+        self._watch_timeout = watch_timeout
+        self._collections: Dict[CollectionKey, Dict[str, dict]] = {}
+        self._resource_versions = itertools.count(1)
+        self._changed = threading.Condition()
+        # Stand-ins for the controllers of objects, by plural, called on each object stored
+        self.controllers: Dict[str, Callable[[dict], None]] = {}
+        self.transport = httpx.MockTransport(self._handle)
+        self.reset_stats()
+
+    def client(self, *args, **kwargs) -> Client:
+        """Returns a lightkube Client talking to this fake, taking the same args as Client."""
+        kwargs["config"] = _kubeconfig(self._namespace)
+        kwargs["transport"] = self.transport
+        return Client(*args, **kwargs)
+
+    def reset_stats(self) -> None:
+        """Resets the request and bytes counters."""
+        with self._changed:
+            self.requests = 0
+            self.requests_by_method: Dict[str, int] = {}
+            self.bytes_sent = 0
+            self.bytes_received = 0
+
+    @property
+    def bytes_transferred(self) -> int:
+        """Returns the bytes sent and received by clients since the counters were reset."""
+        return self.bytes_sent + self.bytes_received
+
+    def add(self, obj: AnyResource) -> None:
+        """Adds obj to the fake's objects, as if it had been created by someone else."""
+        info = api_info(type(obj))
+        api_version = info.resource.api_version
+        prefix = f"apis/{api_version}" if info.resource.group else f"api/{api_version}"
+        namespace = obj.metadata.namespace if isinstance(obj, NamespacedResource) else None
+        self._store((prefix, namespace, info.plural), obj.metadata.name, obj.to_dict())
+
+    def objects(self) -> Iterator[dict]:
+        """Yields every object stored in the fake."""
+        with self._changed:
+            for collection in self._collections.values():
+                yield from list(collection.values())
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        with self._changed:
+            self.requests += 1
+            self.requests_by_method[request.method] = (
+                self.requests_by_method.get(request.method, 0) + 1
+            )
+            self.bytes_sent += len(request.content)
+
+        key, name = _parse_path(request.url.path)
+        if request.method == "GET" and name is None:
+            if request.url.params.get("watch") == "true":
+                return httpx.Response(200, content=self._watch(key, request.url.params))
+            response = self._list(key, request.url.params)
+        elif request.method == "GET":
+            response = self._get(key, name)
+        elif request.method == "POST":
+            response = self._create(key, json.loads(request.content))
+        elif request.method == "PUT":
+            response = self._replace(key, name, json.loads(request.content))
+        elif request.method == "PATCH":
+            response = self._patch(
+                key, name, json.loads(request.content), request.headers["Content-Type"]
+            )
+        elif request.method == "DELETE":
+            response = self._delete(key, name)
+        else:
+            response = _status(405, "MethodNotAllowed")
+
+        with self._changed:
+            self.bytes_received += len(response.content)
+        return response
+
+    def _get(self, key: CollectionKey, name: str) -> httpx.Response:
+        with self._changed:
+            obj = self._collections.get(key, {}).get(name)
+        if obj is None:
+            return _status(404, "NotFound")
+        return httpx.Response(200, json=obj)
+
+    def _list(self, key: CollectionKey, params: httpx.QueryParams) -> httpx.Response:
+        with self._changed:
+            items = [
+                obj for obj in self._collections.get(key, {}).values() if _matches(obj, params)
+            ]
+        return httpx.Response(
+            200, json={"metadata": {"resourceVersion": self._resource_version()}, "items": items}
+        )
+
+    def _watch(self, key: CollectionKey, params: httpx.QueryParams) -> Iterator[bytes]:
+        deadline = time.monotonic() + self._watch_timeout
+        with self._changed:
+            while True:
+                items = [
+                    obj for obj in self._collections.get(key, {}).values() if _matches(obj, params)
+                ]
+                remaining = deadline - time.monotonic()
+                if items or remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+        for obj in items:
+            line = json.dumps({"type": "ADDED", "object": obj}).encode() + b"\n"
+            with self._changed:
+                self.bytes_received += len(line)
+            yield line
+
+    def _create(self, key: CollectionKey, obj: dict) -> httpx.Response:
+        name = obj["metadata"]["name"]
+        with self._changed:
+            if name in self._collections.get(key, {}):
+                return _status(409, "AlreadyExists")
+            return httpx.Response(201, json=self._store(key, name, obj))
+
+    def _replace(self, key: CollectionKey, name: str, obj: dict) -> httpx.Response:
+        with self._changed:
+            if name not in self._collections.get(key, {}):
+                return _status(404, "NotFound")
+            return httpx.Response(200, json=self._store(key, name, obj))
+
+    def _patch(self, key: CollectionKey, name: str, patch: dict, content_type: str):
+        if content_type not in (
+            "application/apply-patch+yaml",
+            "application/merge-patch+json",
+            "application/strategic-merge-patch+json",
+        ):
+            return _status(415, "UnsupportedMediaType")
+        with self._changed:
+            existing = self._collections.get(key, {}).get(name)
+            if existing is None and content_type != "application/apply-patch+yaml":
+                return _status(404, "NotFound")
+            return httpx.Response(200, json=self._store(key, name, _merge(existing or {}, patch)))
+
+    def _delete(self, key: CollectionKey, name: str) -> httpx.Response:
+        with self._changed:
+            if self._collections.get(key, {}).pop(name, None) is None:
+                return _status(404, "NotFound")
+        return _status(200, "Success")
+
+    def _store(self, key: CollectionKey, name: str, obj: dict) -> dict:
+        obj = copy.deepcopy(obj)
+        obj.setdefault("metadata", {})
+        obj["metadata"]["name"] = name
+        if key[1] is not None:
+            obj["metadata"]["namespace"] = key[1]
+        if key[2] in self.controllers:
+            self.controllers[key[2]](obj)
+        with self._changed:
+            obj["metadata"]["resourceVersion"] = self._resource_version()
+            self._collections.setdefault(key, {})[name] = obj
+            self._changed.notify_all()
+        return obj
+
+    def _resource_version(self) -> str:
+        return str(next(self._resource_versions))
+
+
+def _kubeconfig(namespace: str) -> KubeConfig:
+    return KubeConfig.from_dict(
+        {
+            "clusters": [{"name": "fake", "cluster": {"server": SERVER}}],
+            "users": [{"name": "fake", "user": {}}],
+            "contexts": [
+                {
+                    "name": "fake",
+                    "context": {"cluster": "fake", "user": "fake", "namespace": namespace},
+                }
+            ],
+            "current-context": "fake",
+        }
+    )
+
+
+def _parse_path(path: str) -> Tuple[CollectionKey, Optional[str]]:
+    """Returns the collection and (optional) name of the object an API path refers to."""
+    parts = path.strip("/").split("/")
+    if parts[0] == "api":
+        prefix, rest = parts[:2], parts[2:]
+    else:
+        prefix, rest = parts[:3], parts[3:]
+    namespace = None
+    if rest[0] == "namespaces" and len(rest) >= 3:
+        namespace, rest = rest[1], rest[2:]
+    name = rest[1] if len(rest) > 1 else None
+    return ("/".join(prefix), namespace, rest[0]), name
+
+
+def _matches(obj: dict, params: httpx.QueryParams) -> bool:
+    """Returns True if obj matches the (equality only) field and label selectors in params."""
+    metadata = obj["metadata"]
+    for selector in filter(None, params.get("fieldSelector", "").split(",")):
+        field, value = selector.split("=", 1)
+        if field != "metadata.name" or metadata["name"] != value:
+            return False
+    labels = metadata.get("labels") or {}
+    for selector in filter(None, params.get("labelSelector", "").split(",")):
+        label, _, value = selector.partition("=")
+        if label not in labels or (value and labels[label] != value):
+            return False
+    return True
+
+
+def _merge(obj: dict, patch: dict) -> dict:
+    """Returns obj with patch merged into it, following JSON merge patch semantics."""
+    merged = copy.deepcopy(obj)
+    for key, value in patch.items():
+        if value is None:
+            merged.pop(key, None)
+        elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def _status(code: int, reason: str) -> httpx.Response:
+    return httpx.Response(
+        code,
+        json={
+            "apiVersion": "v1",
+            "kind": "Status",
+            "status": "Success" if code < 400 else "Failure",
+            "message": reason,
+            "reason": reason,
+            "code": code,
+        },
+    )
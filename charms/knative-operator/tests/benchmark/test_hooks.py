@@ -0,0 +1,85 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Checks the latency and Kubernetes API usage of the charm's hooks against a budget.
+
+Budgets are set with some headroom above the measured values, so that they catch regressions
+(eg: an extra request per resource, or rendering the templates twice) rather than noise.  Update
+them alongside any change that deliberately changes the cost of a hook.
+"""
+
+import time
+from typing import NamedTuple
+
+from ops.model import ActiveStatus
+
+
+class Budget(NamedTuple):
+    seconds: float
+    requests: int
+    bytes_transferred: int
+
+
+BUDGETS = {
+    # Applies every resource, patches the Service and waits for the required resources
+    "install": Budget(seconds=5, requests=35, bytes_transferred=450_000),
+    # The context of every manifest changed, so every resource is applied again
+    "config-changed": Budget(seconds=5, requests=30, bytes_transferred=450_000),
+    # Deletes every resource, including the observability ones and the Service, once
+    "remove": Budget(seconds=2, requests=30, bytes_transferred=5_000),
+}
+
+
+def start_hook(charm):
+    """Drops what the charm caches for the duration of a hook, as if it ran in a new process."""
+    for attribute in ("_lightkube_client", "_resource_handler", "_observability_resource_handler"):
+        if hasattr(charm, attribute):
+            setattr(charm, attribute, None)
+
+
+def run_within_budget(harness, fake_kubernetes, hook, emit):
+    """Emits a hook, asserting that it stays within its budget."""
+    budget = BUDGETS[hook]
+    start_hook(harness.charm)
+    fake_kubernetes.reset_stats()
+
+    started_at = time.perf_counter()
+    emit()
+    seconds = time.perf_counter() - started_at
+
+    print(
+        f"{hook}: {seconds:.3f}s, {fake_kubernetes.requests} requests"
+        f" {fake_kubernetes.requests_by_method}, {fake_kubernetes.bytes_transferred} bytes"
+    )
+    assert seconds <= budget.seconds
+    assert fake_kubernetes.requests <= budget.requests
+    assert fake_kubernetes.bytes_transferred <= budget.bytes_transferred
+
+
+def test_install(harness, fake_kubernetes):
+    run_within_budget(harness, fake_kubernetes, "install", harness.charm.on.install.emit)
+
+    assert harness.model.unit.status == ActiveStatus()
+
+
+def test_config_changed(harness, fake_kubernetes):
+    harness.charm.on.install.emit()
+
+    run_within_budget(
+        harness,
+        fake_kubernetes,
+        "config-changed",
+        lambda: harness.update_config({"otel-collector-image": "otel-collector:latest"}),
+    )
+
+    assert harness.model.unit.status == ActiveStatus()
+
+
+def test_remove(harness, fake_kubernetes):
+    harness.charm.on.install.emit()
+
+    run_within_budget(harness, fake_kubernetes, "remove", harness.charm.on.remove.emit)
+
+    # The service patcher also deletes the application's Service, only the StatefulSet Juju
+    # deletes is left
+    assert [obj["kind"] for obj in fake_kubernetes.objects()] == ["StatefulSet"]
@@ -3,18 +3,26 @@
 # See LICENSE file for licensing details.
 
 import datetime
+import json
+import threading
+import time
 from contextlib import nullcontext as does_not_raise
-from unittest.mock import ANY, MagicMock, patch
+from pathlib import Path
+from unittest.mock import ANY, MagicMock, PropertyMock, patch
 
 import pytest
+import yaml
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus, GenericCharmRuntimeError
+from jinja2 import Template
 from lightkube.core.exceptions import ApiError
-from lightkube.models.core_v1 import ServiceSpec
+from lightkube.models.discovery_v1 import Endpoint, EndpointConditions
 from lightkube.models.meta_v1 import ObjectMeta
-from lightkube.resources.core_v1 import Service
+from lightkube.resources.core_v1 import ConfigMap, Secret
+from lightkube.resources.discovery_v1 import EndpointSlice
+from ops.charm import PebbleReadyEvent
 from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus
-from ops.pebble import Change, ChangeError, ChangeID
+from ops.pebble import Change, ChangeError, ChangeID, CheckInfo, CheckLevel, CheckStatus
 from ops.testing import Harness
-from tenacity import Retrying, stop_after_attempt
 
 from charm import (
     KNATIVE_OPERATOR,
@@ -24,6 +32,7 @@ from charm import (
     KnativeOperatorCharm,
     wait_for_required_kubernetes_resources,
 )
+from reconcile_state import ResourceReference
 
 
 class _FakeChange:
@@ -82,11 +91,17 @@ def mocked_resource_handler(mocker):
     yield mocked_resource_handler
 
 
-@pytest.fixture()
-def mocked_lightkube_client(mocker, mocked_resource_handler):
+@pytest.fixture(autouse=True)
+def mocked_lightkube_client(mocker):
     """Prevents lightkube clients from being created, returning a mock instead."""
-    mocked_resource_handler.lightkube_client = MagicMock()
-    yield mocked_resource_handler.lightkube_client
+    mocked_lightkube_client_class = mocker.patch("charm.Client")
+    yield mocked_lightkube_client_class.return_value
+
+
+@pytest.fixture(autouse=True)
+def mocked_patch_statefulset_resources(mocker):
+    """Leaves the charm's StatefulSet alone, as if its resources matched the config."""
+    yield mocker.patch("charm.patch_statefulset_resources", return_value=False)
 
 
 @pytest.fixture()
@@ -107,27 +122,139 @@ def test_log_forwarding(harness, mocked_resource_handler, mocked_metrics_endpoin
         mock_logging.assert_called_once_with(charm=harness.charm)
 
 
-@pytest.mark.parametrize("otel_ip", [None, "1.2.3.4"])
 def test_metrics(
-    harness, mocked_resource_handler, mocked_metrics_endpoint_provider, mocker, otel_ip
+    harness, mocked_resource_handler, mocked_metrics_endpoint_provider, mocked_lightkube_client
 ):
     """Test MetricsEndpointProvider initialization."""
-    exp_targets = ["*:9090"]
-    if otel_ip:
-        exp_targets.append(f"{otel_ip}:8889")
-
-    with patch("charm.KnativeOperatorCharm._otel_exporter_ip", otel_ip), patch(
-        "charm.KubernetesServicePatch"
-    ) as mocked_service_patcher, patch("charm.ServicePort") as mock_service_port:
+    with patch("charm.KubernetesServicePatch") as mocked_service_patcher, patch(
+        "charm.ServicePort"
+    ) as mock_service_port:
         harness.begin()
         mocked_metrics_endpoint_provider.assert_called_once_with(
             harness.charm,
-            jobs=[{"static_configs": [{"targets": exp_targets}]}],
+            jobs=[{"static_configs": [{"targets": ["*:9090", "*:9091"]}]}],
             refresh_event=[ANY],
         )
         mocked_service_patcher.assert_called_once_with(
             harness.charm, [mock_service_port.return_value], service_name="knative-operator"
         )
+    # The otel exporter address must not be looked up when the charm is instantiated
+    mocked_lightkube_client.get.assert_not_called()
+
+
+@pytest.mark.parametrize("otel_ips", [[], ["1.2.3.4", "1.2.3.5"]])
+def test_scrape_jobs_use_cached_otel_collector_ips(
+    harness, mocked_resource_handler, mocked_metrics_endpoint_provider, otel_ips
+):
+    exp_targets = ["*:9090", "*:9091"] + [f"{otel_ip}:8889" for otel_ip in otel_ips]
+    harness.begin()
+
+    harness.charm._stored.otel_collector_ips = otel_ips
+
+    assert harness.charm._scrape_jobs == [{"static_configs": [{"targets": exp_targets}]}]
+
+
+def test_refresh_otel_collector_ips(
+    harness, mocked_resource_handler, mocked_metrics_endpoint_provider, mocker
+):
+    mocked_otel_collector_ips = mocker.patch(
+        "charm.KnativeOperatorCharm._otel_collector_ips", new_callable=PropertyMock
+    )
+    mocked_otel_collector_ips.return_value = ["1.2.3.4", "1.2.3.5"]
+    harness.begin()
+    assert harness.charm._otel_collector_ips_are_stale is True
+
+    harness.charm._refresh_otel_collector_ips()
+
+    assert harness.charm._stored.otel_collector_ips == ["1.2.3.4", "1.2.3.5"]
+    assert harness.charm._otel_collector_ips_are_stale is False
+    mocked_metrics_endpoint_provider.return_value.update_scrape_job_spec.assert_called_once_with(
+        [{"static_configs": [{"targets": ["*:9090", "*:9091", "1.2.3.4:8889", "1.2.3.5:8889"]}]}]
+    )
+
+    # Scrape jobs are only updated when the addresses change
+    harness.charm._refresh_otel_collector_ips()
+    mocked_metrics_endpoint_provider.return_value.update_scrape_job_spec.assert_called_once()
+
+
+def test_refresh_otel_collector_ips_retries_until_found(
+    harness, mocked_resource_handler, mocked_metrics_endpoint_provider, mocker
+):
+    """The collector's pods are not Ready right after it is applied, so none are found yet."""
+    mocked_otel_collector_ips = mocker.patch(
+        "charm.KnativeOperatorCharm._otel_collector_ips", new_callable=PropertyMock
+    )
+    mocked_otel_collector_ips.return_value = []
+    harness.begin()
+
+    harness.charm._refresh_otel_collector_ips()
+
+    assert harness.charm._otel_collector_ips_are_stale is True
+
+    mocked_otel_collector_ips.return_value = ["1.2.3.4"]
+    harness.charm._refresh_otel_collector_ips()
+
+    assert harness.charm._stored.otel_collector_ips == ["1.2.3.4"]
+    assert harness.charm._otel_collector_ips_are_stale is False
+
+
+def test_main_refreshes_otel_collector_ips_only_when_related(
+    harness,
+    mocked_resource_handler,
+    mocked_container_replan,
+    mocked_metrics_endpoint_provider,
+    mocker,
+):
+    mocker.patch("charm.wait_for_required_kubernetes_resources")
+    refresh = mocker.patch("charm.KnativeOperatorCharm._refresh_otel_collector_ips")
+    harness.begin()
+
+    harness.charm.on.config_changed.emit()
+
+    refresh.assert_not_called()
+
+
+def test_update_status_refreshes_otel_collector_ips(
+    harness, mocked_resource_handler, mocked_metrics_endpoint_provider, mocker
+):
+    refresh = mocker.patch("charm.KnativeOperatorCharm._refresh_otel_collector_ips")
+    harness.begin()
+
+    # The collector is only deployed once related
+    harness.charm.on.update_status.emit()
+    refresh.assert_not_called()
+
+    with patch("charm.KnativeOperatorCharm._on_otel_collector_relation_created"):
+        harness.add_relation("otel-collector", "app")
+    harness.charm.on.update_status.emit()
+    refresh.assert_called_once()
+
+
+def test_get_hook_timings_action(harness):
+    harness.begin()
+
+    harness.charm._apply_resources(MagicMock())
+    harness.framework.commit()
+    output = harness.run_action("get-hook-timings")
+
+    hooks = json.loads(output.results["hooks"])
+    assert [phase["phase"] for phase in hooks[0]["phases"]] == ["render", "apply"]
+
+
+def test_lightkube_client_is_shared(
+    harness, mocked_resource_handler, mocked_metrics_endpoint_provider, mocker
+):
+    mocked_lightkube_client_class = mocker.patch("charm.Client")
+    mocked_resource_handler_factory = mocker.patch("charm.KRH")
+    harness.begin()
+
+    harness.charm.resource_handler
+    harness.charm.observability_resource_handler
+    harness.charm._otel_collector_ips
+
+    mocked_lightkube_client_class.assert_called_once()
+    for _, kwargs in mocked_resource_handler_factory.call_args_list:
+        assert kwargs["lightkube_client"] == mocked_lightkube_client_class.return_value
 
 
 def test_events(harness, mocked_resource_handler, mocked_metrics_endpoint_provider, mocker):
@@ -178,6 +305,86 @@ def test_apply_resources_exception(
     )
 
 
+def test_apply_resources_skips_unchanged_manifests(
+    harness, mocked_resource_handler, mocked_metrics_endpoint_provider
+):
+    harness.begin()
+    mocked_resource_handler.template_files = []
+    mocked_resource_handler.context = {"some-key": "some-value"}
+
+    harness.charm._apply_resources(mocked_resource_handler, harness.charm._applied_resources)
+    harness.charm._apply_resources(mocked_resource_handler, harness.charm._applied_resources)
+    mocked_resource_handler.apply.assert_called_once()
+    assert harness.model.unit.status == ActiveStatus()
+
+    mocked_resource_handler.context = {"some-key": "another-value"}
+    harness.charm._apply_resources(mocked_resource_handler, harness.charm._applied_resources)
+    assert mocked_resource_handler.apply.call_count == 2
+
+
+@patch("charm.delete_resources")
+def test_apply_resources_deletes_stale_resources(
+    mocked_delete_resources, harness, mocked_resource_handler, mocked_metrics_endpoint_provider
+):
+    harness.begin()
+    applied_manifests = harness.charm._applied_observability_resources
+    mocked_resource_handler.template_files = []
+    deployment = ConfigMap(metadata=ObjectMeta(name="otel-collector-config", namespace="ns"))
+    hpa = Secret(metadata=ObjectMeta(name="otel-collector", namespace="ns"))
+
+    mocked_resource_handler.context = {"autoscaling": True}
+    mocked_resource_handler.render_manifests.return_value = [deployment, hpa]
+    harness.charm._apply_resources(mocked_resource_handler, applied_manifests)
+    mocked_delete_resources.assert_not_called()
+
+    mocked_resource_handler.context = {"autoscaling": False}
+    mocked_resource_handler.render_manifests.return_value = [deployment]
+    harness.charm._apply_resources(mocked_resource_handler, applied_manifests)
+    mocked_delete_resources.assert_called_once_with(
+        harness.charm.lightkube_client,
+        [ResourceReference("v1", "Secret", "otel-collector", "ns")],
+        "Background",
+    )
+    assert applied_manifests.inventory == [
+        ResourceReference("v1", "ConfigMap", "otel-collector-config", "ns")
+    ]
+
+
+@patch("charm.delete_resources")
+def test_apply_resources_deletes_stale_labelled_resources(
+    mocked_delete_resources,
+    harness,
+    mocked_resource_handler,
+    mocked_metrics_endpoint_provider,
+    mocked_lightkube_client,
+):
+    """Stale objects applied before the inventory was lost, on a pod restart, are deleted."""
+    harness.begin()
+    mocked_resource_handler.template_files = []
+    mocked_resource_handler.context = {"autoscaling": False}
+    mocked_resource_handler.labels = {"kubernetes-resource-handler-scope": "observability"}
+    mocked_resource_handler.resource_types = {ConfigMap, Secret}
+    config_map = ConfigMap(metadata=ObjectMeta(name="otel-collector-config", namespace="ns"))
+    hpa = Secret(metadata=ObjectMeta(name="otel-collector", namespace="ns"))
+    mocked_resource_handler.render_manifests.return_value = [config_map]
+    mocked_lightkube_client.list.side_effect = lambda resource_type, **_: (
+        [config_map] if resource_type is ConfigMap else [hpa]
+    )
+
+    harness.charm._apply_resources(
+        mocked_resource_handler, harness.charm._applied_observability_resources
+    )
+
+    mocked_lightkube_client.list.assert_any_call(
+        Secret, namespace=harness.model.name, labels=mocked_resource_handler.labels
+    )
+    mocked_delete_resources.assert_called_once_with(
+        harness.charm.lightkube_client,
+        [ResourceReference("v1", "Secret", "otel-collector", "ns")],
+        "Background",
+    )
+
+
 @pytest.mark.parametrize(
     "container_name",
     [
@@ -186,12 +393,18 @@ def test_apply_resources_exception(
     ],
 )
 def test_update_layer_active(
-    container_name, harness, mocked_resource_handler, mocker, mocked_metrics_endpoint_provider
+    container_name,
+    harness,
+    mocked_resource_handler,
+    mocked_lightkube_client,
+    mocker,
+    mocked_metrics_endpoint_provider,
 ):
     # The charm uses a service name that is the same as the container name
     service_name = container_name
 
     mocker.patch("charm.wait_for_required_kubernetes_resources")
+    mocked_lightkube_client.get.side_effect = _FakeApiError(404)
 
     harness.begin_with_initial_hooks()
 
@@ -217,9 +430,21 @@ def test_update_layer_active(
                         "POD_NAME": harness.model.app.name,
                         "SYSTEM_NAMESPACE": harness.model.name,
                         "METRICS_DOMAIN": "knative.dev/operator",
+                        "METRICS_PROMETHEUS_PORT": "9090",
                         "CONFIG_LOGGING_NAME": "config-logging",
                         "CONFIG_OBSERVABILITY_NAME": "config-observability",
                     },
+                    "on-check-failure": {"knative-operator-up": "restart"},
+                }
+            },
+            "checks": {
+                "knative-operator-up": {
+                    "override": "replace",
+                    "level": "alive",
+                    "period": "10s",
+                    "timeout": "3s",
+                    "threshold": 3,
+                    "http": {"url": "http://localhost:9090/metrics"},
                 }
             },
         }
@@ -235,11 +460,23 @@ def test_update_layer_active(
                         "POD_NAME": harness.model.app.name,
                         "SYSTEM_NAMESPACE": harness.model.name,
                         "METRICS_DOMAIN": "knative.dev/operator",
+                        "METRICS_PROMETHEUS_PORT": "9091",
                         "CONFIG_LOGGING_NAME": "config-logging",
                         "CONFIG_OBSERVABILITY_NAME": "config-observability",
                         "WEBHOOK_NAME": "operator-webhook",
                         "WEBHOOK_PORT": "8443",
                     },
+                    "on-check-failure": {"knative-operator-webhook-up": "restart"},
+                }
+            },
+            "checks": {
+                "knative-operator-webhook-up": {
+                    "override": "replace",
+                    "level": "alive",
+                    "period": "10s",
+                    "timeout": "3s",
+                    "threshold": 3,
+                    "tcp": {"port": 8443},
                 }
             },
         }
@@ -264,58 +501,615 @@ def test_update_layer_exception(
     container_name,
     harness,
     mocked_resource_handler,
-    mocked_container_replan,
+    mocker,
     mocked_metrics_endpoint_provider,
 ):
+    def _replan(container):
+        if container.name == container_name:
+            raise _FakeChangeError()
+
+    mocker.patch("ops.model.Container.replan", autospec=True, side_effect=_replan)
     harness.begin()
-    mocked_container_replan.side_effect = _FakeChangeError()
     mocked_event = MagicMock()
-    harness.set_can_connect(container_name, True)
+    harness.set_can_connect(KNATIVE_OPERATOR, True)
+    harness.set_can_connect(KNATIVE_OPERATOR_WEBHOOK, True)
     with pytest.raises(ChangeError):
-        harness.charm._update_layer(mocked_event, container_name)
+        harness.charm._update_layers(mocked_event)
     assert harness.model.unit.status == BlockedStatus(f"Failed to replan for {container_name}")
 
+    # The container that was replanned successfully is not updated again
+    assert list(harness.charm._stored.layer_hashes.keys()) == [
+        name for name in (KNATIVE_OPERATOR, KNATIVE_OPERATOR_WEBHOOK) if name != container_name
+    ]
+
+
+def test_update_layers_skips_unchanged_layers(
+    harness, mocked_resource_handler, mocked_container_replan, mocked_metrics_endpoint_provider
+):
+    harness.begin()
+    harness.set_can_connect(KNATIVE_OPERATOR, True)
+    harness.set_can_connect(KNATIVE_OPERATOR_WEBHOOK, True)
+    harness.charm._update_layers(MagicMock())
+    assert mocked_container_replan.call_count == 2
+
+    with patch("ops.model.Container.get_plan") as mocked_get_plan, patch(
+        "ops.model.Container.can_connect"
+    ) as mocked_can_connect:
+        harness.charm._update_layers(MagicMock())
+        mocked_get_plan.assert_not_called()
+        mocked_can_connect.assert_not_called()
+    assert harness.model.unit.status == ActiveStatus()
+
+
+def test_update_layers_waits_for_starting_container(
+    harness,
+    mocked_resource_handler,
+    mocked_container_replan,
+    mocked_metrics_endpoint_provider,
+    mocker,
+):
+    mocker.patch("charm.wait_for_required_kubernetes_resources")
+    mocker.patch("charm.KnativeOperatorCharm._refresh_otel_collector_ips")
+    harness.begin()
+    harness.set_can_connect(KNATIVE_OPERATOR, True)
+    event = MagicMock()
+
+    harness.charm._update_layers(event)
+
+    # The container that can be connected to is replanned, the other is left to pebble-ready
+    event.defer.assert_not_called()
+    mocked_container_replan.assert_called_once()
+    assert list(harness.charm._stored.layer_hashes.keys()) == [KNATIVE_OPERATOR]
+    assert harness.model.unit.status == MaintenanceStatus("Waiting for pod startup to complete")
+
+    harness.container_pebble_ready(KNATIVE_OPERATOR_WEBHOOK)
+    assert set(harness.charm._stored.layer_hashes.keys()) == {
+        KNATIVE_OPERATOR,
+        KNATIVE_OPERATOR_WEBHOOK,
+    }
+
+
+def test_update_layers_checks_restarted_container(
+    harness, mocked_resource_handler, mocked_container_replan, mocked_metrics_endpoint_provider
+):
+    harness.begin()
+    harness.set_can_connect(KNATIVE_OPERATOR, True)
+    harness.set_can_connect(KNATIVE_OPERATOR_WEBHOOK, True)
+    harness.charm._update_layers(MagicMock())
+
+    pebble_ready_event = MagicMock(spec=PebbleReadyEvent)
+    pebble_ready_event.workload = harness.model.unit.get_container(KNATIVE_OPERATOR_WEBHOOK)
+    with patch("charm.KnativeOperatorCharm._update_layer") as mocked_update_layer:
+        harness.charm._update_layers(pebble_ready_event)
+        mocked_update_layer.assert_called_once_with(KNATIVE_OPERATOR_WEBHOOK)
+
+
+def test_main_coalesces_reconciled_state(
+    harness,
+    mocked_resource_handler,
+    mocked_container_replan,
+    mocked_metrics_endpoint_provider,
+    mocker,
+):
+    mocked_resource_handler.template_files = []
+    mocked_resource_handler.context = {"some-key": "some-value"}
+    wait_for_resources = mocker.patch("charm.wait_for_required_kubernetes_resources")
+    mocker.patch("charm.KnativeOperatorCharm._refresh_otel_collector_ips")
+    harness.begin()
+    harness.set_can_connect(KNATIVE_OPERATOR, True)
+    harness.set_can_connect(KNATIVE_OPERATOR_WEBHOOK, True)
+
+    harness.charm.on.config_changed.emit()
+    assert harness.model.unit.status == ActiveStatus()
+    wait_for_resources.assert_called_once()
+
+    # A burst of events for the same desired state is coalesced, checking only the layer of a
+    # restarted container
+    with patch("charm.KnativeOperatorCharm._update_layer") as mocked_update_layer:
+        harness.charm.on.config_changed.emit()
+        harness.container_pebble_ready(KNATIVE_OPERATOR_WEBHOOK)
+        mocked_update_layer.assert_called_once_with(KNATIVE_OPERATOR_WEBHOOK)
+    wait_for_resources.assert_called_once()
+
+    # A new desired state is reconciled in full
+    mocked_resource_handler.context = {"some-key": "another-value"}
+    harness.charm.on.config_changed.emit()
+    assert wait_for_resources.call_count == 2
+
+
+def test_main_reapplies_otel_collector_on_config_change(
+    harness, mocked_container_replan, mocked_metrics_endpoint_provider, mocker
+):
+    """Changes to the otel-collector-* config are applied to an already deployed collector."""
+    apply = mocker.patch("charm.KRH.apply")
+    mocker.patch("charm.wait_for_required_kubernetes_resources")
+    mocker.patch("charm.KnativeOperatorCharm._refresh_otel_collector_ips")
+    harness.add_relation("otel-collector", "app")
+    harness.begin()
+    harness.set_can_connect(KNATIVE_OPERATOR, True)
+    harness.set_can_connect(KNATIVE_OPERATOR_WEBHOOK, True)
+    harness.charm.on.config_changed.emit()
+    apply.reset_mock()
+
+    harness.update_config({"otel-collector-replicas": 3, "otel-collector-batch-size": 100})
+    # Every hook runs in a new charm instance, building its resource handlers from the config
+    harness.charm._resource_handler = None
+    harness.charm._observability_resource_handler = None
+    harness.charm.on.config_changed.emit()
 
-def test_otel_exporter_ip_on_404_apierror(
+    assert apply.call_count == 2
+    assert harness.model.unit.status == ActiveStatus()
+    rendered = {
+        resource.kind: resource
+        for resource in harness.charm.observability_resource_handler.render_manifests()
+    }
+    assert rendered["Deployment"].spec.replicas == 3
+    collector_config = yaml.safe_load(rendered["ConfigMap"].data["collector.yaml"])
+    assert collector_config["processors"]["batch"]["send_batch_size"] == 100
+
+
+def test_go_runtime_environment_from_cgroup_limits(
+    harness,
+    mocked_resource_handler,
+    mocked_container_replan,
+    mocked_metrics_endpoint_provider,
+    mocker,
+):
+    mocker.patch("charm.wait_for_required_kubernetes_resources")
+    mocker.patch("charm.KnativeOperatorCharm._refresh_otel_collector_ips")
+    harness.begin()
+    harness.set_can_connect(KNATIVE_OPERATOR, True)
+    container = harness.model.unit.get_container(KNATIVE_OPERATOR)
+    container.push("/sys/fs/cgroup/cpu.max", "200000 100000", make_dirs=True)
+    container.push("/sys/fs/cgroup/memory.max", "1000", make_dirs=True)
+
+    harness.container_pebble_ready(KNATIVE_OPERATOR)
+
+    environment = (
+        harness.get_container_pebble_plan(KNATIVE_OPERATOR).services[KNATIVE_OPERATOR].environment
+    )
+    assert environment["GOMAXPROCS"] == "2"
+    assert environment["GOMEMLIMIT"] == "900"
+
+    harness.update_config({"gomaxprocs": 4, "gomemlimit": "512MiB"})
+    environment = (
+        harness.get_container_pebble_plan(KNATIVE_OPERATOR).services[KNATIVE_OPERATOR].environment
+    )
+    assert environment["GOMAXPROCS"] == "4"
+    assert environment["GOMEMLIMIT"] == "512MiB"
+
+
+def test_invalid_go_runtime_config(
+    harness, mocked_resource_handler, mocked_metrics_endpoint_provider
+):
+    harness.begin()
+
+    harness.update_config({"gomemlimit": "lots"})
+
+    assert isinstance(harness.model.unit.status, BlockedStatus)
+    mocked_resource_handler.apply.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "config, expected_command",
+    [
+        ({}, "/ko-app/operator"),
+        ({"kube-api-qps": 50.0}, "/ko-app/operator --kube-api-qps=50"),
+        (
+            {"kube-api-qps": 12.5, "kube-api-burst": 100},
+            "/ko-app/operator --kube-api-qps=12.5 --kube-api-burst=100",
+        ),
+    ],
+)
+def test_knative_operator_command(
+    config, expected_command, harness, mocked_metrics_endpoint_provider
+):
+    harness.update_config(config)
+    harness.begin()
+
+    assert harness.charm._knative_operator_command == expected_command
+
+
+@pytest.mark.parametrize(
+    "config",
+    [{"kube-api-qps": -1.0}, {"kube-api-burst": -1}, {"kube-api-qps": 50.0, "kube-api-burst": 10}],
+)
+def test_knative_operator_command_invalid_config(
+    config, harness, mocked_metrics_endpoint_provider
+):
+    harness.update_config(config)
+    harness.begin()
+
+    with pytest.raises(ErrorWithStatus):
+        harness.charm._knative_operator_command
+
+
+def test_update_health_status(harness, mocked_resource_handler, mocked_metrics_endpoint_provider):
+    harness.begin()
+    harness.set_can_connect(KNATIVE_OPERATOR, True)
+    harness.charm.unit.status = ActiveStatus()
+    check = CheckInfo("knative-operator-up", level=CheckLevel.ALIVE, status=CheckStatus.DOWN)
+
+    with patch("ops.model.Container.get_checks", return_value={check.name: check}):
+        harness.charm.on.update_status.emit()
+    assert harness.model.unit.status == MaintenanceStatus(
+        "Health checks failing: knative-operator-up"
+    )
+
+    check.status = CheckStatus.UP
+    with patch("ops.model.Container.get_checks", return_value={check.name: check}):
+        harness.charm.on.update_status.emit()
+    assert harness.model.unit.status == ActiveStatus()
+
+
+def test_update_health_status_keeps_other_statuses(
+    harness, mocked_resource_handler, mocked_metrics_endpoint_provider
+):
+    harness.begin()
+    harness.set_can_connect(KNATIVE_OPERATOR, True)
+    harness.charm.unit.status = BlockedStatus("ApiError: 403")
+
+    with patch("ops.model.Container.get_checks", return_value={}):
+        harness.charm.on.update_status.emit()
+    assert harness.model.unit.status == BlockedStatus("ApiError: 403")
+
+
+def test_update_health_status_never_reports_active_over_other_statuses(
+    harness, mocked_resource_handler, mocked_metrics_endpoint_provider
+):
+    harness.begin()
+    harness.set_can_connect(KNATIVE_OPERATOR, True)
+    harness.charm.unit.status = BlockedStatus("Invalid config")
+    check = CheckInfo("knative-operator-up", level=CheckLevel.ALIVE, status=CheckStatus.DOWN)
+
+    with patch("ops.model.Container.get_checks", return_value={check.name: check}):
+        harness.charm.on.update_status.emit()
+    assert harness.model.unit.status == BlockedStatus("Invalid config")
+
+    check.status = CheckStatus.UP
+    with patch("ops.model.Container.get_checks", return_value={check.name: check}):
+        harness.charm.on.update_status.emit()
+    assert harness.model.unit.status == BlockedStatus("Invalid config")
+
+
+def test_patch_resources(
+    harness,
+    mocked_resource_handler,
+    mocked_metrics_endpoint_provider,
+    mocked_patch_statefulset_resources,
+    mocker,
+):
+    harness.begin()
+    mocker.patch("charm.KnativeOperatorCharm._main")
+
+    harness.update_config({"knative-operator-webhook-memory-limit": "1Gi"})
+    mocked_patch_statefulset_resources.return_value = True
+    assert harness.charm._patch_resources() is True
+    mocked_patch_statefulset_resources.assert_called_once_with(
+        harness.charm.lightkube_client,
+        harness.model.app.name,
+        harness.model.name,
+        {
+            KNATIVE_OPERATOR: {"requests": {}, "limits": {}},
+            KNATIVE_OPERATOR_WEBHOOK: {"requests": {}, "limits": {"memory": "1Gi"}},
+        },
+    )
+
+    # Resources that are no longer configured are compared with, and removed from, the live
+    # StatefulSet, even once the charm's local state was lost with its restarted pod
+    harness.update_config({"knative-operator-webhook-memory-limit": ""})
+    mocked_patch_statefulset_resources.return_value = False
+    assert harness.charm._patch_resources() is False
+    mocked_patch_statefulset_resources.assert_called_with(
+        harness.charm.lightkube_client,
+        harness.model.app.name,
+        harness.model.name,
+        {
+            KNATIVE_OPERATOR: {"requests": {}, "limits": {}},
+            KNATIVE_OPERATOR_WEBHOOK: {"requests": {}, "limits": {}},
+        },
+    )
+
+
+def test_main_resources_patch_pending(
+    harness,
+    mocked_resource_handler,
+    mocked_container_replan,
+    mocked_metrics_endpoint_provider,
+    mocker,
+):
+    mocker.patch("charm.wait_for_required_kubernetes_resources")
+    mocker.patch("charm.KnativeOperatorCharm._refresh_otel_collector_ips")
+    mocker.patch("charm.patch_statefulset_resources", return_value=True)
+    harness.update_config({"knative-operator-cpu-request": "500m"})
+    harness.begin()
+    harness.set_can_connect(KNATIVE_OPERATOR, True)
+    harness.set_can_connect(KNATIVE_OPERATOR_WEBHOOK, True)
+
+    harness.charm.on.config_changed.emit()
+
+    assert harness.model.unit.status == MaintenanceStatus(
+        "Waiting for the resources patch to roll out"
+    )
+
+
+def test_main_resources_patch_api_error(
+    harness,
+    mocked_resource_handler,
+    mocked_container_replan,
+    mocked_metrics_endpoint_provider,
+    mocked_patch_statefulset_resources,
+):
+    """The StatefulSet cannot be patched when the charm is deployed without --trust."""
+    mocked_patch_statefulset_resources.side_effect = _FakeApiError(403)
+    harness.begin()
+
+    harness.charm.on.config_changed.emit()
+
+    assert harness.model.unit.status == BlockedStatus("ApiError: 403")
+    mocked_resource_handler.apply.assert_not_called()
+
+
+def test_invalid_resources_config(
+    harness, mocked_resource_handler, mocked_metrics_endpoint_provider
+):
+    harness.begin()
+
+    harness.update_config({"knative-operator-cpu-request": "lots"})
+
+    assert isinstance(harness.model.unit.status, BlockedStatus)
+    mocked_resource_handler.apply.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "otlp, expected_receivers, expected_ports",
+    [
+        (True, ["opencensus", "otlp"], [55678, 4317, 4318]),
+        (False, ["opencensus"], [55678]),
+    ],
+)
+def test_otel_collector_config(
+    otlp, expected_receivers, expected_ports, harness, mocked_metrics_endpoint_provider
+):
+    harness.update_config(
+        {
+            "otel-collector-otlp": otlp,
+            "otel-collector-batch-size": 1000,
+            "otel-collector-memory-limit-mib": 200,
+        }
+    )
+    harness.begin()
+
+    template = Template(Path("src/manifests/observability/collector.yaml.j2").read_text())
+    manifests = list(yaml.safe_load_all(template.render(harness.charm._context)))
+    config = yaml.safe_load(manifests[0]["data"]["collector.yaml"])
+    collector_service = manifests[2]
+
+    assert list(config["receivers"]) == expected_receivers
+    assert config["processors"]["memory_limiter"]["limit_mib"] == 200
+    assert config["processors"]["batch"]["send_batch_size"] == 1000
+    assert config["service"]["pipelines"]["metrics"] == {
+        "receivers": expected_receivers,
+        "processors": ["memory_limiter", "batch"],
+        "exporters": ["prometheus"],
+    }
+    assert [port["port"] for port in collector_service["spec"]["ports"]] == expected_ports
+
+
+@pytest.mark.parametrize(
+    "config, expected_processors, expected_drop_attributes, expected_metric_names",
+    [
+        ({}, ["memory_limiter", "batch"], None, None),
+        (
+            {"otel-collector-drop-attributes": "pod_name, container_name,response_code"},
+            ["memory_limiter", "transform/drop", "batch"],
+            ["pod_name", "container_name", "response_code"],
+            None,
+        ),
+        (
+            {
+                "otel-collector-drop-attributes": "",
+                "otel-collector-metrics-allowlist": "^revision_request_count$, ^activator_.*",
+            },
+            ["memory_limiter", "filter/allowlist", "batch"],
+            None,
+            ["^revision_request_count$", "^activator_.*"],
+        ),
+    ],
+)
+def test_otel_collector_cardinality(
+    config,
+    expected_processors,
+    expected_drop_attributes,
+    expected_metric_names,
+    harness,
+    mocked_metrics_endpoint_provider,
+):
+    harness.update_config(config)
+    harness.begin()
+
+    template = Template(Path("src/manifests/observability/collector.yaml.j2").read_text())
+    manifests = list(yaml.safe_load_all(template.render(harness.charm._context)))
+    config = yaml.safe_load(manifests[0]["data"]["collector.yaml"])
+    processors = config["processors"]
+
+    assert config["service"]["pipelines"]["metrics"]["processors"] == expected_processors
+    assert set(processors) == set(expected_processors)
+    if expected_drop_attributes:
+        # Attributes are deleted, then the data points left with the same ones summed
+        assert processors["transform/drop"]["metric_statements"] == [
+            {
+                "context": "datapoint",
+                "statements": [
+                    f'delete_key(attributes, "{attribute}")'
+                    for attribute in expected_drop_attributes
+                ],
+            },
+            {
+                "context": "metric",
+                "statements": [
+                    'aggregate_on_attributes("sum") where metric.type != METRIC_DATA_TYPE_GAUGE'
+                ],
+            },
+        ]
+    if expected_metric_names:
+        assert processors["filter/allowlist"]["metrics"]["include"] == {
+            "match_type": "regexp",
+            "metric_names": expected_metric_names,
+        }
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"otel-collector-batch-size": 0},
+        {"otel-collector-batch-timeout": "soon"},
+        {"otel-collector-memory-limit-mib": 100, "otel-collector-memory-spike-limit-mib": 100},
+        {"otel-collector-metrics-allowlist": "^revision_(request"},
+        {"otel-collector-drop-attributes": 'pod_name") or true'},
+    ],
+)
+def test_otel_collector_config_invalid(config, harness, mocked_metrics_endpoint_provider):
+    harness.update_config(config)
+    harness.begin()
+
+    with pytest.raises(ErrorWithStatus):
+        harness.charm._context
+
+
+@pytest.mark.parametrize(
+    "config, expected_replicas, expected_resources, expected_hpa",
+    [
+        ({}, 1, {"requests": {"cpu": "50m", "memory": "100Mi"}}, None),
+        (
+            {
+                "otel-collector-replicas": 2,
+                "otel-collector-cpu-request": "",
+                "otel-collector-memory-limit": "1Gi",
+            },
+            2,
+            {"requests": {"memory": "100Mi"}, "limits": {"memory": "1Gi"}},
+            None,
+        ),
+        (
+            {"otel-collector-replicas": 2, "otel-collector-max-replicas": 5},
+            None,
+            {"requests": {"cpu": "50m", "memory": "100Mi"}},
+            {"minReplicas": 2, "maxReplicas": 5, "averageUtilization": 80},
+        ),
+    ],
+)
+def test_otel_collector_scaling(
+    config,
+    expected_replicas,
+    expected_resources,
+    expected_hpa,
+    harness,
+    mocked_metrics_endpoint_provider,
+):
+    harness.update_config(config)
+    harness.begin()
+
+    template = Template(Path("src/manifests/observability/collector.yaml.j2").read_text())
+    manifests = list(yaml.safe_load_all(template.render(harness.charm._context)))
+    deployment = manifests[1]
+    hpas = [manifest for manifest in manifests if manifest["kind"] == "HorizontalPodAutoscaler"]
+
+    assert deployment["spec"].get("replicas") == expected_replicas
+    assert deployment["spec"]["template"]["spec"]["containers"][0]["resources"] == (
+        expected_resources
+    )
+    if expected_hpa is None:
+        assert hpas == []
+    else:
+        assert hpas[0]["spec"]["minReplicas"] == expected_hpa["minReplicas"]
+        assert hpas[0]["spec"]["maxReplicas"] == expected_hpa["maxReplicas"]
+        assert hpas[0]["spec"]["metrics"][0]["resource"]["target"]["averageUtilization"] == (
+            expected_hpa["averageUtilization"]
+        )
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"otel-collector-replicas": 0},
+        {"otel-collector-replicas": 3, "otel-collector-max-replicas": 2},
+        {"otel-collector-max-replicas": 2, "otel-collector-cpu-request": ""},
+        {"otel-collector-memory-limit": "lots"},
+    ],
+)
+def test_otel_collector_scaling_invalid(config, harness, mocked_metrics_endpoint_provider):
+    harness.update_config(config)
+    harness.begin()
+
+    with pytest.raises(ErrorWithStatus):
+        harness.charm._context
+
+
+def test_otel_collector_config_digest(harness, mocked_metrics_endpoint_provider):
+    harness.begin()
+    digest = harness.charm._context["otel_collector_config_digest"]
+
+    with patch("charm.KnativeOperatorCharm._main"):
+        harness.update_config({"otel-collector-batch-timeout": "1s"})
+
+    assert harness.charm._context["otel_collector_config_digest"] != digest
+
+
+def test_otel_collector_ips_not_deployed(
     mocker, harness, mocked_lightkube_client, mocked_metrics_endpoint_provider
 ):
-    mocked_lightkube_client.get.side_effect = _FakeApiError(404)
+    mocked_lightkube_client.list.return_value = []
     mocked_logger = mocker.patch("charm.logger")
     harness.begin()
-    ip = harness.charm._otel_exporter_ip
+    ips = harness.charm._otel_collector_ips
     mocked_logger.info.assert_called_with(
         "The OpenTelemetry Collector may not be deployed yet.This may be temporary or due to a missing otel-collector relation."  # noqa: E501, W505
     )
-    assert ip is None
+    assert ips == []
 
 
-def test_otel_exporter_ip_on_any_apierror(
+def test_otel_collector_ips_on_any_apierror(
     mocker, harness, mocked_lightkube_client, mocked_metrics_endpoint_provider
 ):
     mocked_logger = mocker.patch("charm.logger")
-    mocked_lightkube_client.get.side_effect = _FakeApiError()
+    mocked_lightkube_client.list.side_effect = _FakeApiError()
+    harness.begin()
     with pytest.raises(ApiError):
-        harness.begin()
-        mocked_logger.error.assert_called_with(
-            "Something went wrong trying to get the OpenTelemetry Collector"
-        )
+        harness.charm._otel_collector_ips
+    mocked_logger.error.assert_called_with(
+        "Something went wrong trying to get the OpenTelemetry Collector"
+    )
 
 
-def test_otel_exporter_ip_success(
+def test_otel_collector_ips_success(
     harness, mocked_lightkube_client, mocked_metrics_endpoint_provider
 ):
-    expected_ip = "10.10.10.10"
-    dummy_service = Service(
-        apiVersion="v1",
-        kind="Service",
-        metadata=ObjectMeta(name="otel-exporter", namespace=harness.model.name),
-        spec=ServiceSpec(clusterIP=f"{expected_ip}"),
-    )
-    mocked_lightkube_client.get.return_value = dummy_service
+    endpoint_slices = [
+        EndpointSlice(
+            addressType="IPv4",
+            metadata=ObjectMeta(name="otel-export-abcde", namespace=harness.model.name),
+            endpoints=[
+                Endpoint(addresses=["10.10.10.11"], conditions=EndpointConditions(ready=True)),
+                Endpoint(addresses=["10.10.10.12"], conditions=EndpointConditions(ready=False)),
+                Endpoint(addresses=["10.10.10.10"]),
+            ],
+        ),
+        EndpointSlice(
+            addressType="IPv4",
+            metadata=ObjectMeta(name="otel-export-fghij", namespace=harness.model.name),
+        ),
+    ]
+    mocked_lightkube_client.list.return_value = endpoint_slices
     harness.begin()
     with does_not_raise():
-        ip = harness.charm._otel_exporter_ip
-    assert ip == expected_ip
+        ips = harness.charm._otel_collector_ips
+    assert ips == ["10.10.10.10", "10.10.10.11"]
+    mocked_lightkube_client.list.assert_called_once_with(
+        EndpointSlice,
+        namespace=harness.model.name,
+        labels={"kubernetes.io/service-name": "otel-export"},
+    )
 
 
 def test_relation_created_databag(
@@ -323,8 +1117,10 @@ def test_relation_created_databag(
 ):
     harness.set_model_name(name="my-model")
     harness.begin()
-    mocked_otel_exporter_ip = mocker.patch("charm.KnativeOperatorCharm._otel_exporter_ip")
-    mocked_otel_exporter_ip.return_value = "10.10.10.10"
+    mocked_otel_collector_ips = mocker.patch(
+        "charm.KnativeOperatorCharm._otel_collector_ips", new_callable=PropertyMock
+    )
+    mocked_otel_collector_ips.return_value = ["10.10.10.10"]
     expected_relation_data = {
         "otel_collector_svc_namespace": harness.model.name,
         "otel_collector_svc_name": "otel-collector",
@@ -337,97 +1133,106 @@ def test_relation_created_databag(
 
 
 @patch("charm.KRH")
-@patch("charm.delete_many")
+@patch("charm.delete_resources")
 def test_on_remove_success(
-    delete_many: MagicMock, _: MagicMock, harness, mocked_metrics_endpoint_provider
+    delete_resources: MagicMock, _: MagicMock, harness, mocked_metrics_endpoint_provider
 ):
     harness.begin()
     harness.charm.on.remove.emit()
-    delete_many.assert_called()
+    delete_resources.assert_called()
     assert isinstance(harness.charm.model.unit.status, MaintenanceStatus)
 
 
+@patch("charm.delete_resources")
+def test_on_remove_with_invalid_config(
+    delete_resources: MagicMock, harness, mocked_metrics_endpoint_provider
+):
+    """Removing the charm must not render, and so validate the config of, recorded resources."""
+    harness.update_config({"otel-collector-batch-size": 0})
+    harness.begin()
+    harness.charm._applied_resources.add_to_inventory(
+        [ConfigMap(metadata=ObjectMeta(name="config-observability", namespace="ns"))]
+    )
+
+    harness.charm.on.remove.emit()
+
+    assert delete_resources.call_args.args[1] == [
+        ResourceReference("v1", "ConfigMap", "config-observability", "ns")
+    ]
+    assert harness.charm.model.unit.status == MaintenanceStatus("K8s resources removed")
+
+
 @patch("charm.KRH")
-@patch("charm.delete_many")
+@patch("charm.delete_resources")
 def test_on_remove_failure(
-    delete_many: MagicMock, _: MagicMock, harness, mocked_metrics_endpoint_provider
+    delete_resources: MagicMock, _: MagicMock, harness, mocked_metrics_endpoint_provider
 ):
     harness.begin()
-    delete_many.side_effect = _FakeApiError()
+    delete_resources.side_effect = _FakeApiError()
     with pytest.raises(ApiError):
         harness.charm.on.remove.emit()
 
 
-@pytest.fixture()
-def mocked_lightkube_base_client(mocker):
-    """Mocks the actual Lightkube Client class rather than the resource handler's Client."""
-    mocked_lightkube_client = MagicMock()
-    mocked_lightkube_client_class = mocker.patch("charm.Client")
-    mocked_lightkube_client_class.return_value = mocked_lightkube_client
-    yield mocked_lightkube_client
+def _watch_events(events_by_name, delay=0):
+    """Returns a fake Client.watch yielding the given events for each watched resource name.
 
-
-def test_wait_for_required_kubernetes_resources_success(mocked_lightkube_base_client):
-    """Tests case where resources do exist after some time.
-
-    Given an environment that will eventually (after a few tries) have the required resources,
-    assert that the function returns successfully
+    Resources without events never yield, like a watch on a resource that is not created.
     """
-    mocked_lightkube_client = mocked_lightkube_base_client
-
-    # Lightkube will fail the first 3 access, then return successfully after
-    mocked_lightkube_client.get.side_effect = [
-        _FakeApiError(404),
-        _FakeApiError(404),
-        _FakeApiError(404),
-        None,
-        None,
-        None,
-    ]
 
-    retryer = Retrying(
-        stop=stop_after_attempt(15),
-        reraise=True,
-    )
+    def _watch(resource, namespace, fields):
+        time.sleep(delay)
+        for event in events_by_name.get(fields["metadata.name"], []):
+            yield event, MagicMock()
+        threading.Event().wait()
+
+    return _watch
 
-    wait_for_required_kubernetes_resources("", retryer=retryer)
 
-    # Assert we had 3 attempts end in a failure after one get, and then a 4th attempt that had
-    # 3 successful returns
-    assert mocked_lightkube_client.get.call_count == 6
+@pytest.mark.parametrize("delay", [0, 0.1])
+def test_wait_for_required_kubernetes_resources_success(delay):
+    """Tests case where resources exist or are created while watching.
 
-    # Assert that the last 3 calls of .get attempted to get the required resources
+    Given an environment that has (or will have) the required resources,
+    assert that the function returns successfully after watching each resource by name.
+    """
+    client = MagicMock()
     required_resource_names = REQUIRED_CONFIGMAPS + REQUIRED_SECRETS
+    client.watch.side_effect = _watch_events(
+        {name: ["ADDED"] for name in required_resource_names}, delay=delay
+    )
 
-    # call_args_list returns a list of Call objects, each of which are a tuple of (args, kwargs).
-    # We assert that the kwargs has the correct resource name.
-    requested_resource_names = [
-        kwargs["name"] for (_, kwargs) in mocked_lightkube_client.get.call_args_list[-3:]
-    ]
-    for name in required_resource_names:
-        assert name in requested_resource_names
+    wait_for_required_kubernetes_resources(client, "namespace", timeout=5)
+
+    assert client.watch.call_count == len(required_resource_names)
+    watched_resources = {
+        kwargs["fields"]["metadata.name"]: args[0]
+        for (args, kwargs) in client.watch.call_args_list
+    }
+    assert watched_resources == {
+        **{name: ConfigMap for name in REQUIRED_CONFIGMAPS},
+        **{name: Secret for name in REQUIRED_SECRETS},
+    }
+    for _, kwargs in client.watch.call_args_list:
+        assert kwargs["namespace"] == "namespace"
 
 
-def test_wait_for_required_kubernetes_failure(mocked_lightkube_base_client):
+def test_wait_for_required_kubernetes_failure():
     """Tests case where resources do not exist and the wait should raise an exception.
 
-    Given an environment that will never have the required resources,
-    assert that the function raises after the expected number of attempts.
+    Given an environment that will never have one of the required resources,
+    assert that the function raises after the timeout.
     """
-    mocked_lightkube_client = mocked_lightkube_base_client
+    client = MagicMock()
+    client.watch.side_effect = _watch_events({name: ["ADDED"] for name in REQUIRED_CONFIGMAPS})
 
-    # Lightkube's Client.get will always raise an exception
-    mocked_lightkube_client.get.side_effect = _FakeApiError(404)
+    with pytest.raises(GenericCharmRuntimeError):
+        wait_for_required_kubernetes_resources(client, "namespace", timeout=0.1)
 
-    n_attempts = 3
-    retryer = Retrying(
-        stop=stop_after_attempt(n_attempts),
-        reraise=True,
-    )
 
-    with pytest.raises(ApiError):
-        wait_for_required_kubernetes_resources("", retryer=retryer)
+def test_wait_for_required_kubernetes_watch_error():
+    """Tests case where watching the resources fails, which should raise the watch error."""
+    client = MagicMock()
+    client.watch.side_effect = _FakeApiError(403)
 
-    # Assert we had 3 attempts end in a failure after one get, and then a 4th attempt that had
-    # 3 successful returns
-    assert mocked_lightkube_client.get.call_count == n_attempts
+    with pytest.raises(ApiError):
+        wait_for_required_kubernetes_resources(client, "namespace", timeout=5)
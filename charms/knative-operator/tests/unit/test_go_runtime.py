@@ -0,0 +1,103 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+import pytest
+from ops.charm import CharmBase
+from ops.testing import Harness
+
+from go_runtime import (
+    CGROUP_V1_CPU_PERIOD,
+    CGROUP_V1_CPU_QUOTA,
+    CGROUP_V1_MEMORY_LIMIT,
+    CGROUP_V2_CPU_MAX,
+    CGROUP_V2_MEMORY_MAX,
+    CgroupLimits,
+    go_runtime_environment,
+    read_cgroup_limits,
+)
+
+METADATA = """
+name: test-charm
+containers:
+  workload:
+    resource: workload-image
+resources:
+  workload-image:
+    type: oci-image
+"""
+
+
+@pytest.fixture()
+def container():
+    harness = Harness(CharmBase, meta=METADATA)
+    harness.begin()
+    harness.set_can_connect("workload", True)
+    yield harness.model.unit.get_container("workload")
+    harness.cleanup()
+
+
+def _write_files(container, files):
+    for path, content in files.items():
+        container.push(path, content, make_dirs=True)
+
+
+@pytest.mark.parametrize(
+    "files, expected_limits",
+    [
+        ({}, CgroupLimits()),
+        (
+            {CGROUP_V2_CPU_MAX: "250000 100000\n", CGROUP_V2_MEMORY_MAX: "536870912\n"},
+            CgroupLimits(cpu=2.5, memory=536870912),
+        ),
+        ({CGROUP_V2_CPU_MAX: "max 100000\n", CGROUP_V2_MEMORY_MAX: "max\n"}, CgroupLimits()),
+        (
+            {
+                CGROUP_V1_CPU_QUOTA: "50000\n",
+                CGROUP_V1_CPU_PERIOD: "100000\n",
+                CGROUP_V1_MEMORY_LIMIT: "268435456\n",
+            },
+            CgroupLimits(cpu=0.5, memory=268435456),
+        ),
+        (
+            {
+                CGROUP_V1_CPU_QUOTA: "-1\n",
+                CGROUP_V1_CPU_PERIOD: "100000\n",
+                CGROUP_V1_MEMORY_LIMIT: "9223372036854771712\n",
+            },
+            CgroupLimits(),
+        ),
+    ],
+)
+def test_read_cgroup_limits(container, files, expected_limits):
+    _write_files(container, files)
+
+    assert read_cgroup_limits(container) == expected_limits
+
+
+@pytest.mark.parametrize(
+    "limits, gomaxprocs, gomemlimit, expected_environment",
+    [
+        (CgroupLimits(), 0, "", {}),
+        (
+            CgroupLimits(cpu=2.5, memory=1000),
+            0,
+            "",
+            {"GOMAXPROCS": "2", "GOMEMLIMIT": "900"},
+        ),
+        (CgroupLimits(cpu=0.5), 0, "", {"GOMAXPROCS": "1"}),
+        (
+            CgroupLimits(cpu=2.5, memory=1000),
+            4,
+            "512MiB",
+            {"GOMAXPROCS": "4", "GOMEMLIMIT": "512MiB"},
+        ),
+        (CgroupLimits(), 4, "512MiB", {"GOMAXPROCS": "4", "GOMEMLIMIT": "512MiB"}),
+    ],
+)
+def test_go_runtime_environment(limits, gomaxprocs, gomemlimit, expected_environment):
+    assert go_runtime_environment(limits, gomaxprocs, gomemlimit) == expected_environment
+
+
+@pytest.mark.parametrize("gomaxprocs, gomemlimit", [(-1, ""), (0, "512M"), (0, "lots")])
+def test_go_runtime_environment_invalid_overrides(gomaxprocs, gomemlimit):
+    with pytest.raises(ValueError):
+        go_runtime_environment(CgroupLimits(), gomaxprocs, gomemlimit)
@@ -0,0 +1,95 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+import json
+from unittest.mock import patch
+
+import pytest
+
+from manifest_cache import CachedKubernetesResourceHandler
+from precompiled_manifests import main as precompile_manifests
+from precompiled_manifests import precompiled_file
+
+TEMPLATE = """apiVersion: v1
+kind: ConfigMap
+metadata:
+  name: {{ name }}
+  namespace: {{ namespace }}
+"""
+
+
+@pytest.fixture()
+def template_file(tmp_path):
+    template_file = tmp_path / "configmap.yaml.j2"
+    template_file.write_text(TEMPLATE)
+    yield template_file
+
+
+def _handler(template_file, cache_dir, context):
+    return CachedKubernetesResourceHandler(
+        field_manager="test",
+        template_files=[template_file],
+        context=context,
+        cache_dir=cache_dir,
+        cache_name="test",
+    )
+
+
+def test_render_manifests_writes_and_reuses_cache(template_file, tmp_path):
+    cache_dir = tmp_path / "cache"
+    context = {"name": "cm", "namespace": "ns"}
+
+    manifests = _handler(template_file, cache_dir, context).render_manifests()
+    cache = json.loads((cache_dir / "test.json").read_text())
+    assert cache["manifests"] == [manifest.to_dict() for manifest in manifests]
+
+    # A new handler (eg: in the next hook) must not render the templates again
+    with patch("charmed_kubeflow_chisme.kubernetes._kubernetes_resource_handler.Template") as t:
+        cached_manifests = _handler(template_file, cache_dir, context).render_manifests()
+        t.assert_not_called()
+    assert [m.to_dict() for m in cached_manifests] == [m.to_dict() for m in manifests]
+
+
+def test_render_manifests_rerenders_on_context_change(template_file, tmp_path):
+    cache_dir = tmp_path / "cache"
+    _handler(template_file, cache_dir, {"name": "cm", "namespace": "ns"}).render_manifests()
+
+    manifests = _handler(
+        template_file, cache_dir, {"name": "other", "namespace": "ns"}
+    ).render_manifests()
+
+    assert manifests[0].metadata.name == "other"
+    cache = json.loads((cache_dir / "test.json").read_text())
+    assert cache["manifests"][0]["metadata"]["name"] == "other"
+
+
+def test_render_manifests_ignores_corrupted_cache(template_file, tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    (cache_dir / "test.json").write_text("{")
+
+    manifests = _handler(
+        template_file, cache_dir, {"name": "cm", "namespace": "ns"}
+    ).render_manifests()
+
+    assert manifests[0].metadata.name == "cm"
+
+
+def test_render_manifests_without_cache_dir(template_file, tmp_path):
+    handler = _handler(template_file, None, {"name": "cm", "namespace": "ns"})
+
+    manifests = handler.render_manifests()
+
+    assert manifests[0].metadata.name == "cm"
+    assert list(tmp_path.iterdir()) == [template_file]
+
+
+def test_render_manifests_loads_precompiled_manifests(template_file, tmp_path):
+    precompile_manifests(template_file, precompiled_file(template_file))
+    handler = _handler(template_file, tmp_path / "cache", {"name": "cm", "namespace": "ns"})
+
+    with patch("manifest_cache.Template") as t:
+        manifests = handler.render_manifests()
+        t.assert_not_called()
+
+    assert manifests[0].metadata.name == "cm"
+    assert manifests[0].metadata.namespace == "ns"
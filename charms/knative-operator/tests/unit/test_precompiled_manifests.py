@@ -0,0 +1,83 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+from pathlib import Path
+
+import pytest
+import yaml
+from jinja2 import Template
+
+from precompiled_manifests import load_precompiled_manifests, main, precompile, precompiled_file
+
+TEMPLATE = """apiVersion: v1
+kind: ConfigMap
+metadata:
+  name: cm
+  namespace: {{ namespace }}
+  labels:
+    app: {{name}}
+data:
+  key: prefix-{{ name }}-suffix
+  items:
+  - {{ namespace }}
+---
+apiVersion: v1
+kind: ConfigMap
+metadata:
+  name: static
+"""
+CONTEXT = {"name": "charm", "namespace": "ns"}
+
+
+@pytest.fixture()
+def template_file(tmp_path):
+    template_file = tmp_path / "manifests.yaml.j2"
+    template_file.write_text(TEMPLATE)
+    yield template_file
+
+
+def _render(template_file, context):
+    rendered = Template(Path(template_file).read_text()).render(**context)
+    return [manifest for manifest in yaml.safe_load_all(rendered) if manifest]
+
+
+def test_precompiled_file(template_file):
+    assert precompiled_file(template_file) == template_file.parent / "manifests.precompiled.json"
+
+
+def test_load_precompiled_manifests_matches_rendering(template_file):
+    main(template_file, precompiled_file(template_file))
+
+    assert load_precompiled_manifests(template_file, CONTEXT) == _render(template_file, CONTEXT)
+
+
+def test_load_crds_manifests_matches_rendering(tmp_path):
+    template_file = Path("src/manifests/crds_manifests.yaml.j2")
+    precompiled = tmp_path / "crds_manifests.yaml.j2"
+    precompiled.write_text(template_file.read_text())
+    main(precompiled, precompiled_file(precompiled))
+
+    assert load_precompiled_manifests(precompiled, CONTEXT) == _render(template_file, CONTEXT)
+
+
+def test_load_precompiled_manifests_without_precompiled_form(template_file):
+    assert load_precompiled_manifests(template_file, CONTEXT) is None
+
+
+def test_load_precompiled_manifests_with_outdated_precompiled_form(template_file):
+    main(template_file, precompiled_file(template_file))
+    template_file.write_text(TEMPLATE.replace("name: static", "name: changed"))
+
+    assert load_precompiled_manifests(template_file, CONTEXT) is None
+
+
+@pytest.mark.parametrize(
+    "template",
+    [
+        "{% if name %}key: value{% endif %}",
+        "key: {{ name | upper }}",
+        "{{ name }}: value",
+    ],
+)
+def test_precompile_unsupported_template(template):
+    with pytest.raises(ValueError):
+        precompile(template)
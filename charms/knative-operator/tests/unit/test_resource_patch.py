@@ -0,0 +1,161 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+from unittest.mock import MagicMock
+
+import pytest
+from lightkube.models.apps_v1 import StatefulSetSpec, StatefulSetStatus
+from lightkube.models.core_v1 import Container, PodSpec, PodTemplateSpec, ResourceRequirements
+from lightkube.models.meta_v1 import LabelSelector, ObjectMeta
+from lightkube.resources.apps_v1 import StatefulSet
+from lightkube.types import PatchType
+
+from resource_patch import container_resources, patch_statefulset_resources
+
+RESOURCES = {
+    "workload": {"requests": {"cpu": "500m"}, "limits": {"cpu": "1", "memory": "1Gi"}},
+}
+
+
+def _statefulset(resources=None, generation=1, observed_generation=1, rolled_out=True):
+    return StatefulSet(
+        metadata=ObjectMeta(name="app", namespace="model", generation=generation),
+        spec=StatefulSetSpec(
+            selector=LabelSelector(),
+            serviceName="app",
+            template=PodTemplateSpec(
+                spec=PodSpec(
+                    containers=[
+                        Container(name="charm"),
+                        Container(name="workload", resources=resources),
+                    ]
+                )
+            ),
+        ),
+        status=StatefulSetStatus(
+            replicas=1,
+            observedGeneration=observed_generation,
+            currentRevision="app-1",
+            updateRevision="app-1" if rolled_out else "app-2",
+        ),
+    )
+
+
+@pytest.mark.parametrize(
+    "config, expected_resources",
+    [
+        ({}, {"requests": {}, "limits": {}}),
+        (
+            {
+                "workload-cpu-request": "500m",
+                "workload-cpu-limit": "1",
+                "workload-memory-limit": "1Gi",
+                "workload-memory-request": "",
+                "other-cpu-request": "2",
+            },
+            RESOURCES["workload"],
+        ),
+    ],
+)
+def test_container_resources(config, expected_resources):
+    assert container_resources(config, "workload") == expected_resources
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"workload-cpu-request": "lots"},
+        {"workload-memory-request": "2Gi", "workload-memory-limit": "1Gi"},
+    ],
+)
+def test_container_resources_invalid_config(config):
+    with pytest.raises(ValueError):
+        container_resources(config, "workload")
+
+
+def test_patch_statefulset_resources_already_set():
+    client = MagicMock()
+    client.get.return_value = _statefulset(
+        ResourceRequirements(
+            requests={"cpu": "0.5"}, limits={"cpu": "1000m", "memory": "1073741824"}
+        )
+    )
+
+    assert patch_statefulset_resources(client, "app", "model", RESOURCES) is False
+    client.patch.assert_not_called()
+
+
+def test_patch_statefulset_resources():
+    client = MagicMock()
+    client.get.return_value = _statefulset(ResourceRequirements(requests={"memory": "1Gi"}))
+    client.patch.return_value = _statefulset(generation=2)
+
+    assert patch_statefulset_resources(client, "app", "model", RESOURCES) is True
+    client.patch.assert_called_once_with(
+        StatefulSet,
+        "app",
+        {
+            "spec": {
+                "template": {
+                    "spec": {
+                        "containers": [
+                            {
+                                "name": "workload",
+                                "resources": {
+                                    "requests": {"cpu": "500m", "memory": None},
+                                    "limits": {"cpu": "1", "memory": "1Gi"},
+                                },
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        namespace="model",
+        patch_type=PatchType.STRATEGIC,
+    )
+
+
+def test_patch_statefulset_resources_ignores_unrelated_rollout():
+    """A rollout of a StatefulSet whose resources already match is not reported as pending."""
+    client = MagicMock()
+    client.get.return_value = _statefulset(
+        ResourceRequirements(requests={"cpu": "500m"}, limits={"cpu": "1", "memory": "1Gi"}),
+        generation=2,
+        observed_generation=2,
+        rolled_out=False,
+    )
+
+    assert patch_statefulset_resources(client, "app", "model", RESOURCES) is False
+    client.patch.assert_not_called()
+
+
+def test_patch_statefulset_resources_removes_unconfigured_resources():
+    client = MagicMock()
+    client.get.return_value = _statefulset(ResourceRequirements(limits={"memory": "1Gi"}))
+    client.patch.return_value = _statefulset(generation=2, rolled_out=False)
+
+    assert patch_statefulset_resources(
+        client, "app", "model", {"workload": {"requests": {}, "limits": {}}}
+    )
+    assert client.patch.call_args.args[2]["spec"]["template"]["spec"]["containers"] == [
+        {
+            "name": "workload",
+            "resources": {
+                "requests": {"cpu": None, "memory": None},
+                "limits": {"cpu": None, "memory": None},
+            },
+        }
+    ]
+
+
+def test_patch_statefulset_resources_unconfigured():
+    client = MagicMock()
+    client.get.return_value = _statefulset()
+
+    assert (
+        patch_statefulset_resources(
+            client, "app", "model", {"workload": {"requests": {}, "limits": {}}}
+        )
+        is False
+    )
+    client.patch.assert_not_called()
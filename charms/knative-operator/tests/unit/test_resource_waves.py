@@ -0,0 +1,149 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus
+from charmed_kubeflow_chisme.lightkube.mocking import FakeApiError
+from lightkube import codecs
+
+from resource_waves import ParallelKubernetesResourceHandler, group_into_waves, run_in_waves
+
+MANIFESTS = """
+apiVersion: v1
+kind: ConfigMap
+metadata:
+  name: cm
+  namespace: ns
+---
+apiVersion: v1
+kind: Service
+metadata:
+  name: service
+  namespace: ns
+---
+apiVersion: rbac.authorization.k8s.io/v1
+kind: ClusterRole
+metadata:
+  name: cluster-role
+---
+apiVersion: apiextensions.k8s.io/v1
+kind: CustomResourceDefinition
+metadata:
+  name: things.example.com
+spec:
+  group: example.com
+  names:
+    kind: Thing
+    plural: things
+  scope: Namespaced
+  versions:
+  - name: v1
+    served: true
+    storage: true
+---
+apiVersion: v1
+kind: ServiceAccount
+metadata:
+  name: sa
+  namespace: ns
+---
+apiVersion: v1
+kind: Secret
+metadata:
+  name: secret
+  namespace: ns
+"""
+
+
+@pytest.fixture()
+def resources():
+    yield codecs.load_all_yaml(MANIFESTS)
+
+
+@pytest.fixture()
+def template_file(tmp_path):
+    template_file = tmp_path / "manifests.yaml.j2"
+    template_file.write_text(MANIFESTS)
+    yield template_file
+
+
+def test_group_into_waves(resources):
+    waves = group_into_waves(resources)
+
+    assert [[resource.metadata.name for resource in wave] for wave in waves] == [
+        ["things.example.com"],
+        ["cluster-role", "sa"],
+        ["cm", "secret"],
+        ["service"],
+    ]
+
+
+def test_group_into_waves_skips_empty_waves(resources):
+    configmaps = [resource for resource in resources if resource.kind == "ConfigMap"]
+
+    assert group_into_waves(configmaps) == [configmaps]
+
+
+def test_run_in_waves_completes_a_wave_before_the_next(resources):
+    waves = group_into_waves(resources)
+    lock = threading.Lock()
+    applied = []
+
+    def _record(resource):
+        with lock:
+            applied.append(resource)
+
+    run_in_waves(waves, _record, max_workers=4)
+
+    wave_of = {id(r): i for i, wave in enumerate(waves) for r in wave}
+    assert [wave_of[id(r)] for r in applied] == sorted(wave_of[id(r)] for r in applied)
+    assert len(applied) == len(resources)
+
+
+def test_run_in_waves_stops_after_failing_wave(resources):
+    waves = group_into_waves(resources)
+    func = MagicMock(side_effect=ValueError("failed"))
+
+    with pytest.raises(ValueError):
+        run_in_waves(waves, func)
+
+    # Only the first wave was attempted
+    assert func.call_count == len(waves[0])
+
+
+def test_apply(template_file):
+    client = MagicMock()
+    handler = ParallelKubernetesResourceHandler(
+        field_manager="manager",
+        template_files=[template_file],
+        context={},
+        lightkube_client=client,
+    )
+
+    handler.apply()
+
+    assert client.apply.call_count == 6
+    namespaces = {
+        call.kwargs["obj"].metadata.name: call.kwargs["namespace"]
+        for call in client.apply.call_args_list
+    }
+    assert namespaces["cm"] == "ns"
+    assert namespaces["cluster-role"] is None
+    assert all(call.kwargs["field_manager"] == "manager" for call in client.apply.call_args_list)
+
+
+@pytest.mark.parametrize("code", [403, 409])
+def test_apply_raises_error_with_status(code, template_file):
+    client = MagicMock()
+    client.apply.side_effect = FakeApiError(code)
+    handler = ParallelKubernetesResourceHandler(
+        field_manager="manager",
+        template_files=[template_file],
+        context={},
+        lightkube_client=client,
+    )
+
+    with pytest.raises(ErrorWithStatus):
+        handler.apply()
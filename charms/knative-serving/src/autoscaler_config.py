@@ -0,0 +1,220 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Parsing and validation of the `autoscaler` config of the Knative Pod Autoscaler (KPA).
+
+The config is rendered into `spec.config.autoscaler` of the KnativeServing, which the
+knative-operator turns into the config-autoscaler ConfigMap.  The autoscaler only logs invalid
+values of that ConfigMap and keeps running with its previous config, so values are validated here
+to surface mistakes as a blocked charm instead.
+"""
+
+import re
+from typing import Callable, Dict, NamedTuple
+
+import yaml
+
+# The format of a Go duration, as parsed by the autoscaler, eg: 1m30s
+GO_DURATION = re.compile(r"^((\d+(\.\d+)?)(ns|us|µs|ms|s|m|h))+$")
+GO_DURATION_UNITS = {
+    "ns": 1e-9,
+    "us": 1e-6,
+    "µs": 1e-6,
+    "ms": 1e-3,
+    "s": 1,
+    "m": 60,
+    "h": 60 * 60,
+}
+
+
+def _number(
+    minimum: float = None, maximum: float = None, above: float = None
+) -> Callable[[str], None]:
+    """Returns a validator of a number between minimum and maximum, inclusive, or above a bound."""
+
+    def validate(value: str):
+        try:
+            number = float(value)
+        except ValueError:
+            raise ValueError(f"{value!r} is not a number")
+        if above is not None and number <= above:
+            raise ValueError(f"{value!r} is not more than {above:g}")
+        if minimum is not None and number < minimum:
+            raise ValueError(f"{value!r} is less than {minimum:g}")
+        if maximum is not None and number > maximum:
+            raise ValueError(f"{value!r} is more than {maximum:g}")
+
+    return validate
+
+
+def _integer(minimum: int = 0) -> Callable[[str], None]:
+    """Returns a validator of an integer of at least minimum."""
+
+    def validate(value: str):
+        if not re.match(r"^-?\d+$", value):
+            raise ValueError(f"{value!r} is not an integer")
+        _number(minimum)(value)
+
+    return validate
+
+
+def _duration(minimum: float = 0, maximum: float = None) -> Callable[[str], None]:
+    """Returns a validator of a Go duration between minimum and maximum seconds, inclusive."""
+
+    def validate(value: str):
+        if not GO_DURATION.match(value):
+            raise ValueError(f"{value!r} is not a duration, eg: 60s")
+        _number(minimum, maximum)(str(parse_duration(value)))
+
+    return validate
+
+
+def _boolean(value: str):
+    """Validates a boolean."""
+    if value not in ("true", "false"):
+        raise ValueError(f"{value!r} is not true or false")
+
+
+def _one_of(*choices: str) -> Callable[[str], None]:
+    """Returns a validator of one of the choices."""
+
+    def validate(value: str):
+        if value not in choices:
+            raise ValueError(f"{value!r} is not one of {', '.join(choices)}")
+
+    return validate
+
+
+# The validator of each config-autoscaler key, with the bounds enforced by the autoscaler
+AUTOSCALER_KEYS = {
+    "activator-capacity": _number(minimum=1),
+    "allow-zero-initial-scale": _boolean,
+    "container-concurrency-target-default": _number(minimum=0.01),
+    "container-concurrency-target-percentage": _number(minimum=1, maximum=100),
+    "enable-scale-to-zero": _boolean,
+    "initial-scale": _integer(),
+    "max-scale": _integer(),
+    "max-scale-down-rate": _number(above=1),
+    "max-scale-limit": _integer(),
+    "max-scale-up-rate": _number(above=1),
+    "min-scale": _integer(),
+    "panic-threshold-percentage": _number(minimum=110, maximum=1000),
+    "panic-window-percentage": _number(minimum=1, maximum=100),
+    "pod-autoscaler-class": _one_of("kpa.autoscaling.knative.dev", "hpa.autoscaling.knative.dev"),
+    "requests-per-second-target-default": _number(minimum=1),
+    "scale-down-delay": _duration(maximum=60 * 60),
+    "scale-to-zero-grace-period": _duration(minimum=6),
+    "scale-to-zero-pod-retention-period": _duration(),
+    "stable-window": _duration(minimum=6, maximum=60 * 60),
+    "target-burst-capacity": _number(minimum=-1),
+}
+
+
+class AutoscalingProfile(NamedTuple):
+    """A curated set of config-autoscaler and config-deployment settings."""
+
+    autoscaler: Dict[str, str]
+    deployment: Dict[str, str]
+
+
+AUTOSCALING_PROFILES = {
+    # Avoids cold starts and queueing: the activator buffers every burst, pods are scaled out
+    # early, panic mode kicks in sooner and pods are kept around after traffic stops
+    "latency": AutoscalingProfile(
+        autoscaler={
+            "container-concurrency-target-percentage": "60",
+            "target-burst-capacity": "-1",
+            "stable-window": "30s",
+            "panic-window-percentage": "5",
+            "panic-threshold-percentage": "150",
+            "scale-down-delay": "5m",
+            "scale-to-zero-pod-retention-period": "10m",
+        },
+        deployment={"queue-sidecar-cpu-request": "100m", "queue-sidecar-memory-request": "64Mi"},
+    ),
+    # Packs requests on fewer, busier pods and takes the activator out of the request path once
+    # pods are up, at the cost of queueing during bursts
+    "throughput": AutoscalingProfile(
+        autoscaler={
+            "container-concurrency-target-percentage": "90",
+            "target-burst-capacity": "0",
+            "stable-window": "60s",
+            "scale-down-delay": "1m",
+            "max-scale-up-rate": "1000",
+        },
+        deployment={"queue-sidecar-cpu-request": "50m", "queue-sidecar-memory-request": "50Mi"},
+    ),
+    # Minimises the pods running: pods are fully loaded and scaled down, to zero, as soon as
+    # traffic drops
+    "cost": AutoscalingProfile(
+        autoscaler={
+            "container-concurrency-target-percentage": "100",
+            "enable-scale-to-zero": "true",
+            "stable-window": "60s",
+            "scale-down-delay": "0s",
+            "scale-to-zero-grace-period": "30s",
+            "scale-to-zero-pod-retention-period": "0s",
+            "max-scale-down-rate": "4",
+        },
+        deployment={"queue-sidecar-cpu-request": "25m", "queue-sidecar-memory-request": "32Mi"},
+    ),
+}
+
+
+def autoscaling_profile(name: str) -> AutoscalingProfile:
+    """Returns the autoscaling profile of the given name, or an empty profile if not set.
+
+    Raises:
+        ValueError: if there is no profile of that name.
+    """
+    if not name:
+        return AutoscalingProfile(autoscaler={}, deployment={})
+    if name not in AUTOSCALING_PROFILES:
+        raise ValueError(
+            f"unknown autoscaling profile {name!r}, one of {', '.join(AUTOSCALING_PROFILES)}"
+        )
+    return AUTOSCALING_PROFILES[name]
+
+
+def parse_duration(value: str) -> float:
+    """Returns the number of seconds of a Go duration, eg: 1m30s."""
+    return sum(
+        float(number) * GO_DURATION_UNITS[unit]
+        for _, number, _, unit in re.findall(r"((\d+(\.\d+)?)(ns|us|µs|ms|s|m|h))", value)
+    )
+
+
+def parse_autoscaler_config(autoscaler_config: str) -> Dict[str, str]:
+    """Parses and validates the YAML or JSON autoscaler config, returning a dict of its keys.
+
+    Values are returned as strings, as expected in the config-autoscaler ConfigMap.  Empty
+    values are left out, so the autoscaler's defaults apply.
+
+    Raises:
+        yaml.YAMLError: if the config is not valid YAML.
+        ValueError: if the config is not a mapping, has an unknown key or an invalid value.
+    """
+    parsed = yaml.safe_load(autoscaler_config) or {}
+    if not isinstance(parsed, dict):
+        raise ValueError("must be a mapping of config-autoscaler keys to values")
+
+    config = {}
+    for key, value in parsed.items():
+        if value is None or value == "":
+            continue
+        if key not in AUTOSCALER_KEYS:
+            raise ValueError(f"unknown key {key!r}")
+        value = _to_string(value)
+        try:
+            AUTOSCALER_KEYS[key](value)
+        except ValueError as e:
+            raise ValueError(f"invalid {key}: {e}")
+        config[key] = value
+    return config
+
+
+def _to_string(value) -> str:
+    """Returns a YAML value as a config-autoscaler ConfigMap value."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
@@ -15,26 +15,43 @@ from pathlib import Path
 import yaml
 from charmed_kubeflow_chisme.exceptions import ErrorWithStatus, GenericCharmRuntimeError
 from charmed_kubeflow_chisme.kubernetes import KubernetesResourceHandler as KRH  # noqa N813
-from charmed_kubeflow_chisme.lightkube.batch import delete_many
+from charmed_kubeflow_chisme.kubernetes import create_charm_default_labels
 from charms.istio_pilot.v0.istio_gateway_info import GatewayProvider
 from lightkube import Client
 from lightkube.core.exceptions import ApiError
-from lightkube.resources.apiextensions_v1 import CustomResourceDefinition
+from lightkube.resources.autoscaling_v2 import HorizontalPodAutoscaler
 from ops import main
 from ops.charm import CharmBase
 from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
 
+from autoscaler_config import autoscaling_profile, parse_autoscaler_config
+from crd_readiness import CRDReadiness
+from hook_timing import HookTimings
 from image_management import parse_image_config, remove_empty_images, update_images
-from lightkube_custom_resources.operator import KnativeServing_v1beta1  # noqa F401
+from lightkube_custom_resources.operator import KnativeServing_v1beta1
+from reconcile_state import AppliedManifests, ReconcileGeneration, manifests_digest
+from teardown import delete_resources, resources_to_delete
+from workloads import (
+    parse_workload_autoscaling,
+    parse_workload_replicas,
+    parse_workload_resources,
+    workloads,
+)
 
 logger = logging.getLogger(__name__)
 
 
+AUTOSCALER_CONFIG_NAME = "autoscaler"
+AUTOSCALING_PROFILE_CONFIG_NAME = "autoscaling-profile"
 CUSTOM_IMAGE_CONFIG_NAME = "custom_images"
 DEFAULT_IMAGES_FILE = "src/default-custom-images.json"
 with open(DEFAULT_IMAGES_FILE, "r") as json_file:
     DEFAULT_IMAGES = json.load(json_file)
 SERVING_NAMESPACE = "knative-serving"
+WORKLOAD_REPLICAS_CONFIG_NAME = "workload-replicas"
+WORKLOAD_RESOURCES_CONFIG_NAME = "workload-resources"
+WORKLOAD_AUTOSCALING_CONFIG_NAME = "workload-autoscaling"
+ROLLOUT_WAITING_MESSAGE = "Waiting for the KnativeServing to roll out"
 
 
 class KnativeServingCharm(CharmBase):
@@ -45,7 +62,21 @@ class KnativeServingCharm(CharmBase):
 
         self._app_name = self.app.name
         self._namespace = self.model.name
+        self._lightkube_client = None
         self._resource_handler = None
+        self._autoscaling_resource_handler = None
+        self._hook_timings = HookTimings(self, "hook-timings")
+        self._applied_manifests = AppliedManifests(self, "applied-manifests")
+        self._applied_autoscaling_manifests = AppliedManifests(
+            self, "applied-autoscaling-manifests"
+        )
+        self._reconcile_generation = ReconcileGeneration(self, "reconcile-generation")
+        self._crd_readiness = CRDReadiness(
+            self,
+            "crd-readiness",
+            "knativeservings.operator.knative.dev",
+            lambda: self.lightkube_client,
+        )
         # Instantiate the GatewayProvider class, one instance for sharing the local gateway
         # another one for sharing the ingress gateway
         self._ingress_gateway_provider = GatewayProvider(self, relation_name="ingress-gateway")
@@ -53,6 +84,8 @@ class KnativeServingCharm(CharmBase):
 
         self.framework.observe(self.on.install, self._main)
         self.framework.observe(self.on.config_changed, self._main)
+        self.framework.observe(self._crd_readiness.on.crd_created, self._main)
+        self.framework.observe(self.on.update_status, self._on_update_status)
         self.framework.observe(
             self.on["ingress-gateway"].relation_changed, self._on_ingress_gateway_relation_changed
         )
@@ -63,16 +96,35 @@ class KnativeServingCharm(CharmBase):
             self.on["otel-collector"].relation_changed, self._on_otel_collector_relation_changed
         )
         self.framework.observe(self.on.remove, self._on_remove)
+        self.framework.observe(self.on.get_hook_timings_action, self._on_get_hook_timings)
+
+    def _apply_and_set_status(self, digest: str):
+        """Applies the manifests, unless those of `digest` were applied within the interval.
 
-    def _apply_and_set_status(self):
+        _main only gets here with unchanged manifests while the charm is not Active yet (eg: on
+        update-status, while waiting for a rollout), where they are not applied again.
+
+        Args:
+            digest: the digest of the manifests, computed once by _main as its fingerprint.
+        """
         try:
+            if self._applied_manifests.is_up_to_date(digest):
+                logger.info("Manifests are unchanged since they were last applied, skipping")
+                self.unit.status = ActiveStatus()
+                return
             self.unit.status = MaintenanceStatus("Configuring/deploying resources")
-            self.resource_handler.apply()
+            with self._hook_timings.phase("render"):
+                resources = self.resource_handler.render_manifests(force_recompute=False)
+            self._applied_manifests.add_to_inventory(resources)
+            with self._hook_timings.phase("apply"):
+                self.resource_handler.apply()
         except ApiError as e:
+            self._applied_manifests.reset()
             logger.debug(traceback.format_exc())
             logger.error(f"Applying resources failed with ApiError status code {e.status.code}")
             self.unit.status = BlockedStatus(f"ApiError: {e.status.code}")
         except ErrorWithStatus as e:
+            self._applied_manifests.reset()
             logger.error(e.msg)
             self.unit.status = e.status
         else:
@@ -80,6 +132,7 @@ class KnativeServingCharm(CharmBase):
             # let's use the compute_status() method to set (or not)
             # an active status
             self.unit.status = ActiveStatus()
+            self._applied_manifests.record(digest)
 
     def _get_custom_images(self):
         """Parses custom_images from config and defaults, returning a dict of images."""
@@ -101,26 +154,270 @@ class KnativeServingCharm(CharmBase):
             )
         return custom_images
 
+    def _get_autoscaling_config(self):
+        """Returns the autoscaler and deployment settings of the autoscaling profile.
+
+        The keys of the `autoscaler` config override those of the profile.
+        """
+        try:
+            profile = autoscaling_profile(self.model.config[AUTOSCALING_PROFILE_CONFIG_NAME])
+        except ValueError as err:
+            logger.error(f"Charm Blocked due to an invalid `autoscaling-profile`: {str(err)}")
+            raise ErrorWithStatus(
+                "Invalid `autoscaling-profile` - set it to latency, throughput, cost or ''",
+                BlockedStatus,
+            )
+        try:
+            autoscaler = parse_autoscaler_config(self.model.config[AUTOSCALER_CONFIG_NAME])
+        except (yaml.YAMLError, ValueError) as err:
+            logger.error(
+                f"Charm Blocked due to an invalid `autoscaler` config.  Caught error: {str(err)}"
+            )
+            raise ErrorWithStatus(
+                "Invalid `autoscaler` config - fix `autoscaler` to unblock.  "
+                "See logs for more details",
+                BlockedStatus,
+            )
+        return {**profile.autoscaler, **autoscaler}, profile.deployment
+
+    def _get_high_availability_replicas(self):
+        """Returns the replicas of each Knative Serving Deployment, from the config."""
+        replicas = self.model.config["high-availability-replicas"]
+        if replicas < 1:
+            raise ErrorWithStatus(
+                "Invalid config: high-availability-replicas must be at least 1", BlockedStatus
+            )
+        return replicas
+
+    def _parse_workload_config(self, config_name, parse):
+        """Parses and validates a config of the Knative Serving workloads with parse."""
+        try:
+            return parse(self.model.config[config_name])
+        except (yaml.YAMLError, ValueError) as err:
+            logger.error(
+                f"Charm Blocked due to an invalid `{config_name}` config.  "
+                f"Caught error: {str(err)}"
+            )
+            raise ErrorWithStatus(
+                f"Invalid `{config_name}` config - fix `{config_name}` to unblock.  "
+                "See logs for more details",
+                BlockedStatus,
+            )
+
+    def _get_workload_autoscaling(self):
+        """Returns the HorizontalPodAutoscaler settings of each workload, from the config.
+
+        The knative-operator also sets the minReplicas of the HorizontalPodAutoscaler of a
+        workload to its `workload-replicas`, so a workload cannot be set in both.
+        """
+        autoscaling = self._parse_workload_config(
+            WORKLOAD_AUTOSCALING_CONFIG_NAME, parse_workload_autoscaling
+        )
+        replicas = self._parse_workload_config(
+            WORKLOAD_REPLICAS_CONFIG_NAME, parse_workload_replicas
+        )
+        conflicting = sorted(set(autoscaling) & set(replicas))
+        if conflicting:
+            raise ErrorWithStatus(
+                f"Invalid config: set the min-replicas of {', '.join(conflicting)} in "
+                f"`{WORKLOAD_AUTOSCALING_CONFIG_NAME}`, not `{WORKLOAD_REPLICAS_CONFIG_NAME}`",
+                BlockedStatus,
+            )
+        return autoscaling
+
+    def _get_workloads(self):
+        """Returns the overrides of the Knative Serving workloads, from the config."""
+        proxy_env = {
+            "HTTP_PROXY": self.model.config["http-proxy"],
+            "HTTPS_PROXY": self.model.config["https-proxy"],
+            "NO_PROXY": self.model.config["no-proxy"],
+        }
+        return workloads(
+            replicas=self._parse_workload_config(
+                WORKLOAD_REPLICAS_CONFIG_NAME, parse_workload_replicas
+            ),
+            env={"controller": {"controller": proxy_env}},
+            resources=self._parse_workload_config(
+                WORKLOAD_RESOURCES_CONFIG_NAME, parse_workload_resources
+            ),
+        )
+
     def _main(self, event):
 
         self._send_ingress_gateway_data()
         self._send_local_gateway_data()
 
-        # Check the KnativeServing CRD is present; otherwise defer
-        lightkube_client = Client()
         try:
-            lightkube_client.get(CustomResourceDefinition, "knativeservings.operator.knative.dev")
-            self._apply_and_set_status()
+            # Events for a desired state already reconciled in this generation are coalesced
+            fingerprint = manifests_digest(
+                self.resource_handler.template_files, self.resource_handler.context
+            )
+            if self._reconcile_generation.is_reconciled(fingerprint):
+                logger.info(
+                    "Desired state already reconciled in generation "
+                    f"{self._reconcile_generation.generation}, skipping full reconcile"
+                )
+                return
+
+            # The KnativeServing CRD is created by the knative-operator, if it is missing the charm
+            # is reconciled again once it is created
+            with self._hook_timings.phase("crd-check"):
+                crd_created = self._crd_readiness.wait()
+            if not crd_created:
+                self.model.unit.status = WaitingStatus(
+                    "Waiting for knative-operator CRDs, checked again on update-status"
+                )
+                return
+            self._apply_and_set_status(fingerprint)
+            if isinstance(self.unit.status, ActiveStatus):
+                with self._hook_timings.phase("rollout-check"):
+                    self.unit.status = self._rollout_status()
+            if isinstance(self.unit.status, ActiveStatus):
+                self._apply_autoscalers()
+            if isinstance(self.unit.status, ActiveStatus):
+                self._reconcile_generation.record(fingerprint)
+        except ErrorWithStatus as e:
+            logger.error(e.msg)
+            self.unit.status = e.status
+        except ApiError as e:
+            raise GenericCharmRuntimeError(
+                f"Lightkube get CRD failed with error code: {e.status.code}"
+            ) from e
+
+    def _apply_autoscalers(self):
+        """Applies the configured HorizontalPodAutoscalers of the activator and webhook.
+
+        They take over the HorizontalPodAutoscalers of the same name created by the
+        knative-operator, which resets them whenever it reconciles the KnativeServing.  They are
+        applied once the KnativeServing is rolled out, and again on update-status if they were
+        reset since, see _reapply_drifted_autoscalers.  Those that are no longer configured are
+        deleted, for the knative-operator to create its own again.
+        """
+        resources = []
+        try:
+            if self.autoscaling_resource_handler.context["workload_autoscaling"]:
+                with self._hook_timings.phase("render-autoscalers"):
+                    resources = self.autoscaling_resource_handler.render_manifests(
+                        force_recompute=False
+                    )
+                self._applied_autoscaling_manifests.add_to_inventory(resources)
+                with self._hook_timings.phase("apply-autoscalers"):
+                    self.autoscaling_resource_handler.apply()
+            self._delete_stale_autoscalers(resources)
+        except ApiError as e:
+            logger.debug(traceback.format_exc())
+            logger.error(f"Applying autoscalers failed with ApiError status code {e.status.code}")
+            self.unit.status = BlockedStatus(f"ApiError: {e.status.code}")
+
+    def _reapply_drifted_autoscalers(self):
+        """Applies the configured HorizontalPodAutoscalers again if their live spec differs.
+
+        Each one is compared with the live HorizontalPodAutoscaler, so nothing is written unless
+        the knative-operator reset it since it was applied.
+        """
+        if not self.autoscaling_resource_handler.context["workload_autoscaling"]:
+            return
+        try:
+            with self._hook_timings.phase("render-autoscalers"):
+                resources = self.autoscaling_resource_handler.render_manifests(
+                    force_recompute=False
+                )
+            with self._hook_timings.phase("check-autoscalers"):
+                drifted = [
+                    resource.metadata.name
+                    for resource in resources
+                    if self._autoscaler_drifted(resource)
+                ]
+            if not drifted:
+                return
+            logger.info(f"Autoscalers reset by the knative-operator, applying again: {drifted}")
+            with self._hook_timings.phase("apply-autoscalers"):
+                self.autoscaling_resource_handler.apply()
+        except ApiError as e:
+            logger.debug(traceback.format_exc())
+            logger.error(f"Applying autoscalers failed with ApiError status code {e.status.code}")
+            self.unit.status = BlockedStatus(f"ApiError: {e.status.code}")
+
+    def _autoscaler_drifted(self, resource) -> bool:
+        """Returns True if the live HorizontalPodAutoscaler differs from the rendered resource.
+
+        Only the fields of the spec set by the charm are compared, as the API server defaults
+        the others.
+        """
+        try:
+            live = self.lightkube_client.get(
+                HorizontalPodAutoscaler, resource.metadata.name, namespace=SERVING_NAMESPACE
+            )
         except ApiError as e:
             if e.status.code == 404:
-                self.model.unit.status = WaitingStatus(
-                    "Waiting for knative-operator CRDs to be present."
+                return True
+            raise
+        live_spec = live.spec.to_dict()
+        return any(
+            live_spec.get(field) != value for field, value in resource.spec.to_dict().items()
+        )
+
+    def _delete_stale_autoscalers(self, resources):
+        """Deletes the charm's HorizontalPodAutoscalers that are not in resources.
+
+        Those are looked up in the inventory and among the HorizontalPodAutoscalers labelled by
+        the charm, as the inventory is lost with the charm's local state when its pod restarts.
+        """
+        with self._hook_timings.phase("list-autoscalers"):
+            deployed = list(
+                self.lightkube_client.list(
+                    HorizontalPodAutoscaler,
+                    namespace=SERVING_NAMESPACE,
+                    labels=self.autoscaling_resource_handler.labels,
                 )
-                event.defer()
-            else:
-                raise GenericCharmRuntimeError(
-                    f"Lightkube get CRD failed with error code: {e.status.code}"
-                ) from e
+            )
+        stale = self._applied_autoscaling_manifests.stale_references(resources, deployed)
+        if not stale:
+            return
+        logger.info(f"Deleting autoscalers that are no longer configured: {stale}")
+        with self._hook_timings.phase("delete-autoscalers"):
+            delete_resources(
+                self.lightkube_client, stale, self.model.config["delete-propagation-policy"]
+            )
+        self._applied_autoscaling_manifests.remove_from_inventory(stale)
+
+    def _rollout_status(self):
+        """Returns ActiveStatus once the KnativeServing reports it is Ready, else WaitingStatus.
+
+        The KnativeServing is Ready once the knative-operator rolled out every Deployment of
+        Knative Serving, with their replicas, and the Deployments became available.
+        """
+        try:
+            knative_serving = self.lightkube_client.get(
+                KnativeServing_v1beta1, self._app_name, namespace=SERVING_NAMESPACE
+            )
+        except ApiError as e:
+            logger.warning(f"Failed to get the KnativeServing with: {e}")
+            return WaitingStatus(ROLLOUT_WAITING_MESSAGE)
+
+        status = knative_serving.status or {}
+        if status.get("observedGeneration", 0) < (knative_serving.metadata.generation or 0):
+            return WaitingStatus(ROLLOUT_WAITING_MESSAGE)
+        ready = next((c for c in status.get("conditions", []) if c.get("type") == "Ready"), {})
+        if ready.get("status") != "True":
+            logger.info(f"KnativeServing is not Ready yet: {ready.get('message', '')}")
+            return WaitingStatus(ROLLOUT_WAITING_MESSAGE)
+        return ActiveStatus()
+
+    def _on_update_status(self, event):
+        """Reconciles the charm again while waiting for the KnativeServing to roll out.
+
+        Once it is rolled out, the HorizontalPodAutoscalers reset by the knative-operator since
+        the last hook are applied again.
+        """
+        if self.unit.status.message == ROLLOUT_WAITING_MESSAGE:
+            self._main(event)
+        elif isinstance(self.unit.status, ActiveStatus):
+            try:
+                self._reapply_drifted_autoscalers()
+            except ErrorWithStatus as e:
+                logger.error(e.msg)
+                self.unit.status = e.status
 
     def _on_ingress_gateway_relation_changed(self, _) -> None:
         self._send_ingress_gateway_data()
@@ -143,20 +440,42 @@ class KnativeServingCharm(CharmBase):
             gateway_namespace=SERVING_NAMESPACE,
         )
 
-    def _on_otel_collector_relation_changed(self, _):
-        """Event handler for on['otel-collector'].relation_changed."""
-        self._apply_and_set_status()
+    def _on_otel_collector_relation_changed(self, event):
+        """Event handler for on['otel-collector'].relation_changed.
+
+        The relation data is rendered into the KnativeServing, so the charm is reconciled fully,
+        waiting for the KnativeServing to roll out again.
+        """
+        self._main(event)
+
+    def _on_get_hook_timings(self, event):
+        """Event handler for the get-hook-timings action."""
+        event.set_results({"hooks": json.dumps(self._hook_timings.hooks, indent=2)})
 
     def _on_remove(self, _):
         self.unit.status = MaintenanceStatus("Removing k8s resources")
-        manifests = self.resource_handler.render_manifests()
+        with self._hook_timings.phase("render"):
+            resources = resources_to_delete(
+                self._applied_manifests, lambda: self.resource_handler
+            ) + resources_to_delete(
+                self._applied_autoscaling_manifests, lambda: self.autoscaling_resource_handler
+            )
         try:
-            delete_many(self.resource_handler.lightkube_client, manifests)
+            with self._hook_timings.phase("delete"):
+                delete_resources(
+                    self.lightkube_client,
+                    resources,
+                    propagation_policy=self.model.config["delete-propagation-policy"],
+                    on_progress=self._on_remove_progress,
+                )
         except ApiError as e:
-            logger.warning(f"Failed to delete resources: {manifests} with: {e}")
+            logger.warning(f"Failed to delete resources: {resources} with: {e}")
             raise e
         self.unit.status = MaintenanceStatus("K8s resources removed")
 
+    def _on_remove_progress(self, processed: int, total: int):
+        self.unit.status = MaintenanceStatus(f"Removing k8s resources ({processed}/{total})")
+
     @property
     def _otel_collector_relation_data(self):
         """Returns relation data from the otel-collector relation."""
@@ -177,6 +496,7 @@ class KnativeServingCharm(CharmBase):
 
     @property
     def _context(self):
+        autoscaler, deployment_profile = self._get_autoscaling_config()
         context = {
             "app_name": self._app_name,
             "domain": self.model.config["domain.name"],
@@ -185,13 +505,15 @@ class KnativeServingCharm(CharmBase):
             "serving_namespace": SERVING_NAMESPACE,
             "serving_version": self.model.config["version"],
             "custom_images": self._get_custom_images(),
+            "autoscaler": autoscaler,
+            "deployment_profile": deployment_profile,
             "progress_deadline": self.model.config["progress-deadline"],
             "registries_skip_tag_resolving": self.model.config[
                 "registries-skipping-tag-resolving"
             ],
-            "http_proxy": self.model.config["http-proxy"],
-            "https_proxy": self.model.config["https-proxy"],
-            "no_proxy": self.model.config["no-proxy"],
+            "high_availability_replicas": self._get_high_availability_replicas(),
+            "workloads": self._get_workloads(),
+            "workload_autoscaling": self._get_workload_autoscaling(),
         }
         if self._otel_collector_relation_data:
             context.update(self._otel_collector_relation_data)
@@ -200,6 +522,19 @@ class KnativeServingCharm(CharmBase):
 
         return context
 
+    @property
+    def lightkube_client(self) -> Client:
+        """Returns the lightkube Client shared by every Kubernetes operation in this hook.
+
+        Sharing one client means the in-cluster config is loaded once and every request reuses
+        the same keep-alive connection pool.
+        """
+        if not self._lightkube_client:
+            self._lightkube_client = self._hook_timings.count_api_calls(
+                Client(field_manager=self._namespace)
+            )
+        return self._lightkube_client
+
     @property
     def resource_handler(self):
         """Returns an instance of KubernetesResourceHandler."""
@@ -208,9 +543,26 @@ class KnativeServingCharm(CharmBase):
                 template_files=self._template_files,
                 context=self._context,
                 field_manager=self._namespace,
+                lightkube_client=self.lightkube_client,
             )
         return self._resource_handler
 
+    @property
+    def autoscaling_resource_handler(self):
+        """Returns an instance of KubernetesResourceHandler for the HorizontalPodAutoscalers."""
+        if not self._autoscaling_resource_handler:
+            self._autoscaling_resource_handler = KRH(
+                template_files=glob.glob("src/manifests/autoscaling/*.yaml.j2"),
+                context=self._context,
+                field_manager=self._namespace,
+                labels=create_charm_default_labels(
+                    self._app_name, self._namespace, scope="autoscaling"
+                ),
+                resource_types={HorizontalPodAutoscaler},
+                lightkube_client=self.lightkube_client,
+            )
+        return self._autoscaling_resource_handler
+
 
 if __name__ == "__main__":
     main(KnativeServingCharm)
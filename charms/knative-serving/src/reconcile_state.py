@@ -0,0 +1,200 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Helpers for tracking what this charm has already reconciled across hook executions."""
+
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from charmed_kubeflow_chisme.types import LightkubeResourcesList, LightkubeResourceType
+from lightkube.core.resource import NamespacedResource
+from ops.framework import Object, StoredState
+
+logger = logging.getLogger(__name__)
+
+# Resources are re-applied at least this often, even when unchanged, to revert any drift
+FORCED_REAPPLY_INTERVAL = 60 * 60
+
+
+def manifests_digest(template_files: Iterable[Union[str, Path]], context: dict) -> str:
+    """Returns a digest of the template files' content and the context used to render them."""
+    digest = hashlib.sha256()
+    for template_file in sorted(str(file) for file in template_files):
+        digest.update(template_file.encode())
+        digest.update(Path(template_file).read_bytes())
+    digest.update(json.dumps(context, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class ResourceReference(NamedTuple):
+    """A reference to a Kubernetes object, by apiVersion, kind, name and (optional) namespace."""
+
+    api_version: str
+    kind: str
+    name: str
+    namespace: Optional[str] = None
+
+    @classmethod
+    def from_resource(cls, resource: LightkubeResourceType) -> "ResourceReference":
+        """Returns a reference to a lightkube resource."""
+        return cls(
+            api_version=resource.apiVersion,
+            kind=resource.kind,
+            name=resource.metadata.name,
+            namespace=(
+                resource.metadata.namespace if isinstance(resource, NamespacedResource) else None
+            ),
+        )
+
+    @property
+    def key(self) -> Tuple[str, str, Optional[str], str]:
+        """Returns the group, kind, namespace and name of the object, whatever its API version.
+
+        An object moved to another version of its API (eg: autoscaling/v2beta2 to v2) is the
+        same object, so that it is never deleted as stale once applied with its new version.
+        """
+        return self.api_version.rpartition("/")[0], self.kind, self.namespace, self.name
+
+
+class AppliedManifests(Object):
+    """Records the digest of the last set of manifests successfully applied to the cluster.
+
+    Used to skip server-side apply when the desired state has not changed since the last
+    successful apply, while still forcing a periodic re-apply to catch any drift.
+
+    It also keeps an inventory of every object ever applied, so that they can be deleted
+    without rendering the manifests again.
+    """
+
+    _stored = StoredState()
+
+    def __init__(self, parent: Object, key: str, reapply_interval: int = FORCED_REAPPLY_INTERVAL):
+        super().__init__(parent, key)
+        self._reapply_interval = reapply_interval
+        self._stored.set_default(digest="", applied_at=0.0, inventory="[]")
+
+    @property
+    def inventory(self) -> List[ResourceReference]:
+        """Returns references to the objects applied so far, in the order they were added."""
+        return [ResourceReference(*reference) for reference in json.loads(self._stored.inventory)]
+
+    def add_to_inventory(self, resources: LightkubeResourcesList) -> None:
+        """Adds the resources to the inventory, before they are applied.
+
+        A reference to an object already in the inventory with another API version replaces it.
+        """
+        inventory = {reference.key: reference for reference in self.inventory}
+        for resource in resources:
+            reference = ResourceReference.from_resource(resource)
+            inventory[reference.key] = reference
+        self._stored.inventory = json.dumps(list(inventory.values()))
+
+    def remove_from_inventory(self, references: List[ResourceReference]) -> None:
+        """Removes the references from the inventory, once their objects have been deleted."""
+        removed = {reference.key for reference in references}
+        self._stored.inventory = json.dumps(
+            [reference for reference in self.inventory if reference.key not in removed]
+        )
+
+    def stale_references(
+        self, resources: LightkubeResourcesList, deployed: LightkubeResourcesList = ()
+    ) -> List[ResourceReference]:
+        """Returns the references to objects in the inventory, or deployed, not in resources.
+
+        Used once resources have been applied, to find the objects that are no longer rendered
+        (eg: an optional object that was disabled) and should be deleted.  The inventory is kept
+        in the charm's local state, which is lost when its pod is restarted, so the objects
+        found in the cluster (eg: by the label selector of a resource handler) can be passed as
+        deployed to find those applied before the restart.
+        """
+        rendered = {ResourceReference.from_resource(resource).key for resource in resources}
+        stale = {}
+        for reference in self.inventory + [
+            ResourceReference.from_resource(resource) for resource in deployed
+        ]:
+            if reference.key not in rendered:
+                stale.setdefault(reference.key, reference)
+        return list(stale.values())
+
+    def is_up_to_date(self, digest: str) -> bool:
+        """Returns True if `digest` was applied successfully within the re-apply interval."""
+        if digest != self._stored.digest:
+            return False
+        if time.time() - self._stored.applied_at >= self._reapply_interval:
+            logger.info("Re-apply interval elapsed, forcing apply of unchanged manifests")
+            return False
+        return True
+
+    def record(self, digest: str) -> None:
+        """Records `digest` as the last successfully applied set of manifests."""
+        self._stored.digest = digest
+        self._stored.applied_at = time.time()
+
+    def reset(self) -> None:
+        """Forgets the last applied manifests, so that the next apply is never skipped."""
+        self._stored.digest = ""
+        self._stored.applied_at = 0.0
+
+
+class ReconcileGeneration(Object):
+    """Tracks the generation of the charm's desired state and the last one fully reconciled.
+
+    The generation is bumped whenever the fingerprint of the desired state changes, and on
+    upgrade-charm, as the charm's own logic may have changed.  A burst of events for the same
+    desired state (eg: config-changed followed by pebble-ready as the pod restarts) can then be
+    coalesced into a single full reconcile, while still forcing one periodically to catch any
+    drift.
+    """
+
+    _stored = StoredState()
+
+    def __init__(
+        self, parent: Object, key: str, reconcile_interval: int = FORCED_REAPPLY_INTERVAL
+    ):
+        super().__init__(parent, key)
+        self._reconcile_interval = reconcile_interval
+        self._stored.set_default(
+            generation=0, fingerprint="", reconciled_generation=-1, reconciled_at=0.0
+        )
+        self.framework.observe(parent.on.upgrade_charm, self._on_upgrade_charm)
+
+    @property
+    def generation(self) -> int:
+        """Returns the current generation of the desired state."""
+        return self._stored.generation
+
+    def is_reconciled(self, fingerprint: str) -> bool:
+        """Returns True if `fingerprint` was reconciled in the current generation.
+
+        A full reconcile is still due once the reconcile interval has elapsed.
+        """
+        self._track(fingerprint)
+        if self._stored.reconciled_generation != self._stored.generation:
+            return False
+        if time.time() - self._stored.reconciled_at >= self._reconcile_interval:
+            logger.info("Reconcile interval elapsed, forcing reconcile of unchanged state")
+            return False
+        return True
+
+    def record(self, fingerprint: str) -> None:
+        """Records `fingerprint` as fully reconciled in the current generation."""
+        self._track(fingerprint)
+        self._stored.reconciled_generation = self._stored.generation
+        self._stored.reconciled_at = time.time()
+
+    def bump(self) -> None:
+        """Starts a new generation, so that the next reconcile is never skipped."""
+        self._stored.generation += 1
+
+    def _track(self, fingerprint: str) -> None:
+        if fingerprint != self._stored.fingerprint:
+            self._stored.fingerprint = fingerprint
+            self.bump()
+            logger.info(f"Desired state changed, starting generation {self.generation}")
+
+    def _on_upgrade_charm(self, _) -> None:
+        self.bump()
@@ -0,0 +1,124 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Concurrent, dependency-ordered deletion of the Kubernetes objects applied by the charm."""
+
+import logging
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus
+from lightkube import Client
+from lightkube.codecs import resource_registry
+from lightkube.core.exceptions import ApiError, LoadResourceError
+from lightkube.types import CascadeType
+
+from reconcile_state import AppliedManifests, ResourceReference
+from resource_waves import MAX_CONCURRENT_REQUESTS, group_into_waves
+
+logger = logging.getLogger(__name__)
+
+PROPAGATION_POLICIES = {cascade.value: cascade for cascade in CascadeType}
+DEFAULT_PROPAGATION_POLICY = CascadeType.BACKGROUND.value
+
+
+def resources_to_delete(
+    applied_manifests: AppliedManifests, resource_handler: Callable[[], object]
+) -> List[ResourceReference]:
+    """Returns the objects applied by a resource handler, as recorded in applied_manifests.
+
+    The manifests are only rendered if nothing was recorded, eg: when the charm was upgraded from
+    a revision that did not keep an inventory, which is why the resource handler is passed as a
+    callable: building it evaluates the charm's config, which may not be valid.  If it is not,
+    nothing is returned rather than failing the removal of the charm.
+    """
+    inventory = applied_manifests.inventory
+    if inventory:
+        return inventory
+    logger.info("No inventory of applied resources was recorded, rendering the manifests")
+    try:
+        resources = resource_handler().render_manifests()
+    except ErrorWithStatus as e:
+        logger.warning(f"Cannot render the manifests to delete, leaving them in place: {e.msg}")
+        return []
+    return [ResourceReference.from_resource(resource) for resource in resources]
+
+
+def delete_resources(
+    client: Client,
+    references: List[ResourceReference],
+    propagation_policy: str = DEFAULT_PROPAGATION_POLICY,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    max_workers: int = MAX_CONCURRENT_REQUESTS,
+) -> None:
+    """Deletes the referenced objects, concurrently and in the reverse of the order of creation.
+
+    Objects are deleted in the reverse order of the waves they are applied in (eg: workloads
+    first and CRDs last), with the objects of a wave deleted concurrently.  Objects that do not
+    exist are ignored, and every wave is attempted even if deleting an object in a previous one
+    failed.
+
+    Args:
+        client: the lightkube Client to delete the objects with
+        references: the objects to delete
+        propagation_policy: how the deletion is propagated to dependents, one of
+                            PROPAGATION_POLICIES.  Unknown policies are replaced by
+                            DEFAULT_PROPAGATION_POLICY
+        on_progress: (Optional) called with the number of objects processed so far and the total
+                     number of objects after every wave
+        max_workers: the maximum number of concurrent requests
+
+    Raises:
+        ApiError: the first error encountered deleting an object, once every wave was attempted
+    """
+    cascade = PROPAGATION_POLICIES.get(propagation_policy)
+    if cascade is None:
+        # A misconfiguration must not prevent the charm from being removed
+        logger.warning(
+            f"Unknown propagation policy {propagation_policy}, must be one of"
+            f" {', '.join(PROPAGATION_POLICIES)}. Using {DEFAULT_PROPAGATION_POLICY}"
+        )
+        cascade = PROPAGATION_POLICIES[DEFAULT_PROPAGATION_POLICY]
+
+    waves = list(reversed(group_into_waves(references)))
+    logger.info(f"Deleting {len(references)} resources in {len(waves)} waves")
+    errors = []
+    processed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for wave in waves:
+            errors += _delete_wave(executor, client, wave, cascade)
+            processed += len(wave)
+            if on_progress is not None:
+                on_progress(processed, len(references))
+    if errors:
+        raise errors[0]
+
+
+def _delete_wave(
+    executor: Executor, client: Client, wave: List[ResourceReference], cascade: CascadeType
+) -> List[Exception]:
+    """Deletes the objects of a wave concurrently, returning the errors encountered."""
+    futures = [executor.submit(_delete, client, reference, cascade) for reference in wave]
+    errors = []
+    for reference, future in zip(wave, futures):
+        if future.exception() is not None:
+            logger.warning(
+                f"Failed to delete {reference.kind} {reference.name}: {future.exception()}"
+            )
+            errors.append(future.exception())
+    return errors
+
+
+def _delete(client: Client, reference: ResourceReference, cascade: CascadeType) -> None:
+    """Deletes the referenced object, ignoring it if it does not exist or is of an unknown kind."""
+    try:
+        resource = resource_registry.load(reference.api_version, reference.kind)
+    except LoadResourceError:
+        logger.warning(f"Unknown resource {reference.kind}, cannot delete {reference.name}")
+        return
+    try:
+        client.delete(resource, reference.name, namespace=reference.namespace, cascade=cascade)
+    except ApiError as e:
+        if e.status.code != 404:
+            raise
+        logger.debug(f"{reference.kind} {reference.name} not found, ignoring")
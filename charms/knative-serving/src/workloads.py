@@ -0,0 +1,188 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Overrides of the Knative Serving workloads, rendered into the KnativeServing's `spec.workloads`.
+
+Each override of a Deployment of Knative Serving (eg: its replicas, or the environment and
+resources of its containers) is merged into a single entry of `spec.workloads` for that
+Deployment, as the knative-operator only applies the first entry of each name.
+"""
+
+from typing import Dict, List
+
+import yaml
+from lightkube.utils.quantity import parse_quantity
+
+# The main container of each Deployment of Knative Serving that can be overridden
+WORKLOAD_CONTAINERS = {
+    "activator": "activator",
+    "autoscaler": "autoscaler",
+    "autoscaler-hpa": "autoscaler-hpa",
+    "controller": "controller",
+    "net-istio-controller": "controller",
+    "net-istio-webhook": "webhook",
+    "webhook": "webhook",
+}
+SERVING_WORKLOADS = tuple(WORKLOAD_CONTAINERS)
+# The Deployments of Knative Serving shipped with a HorizontalPodAutoscaler
+AUTOSCALED_WORKLOADS = ("activator", "webhook")
+# The settings of a HorizontalPodAutoscaler, with their defaults (those of Knative Serving)
+AUTOSCALING_DEFAULTS = {"min-replicas": 1, "max-replicas": None, "target-cpu-utilization": 100}
+RESOURCES = ("cpu", "memory")
+RESOURCE_FIELDS = ("requests", "limits")
+
+# The resources of a container, eg: {"requests": {"cpu": "500m"}, "limits": {"memory": "1Gi"}}
+ContainerResources = Dict[str, Dict[str, str]]
+
+
+def parse_workload_replicas(workload_replicas: str) -> Dict[str, int]:
+    """Parses and validates the YAML or JSON replicas of each workload.
+
+    Raises:
+        yaml.YAMLError: if the config is not valid YAML.
+        ValueError: if the config is not a mapping, has an unknown workload or invalid replicas.
+    """
+    parsed = yaml.safe_load(workload_replicas) or {}
+    if not isinstance(parsed, dict):
+        raise ValueError("must be a mapping of workload names to replicas")
+
+    for workload, replicas in parsed.items():
+        _validate_workload(workload)
+        if isinstance(replicas, bool) or not isinstance(replicas, int) or replicas < 1:
+            raise ValueError(f"replicas of {workload} must be a positive integer, got {replicas}")
+    return parsed
+
+
+def parse_workload_resources(workload_resources: str) -> Dict[str, ContainerResources]:
+    """Parses and validates the YAML or JSON resources of the main container of each workload.
+
+    Eg: {"activator": {"requests": {"cpu": "500m"}, "limits": {"cpu": "2", "memory": "1Gi"}}}
+
+    Raises:
+        yaml.YAMLError: if the config is not valid YAML.
+        ValueError: if the config is not a mapping, has an unknown workload, field or resource,
+                    an invalid quantity or a request exceeding its limit.
+    """
+    parsed = yaml.safe_load(workload_resources) or {}
+    if not isinstance(parsed, dict):
+        raise ValueError("must be a mapping of workload names to resources")
+
+    resources = {}
+    for workload, container_resources in parsed.items():
+        _validate_workload(workload)
+        resources[workload] = _parse_container_resources(workload, container_resources)
+    return resources
+
+
+def parse_workload_autoscaling(workload_autoscaling: str) -> Dict[str, Dict[str, int]]:
+    """Parses and validates the YAML or JSON HorizontalPodAutoscaler settings of each workload.
+
+    Eg: {"activator": {"min-replicas": 2, "max-replicas": 40, "target-cpu-utilization": 70}}
+    Settings omitted default to those of AUTOSCALING_DEFAULTS, max-replicas being required.
+
+    Raises:
+        yaml.YAMLError: if the config is not valid YAML.
+        ValueError: if the config is not a mapping, has a workload that is not autoscaled, an
+                    unknown setting or invalid replicas or utilization.
+    """
+    parsed = yaml.safe_load(workload_autoscaling) or {}
+    if not isinstance(parsed, dict):
+        raise ValueError("must be a mapping of workload names to autoscaling settings")
+
+    autoscaling = {}
+    for workload, settings in parsed.items():
+        if workload not in AUTOSCALED_WORKLOADS:
+            raise ValueError(
+                f"workload {workload!r} cannot be autoscaled, one of "
+                f"{', '.join(AUTOSCALED_WORKLOADS)}"
+            )
+        if not isinstance(settings, dict):
+            raise ValueError(f"autoscaling of {workload} must be a mapping of settings")
+        unknown = set(settings) - set(AUTOSCALING_DEFAULTS)
+        if unknown:
+            raise ValueError(f"unknown autoscaling settings of {workload}: {', '.join(unknown)}")
+        settings = {**AUTOSCALING_DEFAULTS, **settings}
+        if settings["max-replicas"] is None:
+            raise ValueError(f"max-replicas of {workload} is required")
+        for setting, value in settings.items():
+            if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+                raise ValueError(f"{setting} of {workload} must be a positive integer")
+        if settings["max-replicas"] < settings["min-replicas"]:
+            raise ValueError(f"max-replicas of {workload} must be at least its min-replicas")
+        autoscaling[workload] = settings
+    return autoscaling
+
+
+def workloads(
+    replicas: Dict[str, int] = None,
+    env: Dict[str, Dict[str, Dict[str, str]]] = None,
+    resources: Dict[str, ContainerResources] = None,
+) -> List[dict]:
+    """Returns the `spec.workloads` of the KnativeServing, merging the overrides of each workload.
+
+    Args:
+        replicas: (Optional) the replicas of each workload.
+        env: (Optional) the environment variables of each container, by container name, of each
+             workload, eg: {"controller": {"controller": {"HTTP_PROXY": "proxy:3128"}}}.
+             Empty variables are left out.
+        resources: (Optional) the resources of the main container of each workload.
+    """
+    overrides = {}
+    for workload, workload_replicas in (replicas or {}).items():
+        overrides.setdefault(workload, {})["replicas"] = workload_replicas
+    for workload, containers in (env or {}).items():
+        container_env = [
+            {
+                "container": container,
+                "envVars": [
+                    {"name": name, "value": value} for name, value in variables.items() if value
+                ],
+            }
+            for container, variables in containers.items()
+            if any(variables.values())
+        ]
+        if container_env:
+            overrides.setdefault(workload, {})["env"] = container_env
+    for workload, container_resources in (resources or {}).items():
+        if any(container_resources.values()):
+            overrides.setdefault(workload, {})["resources"] = [
+                {"container": WORKLOAD_CONTAINERS[workload], **container_resources}
+            ]
+    return [{"name": workload, **overrides[workload]} for workload in sorted(overrides)]
+
+
+def _parse_container_resources(workload: str, container_resources) -> ContainerResources:
+    """Validates the resources of the main container of a workload, as strings.
+
+    Raises:
+        ValueError: if the resources are not a mapping, have an unknown field or resource, an
+                    invalid quantity or a request exceeding its limit.
+    """
+    if not isinstance(container_resources, dict):
+        raise ValueError(f"resources of {workload} must be a mapping of requests and limits")
+    parsed = {}
+    for field, quantities in container_resources.items():
+        if field not in RESOURCE_FIELDS or not isinstance(quantities, dict):
+            raise ValueError(f"{workload} {field} must be one of {', '.join(RESOURCE_FIELDS)}")
+        parsed[field] = {}
+        for resource, quantity in quantities.items():
+            if resource not in RESOURCES:
+                raise ValueError(f"{workload} {field} must only set {', '.join(RESOURCES)}")
+            try:
+                parse_quantity(str(quantity))
+            except ValueError:
+                raise ValueError(f"{workload} {resource} {field} is not a valid quantity")
+            parsed[field][resource] = str(quantity)
+
+    for resource in RESOURCES:
+        request = parsed.get("requests", {}).get(resource)
+        limit = parsed.get("limits", {}).get(resource)
+        if request and limit and parse_quantity(request) > parse_quantity(limit):
+            raise ValueError(f"{workload} {resource} request {request} exceeds its limit")
+    return parsed
+
+
+def _validate_workload(workload: str):
+    """Raises a ValueError if workload is not a Deployment of Knative Serving."""
+    if workload not in WORKLOAD_CONTAINERS:
+        raise ValueError(f"unknown workload {workload!r}, one of {', '.join(SERVING_WORKLOADS)}")
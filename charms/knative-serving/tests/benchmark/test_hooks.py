@@ -0,0 +1,91 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Checks the latency and Kubernetes API usage of the charm's hooks against a budget.
+
+Budgets are set with some headroom above the measured values, so that they catch regressions
+(eg: an extra request per resource, or rendering the templates twice) rather than noise.  Update
+them alongside any change that deliberately changes the cost of a hook.
+"""
+
+import time
+from typing import NamedTuple
+
+from ops.model import ActiveStatus
+
+
+class Budget(NamedTuple):
+    seconds: float
+    requests: int
+    bytes_transferred: int
+
+
+BUDGETS = {
+    # Checks for the CRD, applies the Namespace and the KnativeServing, checks its rollout, then
+    # lists the charm's autoscalers to delete those no longer configured
+    "install": Budget(seconds=1, requests=6, bytes_transferred=7_000),
+    # The context changed, so both resources are applied again, the rollout checked and the
+    # autoscalers listed
+    "config-changed": Budget(seconds=1, requests=6, bytes_transferred=7_000),
+    # Deletes every resource once
+    "remove": Budget(seconds=1, requests=3, bytes_transferred=1_000),
+}
+
+
+def start_hook(charm):
+    """Drops what the charm caches for the duration of a hook, as if it ran in a new process."""
+    for attribute in (
+        "_lightkube_client",
+        "_resource_handler",
+        "_autoscaling_resource_handler",
+        "_observability_resource_handler",
+    ):
+        if hasattr(charm, attribute):
+            setattr(charm, attribute, None)
+
+
+def run_within_budget(harness, fake_kubernetes, hook, emit):
+    """Emits a hook, asserting that it stays within its budget."""
+    budget = BUDGETS[hook]
+    start_hook(harness.charm)
+    fake_kubernetes.reset_stats()
+
+    started_at = time.perf_counter()
+    emit()
+    seconds = time.perf_counter() - started_at
+
+    print(
+        f"{hook}: {seconds:.3f}s, {fake_kubernetes.requests} requests"
+        f" {fake_kubernetes.requests_by_method}, {fake_kubernetes.bytes_transferred} bytes"
+    )
+    assert seconds <= budget.seconds
+    assert fake_kubernetes.requests <= budget.requests
+    assert fake_kubernetes.bytes_transferred <= budget.bytes_transferred
+
+
+def test_install(harness, fake_kubernetes):
+    run_within_budget(harness, fake_kubernetes, "install", harness.charm.on.install.emit)
+
+    assert harness.model.unit.status == ActiveStatus()
+
+
+def test_config_changed(harness, fake_kubernetes):
+    harness.charm.on.install.emit()
+
+    run_within_budget(
+        harness,
+        fake_kubernetes,
+        "config-changed",
+        lambda: harness.update_config({"domain.name": "example.com"}),
+    )
+
+    assert harness.model.unit.status == ActiveStatus()
+
+
+def test_remove(harness, fake_kubernetes):
+    harness.charm.on.install.emit()
+
+    run_within_budget(harness, fake_kubernetes, "remove", harness.charm.on.remove.emit)
+
+    remaining = [obj["metadata"]["name"] for obj in fake_kubernetes.objects()]
+    assert remaining == ["knativeservings.operator.knative.dev"]
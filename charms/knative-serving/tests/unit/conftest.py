@@ -4,18 +4,23 @@
 from unittest import mock
 
 import pytest
+from lightkube.models.meta_v1 import ObjectMeta
 from ops.testing import Harness
 
 from charm import KnativeServingCharm
+from lightkube_custom_resources.operator import KnativeServing_v1beta1
 
 
 @pytest.fixture()
 def mocked_lightkube_client_class(mocker):
     """Prevents lightkube clients from being created, returning a mock instead."""
-    mocked_lightkube_client_class = mocker.patch(
-        "charmed_kubeflow_chisme.kubernetes._kubernetes_resource_handler.Client"
-    )
+    mocked_lightkube_client_class = mocker.patch("charm.Client")
     mocked_lightkube_client_class.return_value = mock.MagicMock()
+    # The KnativeServing is rolled out as soon as it is applied
+    mocked_lightkube_client_class.return_value.get.return_value = KnativeServing_v1beta1(
+        metadata=ObjectMeta(name="knative-serving"),
+        status={"conditions": [{"type": "Ready", "status": "True"}]},
+    )
     yield mocked_lightkube_client_class
 
 
@@ -0,0 +1,101 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+import pytest
+import yaml
+
+from autoscaler_config import (
+    AUTOSCALER_KEYS,
+    AUTOSCALING_PROFILES,
+    AutoscalingProfile,
+    autoscaling_profile,
+    parse_autoscaler_config,
+    parse_duration,
+)
+
+
+@pytest.mark.parametrize(
+    "autoscaler_config, expected_config",
+    [
+        ("", {}),
+        (
+            yaml.dump(
+                {
+                    "stable-window": "30s",
+                    "panic-window-percentage": 5,
+                    "target-burst-capacity": -1,
+                    "container-concurrency-target-default": 0.5,
+                    "enable-scale-to-zero": False,
+                    "scale-to-zero-grace-period": "1m30s",
+                    "min-scale": "",
+                }
+            ),
+            {
+                "stable-window": "30s",
+                "panic-window-percentage": "5",
+                "target-burst-capacity": "-1",
+                "container-concurrency-target-default": "0.5",
+                "enable-scale-to-zero": "false",
+                "scale-to-zero-grace-period": "1m30s",
+            },
+        ),
+        ('{"max-scale-up-rate": "1000.0"}', {"max-scale-up-rate": "1000.0"}),
+    ],
+)
+def test_parse_autoscaler_config(autoscaler_config, expected_config):
+    assert parse_autoscaler_config(autoscaler_config) == expected_config
+
+
+@pytest.mark.parametrize(
+    "autoscaler_config",
+    [
+        "- stable-window",
+        "panic-window: 6s",
+        "stable-window: 5s",
+        "stable-window: 2h",
+        "stable-window: soon",
+        "scale-to-zero-grace-period: 1s",
+        "target-burst-capacity: -2",
+        "container-concurrency-target-percentage: 101",
+        "max-scale-down-rate: 1",
+        "min-scale: 1.5",
+        "enable-scale-to-zero: maybe",
+        "pod-autoscaler-class: other",
+    ],
+)
+def test_parse_autoscaler_config_invalid(autoscaler_config):
+    with pytest.raises(ValueError):
+        parse_autoscaler_config(autoscaler_config)
+
+
+def test_parse_autoscaler_config_invalid_yaml():
+    with pytest.raises(yaml.YAMLError):
+        parse_autoscaler_config("{")
+
+
+@pytest.mark.parametrize(
+    "duration, expected_seconds",
+    [("6s", 6), ("1m30s", 90), ("1h", 3600), ("500ms", 0.5), ("1.5m", 90)],
+)
+def test_parse_duration(duration, expected_seconds):
+    assert parse_duration(duration) == pytest.approx(expected_seconds)
+
+
+@pytest.mark.parametrize("name", list(AUTOSCALING_PROFILES))
+def test_autoscaling_profiles_are_valid(name):
+    profile = autoscaling_profile(name)
+
+    assert parse_autoscaler_config(yaml.dump(profile.autoscaler)) == profile.autoscaler
+    assert set(profile.deployment) == {"queue-sidecar-cpu-request", "queue-sidecar-memory-request"}
+
+
+def test_autoscaling_profile_not_set():
+    assert autoscaling_profile("") == AutoscalingProfile(autoscaler={}, deployment={})
+
+
+def test_autoscaling_profile_unknown():
+    with pytest.raises(ValueError):
+        autoscaling_profile("fastest")
+
+
+def test_autoscaler_keys_are_sorted():
+    assert list(AUTOSCALER_KEYS) == sorted(AUTOSCALER_KEYS)
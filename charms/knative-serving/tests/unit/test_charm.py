@@ -1,5 +1,7 @@
 # Copyright 2023 Canonical Ltd.
 # See LICENSE file for licensing details.
+import copy
+import json
 from contextlib import nullcontext as does_not_raise
 from unittest.mock import MagicMock, patch
 
@@ -8,9 +10,23 @@ import yaml
 from charmed_kubeflow_chisme.exceptions import ErrorWithStatus, GenericCharmRuntimeError
 from charmed_kubeflow_chisme.lightkube.mocking import FakeApiError
 from lightkube import ApiError
+from lightkube.models.autoscaling_v2 import (
+    CrossVersionObjectReference,
+    HorizontalPodAutoscalerSpec,
+)
+from lightkube.models.meta_v1 import ObjectMeta
+from lightkube.resources.autoscaling_v2 import HorizontalPodAutoscaler
 from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
 
-from charm import CUSTOM_IMAGE_CONFIG_NAME, DEFAULT_IMAGES, SERVING_NAMESPACE
+from autoscaler_config import AUTOSCALING_PROFILES
+from charm import (
+    AUTOSCALER_CONFIG_NAME,
+    CUSTOM_IMAGE_CONFIG_NAME,
+    DEFAULT_IMAGES,
+    ROLLOUT_WAITING_MESSAGE,
+    SERVING_NAMESPACE,
+)
+from lightkube_custom_resources.operator import KnativeServing_v1beta1
 
 
 class _FakeResponse:
@@ -39,6 +55,19 @@ class _FakeApiError(ApiError):
         super().__init__(response=_FakeResponse(code))
 
 
+def _knative_serving(generation=1, observed_generation=1, ready="True"):
+    """Returns a KnativeServing, as reported by the knative-operator."""
+    return KnativeServing_v1beta1(
+        metadata=ObjectMeta(
+            name="knative-serving", namespace=SERVING_NAMESPACE, generation=generation
+        ),
+        status={
+            "observedGeneration": observed_generation,
+            "conditions": [{"type": "Ready", "status": ready, "message": "not ready"}],
+        },
+    )
+
+
 def test_events(harness, mocked_lightkube_client):
     # Test install and config_changed event handlers are called
     harness.begin()
@@ -55,6 +84,7 @@ def test_events(harness, mocked_lightkube_client):
 
 @patch("charm.Client")
 def test_active(lk_client, harness, mocked_lightkube_client):
+    lk_client.return_value = mocked_lightkube_client
     harness.begin_with_initial_hooks()
     rel_id = harness.add_relation("otel-collector", "app")
     harness.update_relation_data(rel_id, "app", {"some-key": "some-value"})
@@ -65,6 +95,7 @@ def test_active(lk_client, harness, mocked_lightkube_client):
 
 @patch("charm.Client")
 def test_missing_knative_serving_crd(lk_client, harness, mocker, mocked_lightkube_client):
+    lk_client.return_value = mocked_lightkube_client
     harness.begin()
 
     # Set the side effect of Client to a FakeApiError
@@ -76,22 +107,56 @@ def test_missing_knative_serving_crd(lk_client, harness, mocker, mocked_lightkub
     harness.charm.on.install.emit()
     assert isinstance(harness.model.unit.status, WaitingStatus)
 
+    # The charm is reconciled once update-status finds the CRD
+    lk_client.return_value.get.side_effect = None
+    harness.charm.on.update_status.emit()
+    assert harness.model.unit.status == ActiveStatus()
+
 
 @patch("charm.Client")
 def test_error_getting_knative_serving_crd(lk_client, harness, mocker, mocked_lightkube_client):
     harness.begin()
 
+    # Set the relation to otel-collector
+    with harness.hooks_disabled():
+        rel_id = harness.add_relation("otel-collector", "app")
+        harness.update_relation_data(rel_id, "app", {"some-key": "some-value"})
+
     # Set the side effect of Client to a FakeApiError
     lk_client.return_value.get.side_effect = _FakeApiError(code=403)
 
-    # Set the relation to otel-collector
-    rel_id = harness.add_relation("otel-collector", "app")
-    harness.update_relation_data(rel_id, "app", {"some-key": "some-value"})
-
     with pytest.raises(GenericCharmRuntimeError):
         harness.charm.on.install.emit()
 
 
+def test_lightkube_client_is_shared(harness, mocked_lightkube_client_class):
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+
+    harness.charm.on.install.emit()
+
+    mocked_lightkube_client_class.assert_called_once()
+    assert harness.charm.resource_handler.lightkube_client is harness.charm.lightkube_client
+
+
+def test_get_hook_timings_action(harness, mocked_lightkube_client):
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+
+    harness.charm.on.install.emit()
+    harness.framework.commit()
+    output = harness.run_action("get-hook-timings")
+
+    hooks = json.loads(output.results["hooks"])
+    assert [phase["phase"] for phase in hooks[0]["phases"]] == [
+        "crd-check",
+        "render",
+        "apply",
+        "rollout-check",
+        "list-autoscalers",
+    ]
+
+
 @pytest.mark.parametrize(
     "apply_error, raised_exception",
     (
@@ -113,12 +178,295 @@ def test_apply_and_set_status_blocked(
     harness.charm.resource_handler.apply = MagicMock()
     harness.charm.resource_handler.apply.side_effect = apply_error
 
-    harness.charm._apply_and_set_status()
+    harness.charm._apply_and_set_status("digest")
     with raised_exception:
         harness.charm.resource_handler.apply()
     assert isinstance(harness.model.unit.status, BlockedStatus)
 
 
+def test_apply_and_set_status_skips_unchanged_manifests(harness, mocked_lightkube_client):
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+
+    harness.charm._apply_and_set_status("digest")
+    harness.charm._apply_and_set_status("digest")
+
+    harness.charm.resource_handler.apply.assert_called_once()
+    assert harness.model.unit.status == ActiveStatus()
+
+
+def test_apply_and_set_status_reapplies_after_failure(harness, mocked_lightkube_client):
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock(side_effect=FakeApiError(400))
+
+    harness.charm._apply_and_set_status("digest")
+    assert isinstance(harness.model.unit.status, BlockedStatus)
+
+    harness.charm.resource_handler.apply.side_effect = None
+    harness.charm._apply_and_set_status("digest")
+    harness.charm._apply_and_set_status("digest")
+
+    assert harness.charm.resource_handler.apply.call_count == 2
+    assert harness.model.unit.status == ActiveStatus()
+
+
+def test_main_coalesces_reconciled_state(harness, mocked_lightkube_client):
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+
+    harness.charm.on.install.emit()
+    harness.charm.on.config_changed.emit()
+
+    # The second event is coalesced, without even checking for the CRD or the rollout
+    assert mocked_lightkube_client.get.call_count == 2
+    harness.charm.resource_handler.apply.assert_called_once()
+    assert harness.model.unit.status == ActiveStatus()
+
+    # A new desired state is reconciled in full
+    harness.update_config({"version": "1.0.0"})
+    # The resource handler (and its context) is only created once per hook
+    harness.charm.resource_handler.context = harness.charm._context
+    harness.charm.on.config_changed.emit()
+    assert mocked_lightkube_client.get.call_count == 4
+    assert harness.charm.resource_handler.apply.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "knative_serving_status",
+    [
+        _knative_serving(ready="False"),
+        _knative_serving(generation=2, observed_generation=1),
+        FakeApiError(404),
+    ],
+)
+def test_main_waits_for_rollout(knative_serving_status, harness, mocked_lightkube_client):
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+    mocked_lightkube_client.get.side_effect = [MagicMock(), knative_serving_status]
+
+    harness.charm.on.install.emit()
+
+    assert harness.model.unit.status == WaitingStatus(ROLLOUT_WAITING_MESSAGE)
+
+    # update-status checks the rollout again, without applying the unchanged manifests again
+    mocked_lightkube_client.get.side_effect = None
+    harness.charm.on.update_status.emit()
+
+    assert harness.model.unit.status == ActiveStatus()
+    harness.charm.resource_handler.apply.assert_called_once()
+
+    # Once active, update-status only applies the autoscalers again, without a rollout check
+    harness.charm.on.update_status.emit()
+    assert mocked_lightkube_client.get.call_count == 4
+
+
+def test_main_applies_autoscalers_once_rolled_out(harness, mocked_lightkube_client):
+    harness.update_config({"workload-autoscaling": "{activator: {max-replicas: 40}}"})
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+    harness.charm.autoscaling_resource_handler.apply = MagicMock()
+    mocked_lightkube_client.get.side_effect = [MagicMock(), _knative_serving(ready="False")]
+
+    harness.charm.on.install.emit()
+
+    harness.charm.autoscaling_resource_handler.apply.assert_not_called()
+
+    mocked_lightkube_client.get.side_effect = None
+    harness.charm.on.update_status.emit()
+
+    harness.charm.autoscaling_resource_handler.apply.assert_called_once()
+    assert harness.model.unit.status == ActiveStatus()
+    assert [
+        reference.name for reference in harness.charm._applied_autoscaling_manifests.inventory
+    ] == ["activator"]
+
+
+def test_main_autoscalers_apply_error(harness, mocked_lightkube_client):
+    harness.update_config({"workload-autoscaling": "{activator: {max-replicas: 40}}"})
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+    harness.charm.autoscaling_resource_handler.apply = MagicMock(side_effect=FakeApiError(403))
+
+    harness.charm.on.install.emit()
+
+    assert harness.model.unit.status == BlockedStatus("ApiError: 403")
+
+
+def _live_autoscalers(charm, min_replicas=None):
+    """Returns the rendered HorizontalPodAutoscalers by name, as if they were live.
+
+    Args:
+        charm: the charm rendering them.
+        min_replicas: (Optional) the minReplicas they were reset to, eg: by the knative-operator.
+    """
+    autoscalers = {
+        resource.metadata.name: copy.deepcopy(resource)
+        for resource in charm.autoscaling_resource_handler.render_manifests()
+    }
+    if min_replicas is not None:
+        for autoscaler in autoscalers.values():
+            autoscaler.spec.minReplicas = min_replicas
+    return autoscalers
+
+
+@pytest.mark.parametrize("min_replicas, reapplied", [(None, False), (5, True)])
+def test_update_status_reapplies_drifted_autoscalers(
+    min_replicas, reapplied, harness, mocked_lightkube_client
+):
+    """The knative-operator resets the autoscalers whenever it reconciles the KnativeServing."""
+    harness.update_config({"workload-autoscaling": "{activator: {max-replicas: 40}}"})
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+    harness.charm.autoscaling_resource_handler.apply = MagicMock()
+    harness.charm.on.install.emit()
+    harness.charm.autoscaling_resource_handler.apply.reset_mock()
+    mocked_lightkube_client.reset_mock()
+    live = _live_autoscalers(harness.charm, min_replicas)
+    mocked_lightkube_client.get.side_effect = lambda res, name, namespace: live[name]
+
+    harness.charm.on.update_status.emit()
+
+    assert harness.charm.autoscaling_resource_handler.apply.called is reapplied
+    mocked_lightkube_client.get.assert_called_once_with(
+        HorizontalPodAutoscaler, "activator", namespace=SERVING_NAMESPACE
+    )
+    mocked_lightkube_client.list.assert_not_called()
+    harness.charm.resource_handler.apply.assert_called_once()
+    assert harness.model.unit.status == ActiveStatus()
+
+
+def test_update_status_reapplies_deleted_autoscalers(harness, mocked_lightkube_client):
+    harness.update_config({"workload-autoscaling": "{activator: {max-replicas: 40}}"})
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+    harness.charm.autoscaling_resource_handler.apply = MagicMock()
+    harness.charm.on.install.emit()
+    harness.charm.autoscaling_resource_handler.apply.reset_mock()
+    mocked_lightkube_client.get.side_effect = FakeApiError(404)
+
+    harness.charm.on.update_status.emit()
+
+    harness.charm.autoscaling_resource_handler.apply.assert_called_once()
+
+
+def test_update_status_without_autoscalers(harness, mocked_lightkube_client):
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+    harness.charm.on.install.emit()
+    mocked_lightkube_client.reset_mock()
+
+    harness.charm.on.update_status.emit()
+
+    assert mocked_lightkube_client.method_calls == []
+    assert harness.model.unit.status == ActiveStatus()
+
+
+def test_update_status_autoscalers_apply_error(harness, mocked_lightkube_client):
+    harness.update_config({"workload-autoscaling": "{activator: {max-replicas: 40}}"})
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+    harness.charm.autoscaling_resource_handler.apply = MagicMock()
+    harness.charm.on.install.emit()
+    harness.charm.autoscaling_resource_handler.apply.side_effect = FakeApiError(403)
+    live = _live_autoscalers(harness.charm, min_replicas=5)
+    mocked_lightkube_client.get.side_effect = lambda res, name, namespace: live[name]
+
+    harness.charm.on.update_status.emit()
+
+    assert harness.model.unit.status == BlockedStatus("ApiError: 403")
+
+
+@patch("charm.delete_resources")
+def test_main_deletes_autoscalers_no_longer_configured(
+    delete_resources, harness, mocked_lightkube_client
+):
+    harness.update_config(
+        {"workload-autoscaling": "{activator: {max-replicas: 40}, webhook: {max-replicas: 5}}"}
+    )
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+    harness.charm.autoscaling_resource_handler.apply = MagicMock()
+    harness.charm.on.install.emit()
+    delete_resources.assert_not_called()
+
+    with harness.hooks_disabled():
+        harness.update_config({"workload-autoscaling": "{activator: {max-replicas: 40}}"})
+    # The config-changed hook runs in a new charm instance, without resource handlers built yet
+    harness.charm._resource_handler = None
+    harness.charm._autoscaling_resource_handler = None
+    harness.charm.resource_handler.apply = MagicMock()
+    harness.charm.autoscaling_resource_handler.apply = MagicMock()
+
+    harness.charm.on.config_changed.emit()
+
+    deleted = [
+        (reference.kind, reference.name) for reference in delete_resources.call_args.args[1]
+    ]
+    assert deleted == [("HorizontalPodAutoscaler", "webhook")]
+    assert [
+        reference.name for reference in harness.charm._applied_autoscaling_manifests.inventory
+    ] == ["activator"]
+
+
+@patch("charm.delete_resources")
+def test_main_deletes_labelled_autoscalers_no_longer_configured(
+    delete_resources, harness, mocked_lightkube_client
+):
+    """Autoscalers applied before the charm's pod restarted are found by their labels."""
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+    deployed = HorizontalPodAutoscaler(
+        apiVersion="autoscaling/v2",
+        kind="HorizontalPodAutoscaler",
+        metadata=ObjectMeta(name="activator", namespace=SERVING_NAMESPACE),
+        spec=HorizontalPodAutoscalerSpec(
+            maxReplicas=40,
+            scaleTargetRef=CrossVersionObjectReference(kind="Deployment", name="activator"),
+        ),
+    )
+    mocked_lightkube_client.list.return_value = [deployed]
+
+    harness.charm.on.install.emit()
+
+    mocked_lightkube_client.list.assert_called_once_with(
+        HorizontalPodAutoscaler,
+        namespace=SERVING_NAMESPACE,
+        labels=harness.charm.autoscaling_resource_handler.labels,
+    )
+    deleted = [
+        (reference.kind, reference.name) for reference in delete_resources.call_args.args[1]
+    ]
+    assert deleted == [("HorizontalPodAutoscaler", "activator")]
+    assert harness.model.unit.status == ActiveStatus()
+
+
+def test_main_autoscaled_workload_replicas(harness, mocked_lightkube_client):
+    harness.update_config(
+        {
+            "workload-autoscaling": "{activator: {max-replicas: 40}}",
+            "workload-replicas": "{activator: 3, controller: 2}",
+        }
+    )
+    harness.begin()
+
+    harness.charm.on.install.emit()
+
+    assert isinstance(harness.model.unit.status, BlockedStatus)
+    assert "activator" in harness.model.unit.status.message
+    assert "controller" not in harness.model.unit.status.message
+
+
+def test_main_without_autoscalers(harness, mocked_lightkube_client):
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+    harness.charm.autoscaling_resource_handler.apply = MagicMock()
+
+    harness.charm.on.install.emit()
+
+    harness.charm.autoscaling_resource_handler.apply.assert_not_called()
+    assert harness.model.unit.status == ActiveStatus()
+
+
 @pytest.mark.parametrize(
     "gateway_relation, charm_config, expected_data",
     (
@@ -175,17 +523,31 @@ def test_gateway_relation_data(
         assert expected_data == actual_data
 
 
-def test_otel_collector_relation_changed(harness):
+def test_otel_collector_relation_changed(harness, mocked_lightkube_client):
     harness.begin()
-    harness.charm._apply_and_set_status = MagicMock()
+    harness.charm.resource_handler.apply = MagicMock()
+    harness.charm.on.install.emit()
+    with harness.hooks_disabled():
+        rel_id = harness.add_relation("otel-collector", "app")
+        harness.update_relation_data(
+            rel_id,
+            "app",
+            {"otel_collector_svc_name": "otel-collector", "otel_collector_port": "1"},
+        )
+    # The relation-changed hook runs in a new charm instance, without resource handlers built yet
+    harness.charm._resource_handler = None
+    harness.charm.resource_handler.apply = MagicMock()
+    mocked_lightkube_client.get.side_effect = [MagicMock(), _knative_serving(ready="False")]
 
-    rel_id = harness.add_relation("otel-collector", "app")
-    harness.update_relation_data(rel_id, "app", {"some-key": "some-value"})
+    relation = harness.model.get_relation("otel-collector", rel_id)
+    harness.charm.on["otel-collector"].relation_changed.emit(relation, relation.app)
 
-    harness.charm._apply_and_set_status.assert_called_once()
+    # The KnativeServing rolls out again with the otel collector's address
+    harness.charm.resource_handler.apply.assert_called_once()
+    assert harness.model.unit.status == WaitingStatus(ROLLOUT_WAITING_MESSAGE)
 
 
-def test_context_changes(harness):
+def test_context_changes(harness, mocked_lightkube_client):
     harness.update_config(
         {
             "istio.gateway.name": "knative-gateway",
@@ -205,10 +567,26 @@ def test_context_changes(harness):
         "registries_skip_tag_resolving": harness.model.config["registries-skipping-tag-resolving"],
         "serving_namespace": SERVING_NAMESPACE,
         "serving_version": harness.model.config["version"],
-        "http_proxy": harness.model.config["http-proxy"],
-        "https_proxy": harness.model.config["https-proxy"],
-        "no_proxy": harness.model.config["no-proxy"],
+        "high_availability_replicas": 1,
+        "workload_autoscaling": {},
+        "workloads": [
+            {
+                "name": "controller",
+                "env": [
+                    {
+                        "container": "controller",
+                        "envVars": [
+                            {"name": "HTTP_PROXY", "value": "my_http_proxy"},
+                            {"name": "HTTPS_PROXY", "value": "my_https_proxy"},
+                            {"name": "NO_PROXY", "value": "my_no_proxy"},
+                        ],
+                    }
+                ],
+            }
+        ],
         CUSTOM_IMAGE_CONFIG_NAME: DEFAULT_IMAGES,
+        AUTOSCALER_CONFIG_NAME: {},
+        "deployment_profile": {},
     }
 
     assert harness.charm._context == context
@@ -264,6 +642,176 @@ def test_custom_images_config_context_with_incorrect_config(harness):
         assert isinstance(err.status, BlockedStatus)
 
 
+def test_autoscaler_config_rendered(harness, mocked_lightkube_client):
+    """Asserts that the autoscaler config is rendered into the KnativeServing's spec.config."""
+    harness.update_config({"autoscaler": "{stable-window: 30s, target-burst-capacity: 400}"})
+    harness.begin()
+
+    rendered = [
+        resource
+        for resource in harness.charm.resource_handler.render_manifests()
+        if resource.kind == "KnativeServing"
+    ]
+    assert rendered[0].spec["config"]["autoscaler"] == {
+        "stable-window": "30s",
+        "target-burst-capacity": "400",
+    }
+
+
+def test_autoscaler_config_not_rendered_by_default(harness, mocked_lightkube_client):
+    harness.begin()
+
+    rendered = [
+        resource
+        for resource in harness.charm.resource_handler.render_manifests()
+        if resource.kind == "KnativeServing"
+    ]
+    assert "autoscaler" not in rendered[0].spec["config"]
+
+
+def test_autoscaling_profile_rendered(harness, mocked_lightkube_client):
+    """Asserts that explicit autoscaler keys override those of the autoscaling profile."""
+    harness.update_config(
+        {"autoscaling-profile": "latency", "autoscaler": "{stable-window: 45s, min-scale: 1}"}
+    )
+    harness.begin()
+
+    rendered = [
+        resource
+        for resource in harness.charm.resource_handler.render_manifests()
+        if resource.kind == "KnativeServing"
+    ]
+    config = rendered[0].spec["config"]
+    assert config["autoscaler"] == {
+        **AUTOSCALING_PROFILES["latency"].autoscaler,
+        "stable-window": "45s",
+        "min-scale": "1",
+    }
+    assert config["deployment"]["queue-sidecar-cpu-request"] == "100m"
+    assert config["deployment"]["progress-deadline"] == harness.model.config["progress-deadline"]
+
+
+def test_autoscaling_profile_unknown(harness):
+    harness.update_config({"autoscaling-profile": "fastest"})
+    harness.begin()
+
+    with pytest.raises(ErrorWithStatus) as err:
+        harness.charm._context
+    assert isinstance(err.value.status, BlockedStatus)
+
+
+@pytest.mark.parametrize("autoscaler_config", ["{", "stable-window: 1s", "unknown-key: 1"])
+def test_autoscaler_config_context_with_incorrect_config(autoscaler_config, harness):
+    """Asserts that the autoscaler context raises on invalid config input."""
+    harness.update_config({"autoscaler": autoscaler_config})
+    harness.begin()
+
+    with pytest.raises(ErrorWithStatus) as err:
+        harness.charm._context
+    assert isinstance(err.value.status, BlockedStatus)
+
+
+def test_high_availability_rendered(harness, mocked_lightkube_client):
+    """Asserts that the HA and per workload replicas are rendered into the KnativeServing."""
+    harness.update_config(
+        {
+            "high-availability-replicas": 2,
+            "workload-replicas": "{activator: 4}",
+            "workload-resources": "{activator: {requests: {cpu: 500m}, limits: {cpu: 2}}}",
+            "http-proxy": "my_http_proxy",
+        }
+    )
+    harness.begin()
+
+    rendered = [
+        resource
+        for resource in harness.charm.resource_handler.render_manifests()
+        if resource.kind == "KnativeServing"
+    ]
+    spec = rendered[0].spec
+    assert spec["high-availability"] == {"replicas": 2}
+    assert spec["workloads"] == [
+        {
+            "name": "activator",
+            "replicas": 4,
+            "resources": [
+                {"container": "activator", "requests": {"cpu": "500m"}, "limits": {"cpu": "2"}}
+            ],
+        },
+        {
+            "name": "controller",
+            "env": [
+                {
+                    "container": "controller",
+                    "envVars": [{"name": "HTTP_PROXY", "value": "my_http_proxy"}],
+                }
+            ],
+        },
+    ]
+
+
+def test_workloads_not_rendered_by_default(harness, mocked_lightkube_client):
+    harness.begin()
+
+    rendered = [
+        resource
+        for resource in harness.charm.resource_handler.render_manifests()
+        if resource.kind == "KnativeServing"
+    ]
+    assert rendered[0].spec["high-availability"] == {"replicas": 1}
+    assert "workloads" not in rendered[0].spec
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"high-availability-replicas": 0},
+        {"workload-replicas": "{"},
+        {"workload-replicas": "{ingress: 2}"},
+        {"workload-replicas": "{activator: 0}"},
+        {"workload-resources": "{activator: {requests: {cpu: lots}}}"},
+        {"workload-autoscaling": "{controller: {max-replicas: 5}}"},
+    ],
+)
+def test_high_availability_with_incorrect_config(config, harness):
+    harness.update_config(config)
+    harness.begin()
+
+    with pytest.raises(ErrorWithStatus) as err:
+        harness.charm._context
+    assert isinstance(err.value.status, BlockedStatus)
+
+
+def test_autoscalers_rendered(harness, mocked_lightkube_client):
+    harness.update_config(
+        {
+            "workload-autoscaling": (
+                "{activator: {min-replicas: 2, max-replicas: 40, target-cpu-utilization: 70},"
+                " webhook: {max-replicas: 5}}"
+            )
+        }
+    )
+    harness.begin()
+
+    hpas = harness.charm.autoscaling_resource_handler.render_manifests()
+
+    assert [(hpa.metadata.name, hpa.metadata.namespace) for hpa in hpas] == [
+        ("activator", SERVING_NAMESPACE),
+        ("webhook", SERVING_NAMESPACE),
+    ]
+    assert hpas[0].spec.scaleTargetRef.name == "activator"
+    assert (hpas[0].spec.minReplicas, hpas[0].spec.maxReplicas) == (2, 40)
+    assert hpas[0].spec.metrics[0].resource.target.averageUtilization == 70
+    assert (hpas[1].spec.minReplicas, hpas[1].spec.maxReplicas) == (1, 5)
+    assert hpas[1].spec.metrics[0].resource.target.averageUtilization == 100
+
+
+def test_autoscalers_not_rendered_by_default(harness, mocked_lightkube_client):
+    harness.begin()
+
+    assert harness.charm.autoscaling_resource_handler.render_manifests() == []
+
+
 @pytest.mark.parametrize(
     "image_config, context_raised",
     [
@@ -298,26 +846,68 @@ def test_queue_sidecar_image_config_context(image_config, context_raised, harnes
 
 
 @patch("charm.KRH")
-@patch("charm.delete_many")
+@patch("charm.delete_resources")
 def test_on_remove_success(
-    delete_many: MagicMock,
+    delete_resources: MagicMock,
     _: MagicMock,
     harness,
+    mocked_lightkube_client,
 ):
     harness.begin()
     harness.charm.on.remove.emit()
-    delete_many.assert_called()
+    delete_resources.assert_called()
     assert isinstance(harness.charm.model.unit.status, MaintenanceStatus)
 
 
 @patch("charm.KRH")
-@patch("charm.delete_many")
+@patch("charm.delete_resources")
 def test_on_remove_failure(
-    delete_many: MagicMock,
+    delete_resources: MagicMock,
     _: MagicMock,
     harness,
+    mocked_lightkube_client,
 ):
     harness.begin()
-    delete_many.side_effect = _FakeApiError()
+    delete_resources.side_effect = _FakeApiError()
     with pytest.raises(ApiError):
         harness.charm.on.remove.emit()
+
+
+@patch("charm.delete_resources")
+def test_on_remove_deletes_autoscalers(delete_resources, harness, mocked_lightkube_client):
+    harness.update_config({"workload-autoscaling": "{activator: {max-replicas: 40}}"})
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+    harness.charm.autoscaling_resource_handler.apply = MagicMock()
+    harness.charm.on.install.emit()
+
+    harness.charm.on.remove.emit()
+
+    deleted = [
+        (reference.kind, reference.name) for reference in delete_resources.call_args.args[1]
+    ]
+    assert ("KnativeServing", harness.charm.app.name) in deleted
+    assert ("HorizontalPodAutoscaler", "activator") in deleted
+
+
+@patch("charm.delete_resources")
+def test_on_remove_with_invalid_config(delete_resources, harness, mocked_lightkube_client):
+    """Removing the charm must not render, and so validate the config of, applied resources."""
+    harness.update_config({"workload-autoscaling": "{activator: {max-replicas: 40}}"})
+    harness.begin()
+    harness.charm.resource_handler.apply = MagicMock()
+    harness.charm.autoscaling_resource_handler.apply = MagicMock()
+    harness.charm.on.install.emit()
+    harness.update_config({"workload-replicas": "{activator: 0}"})
+    # The remove hook runs in a new charm instance, without resource handlers built yet
+    harness.charm._resource_handler = None
+    harness.charm._autoscaling_resource_handler = None
+
+    harness.charm.on.remove.emit()
+
+    deleted = [
+        (reference.kind, reference.name) for reference in delete_resources.call_args.args[1]
+    ]
+    assert ("KnativeServing", harness.charm.app.name) in deleted
+    assert ("HorizontalPodAutoscaler", "activator") in deleted
+    assert harness.charm.model.unit.status == MaintenanceStatus("K8s resources removed")
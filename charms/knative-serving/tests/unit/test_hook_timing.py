@@ -0,0 +1,91 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+import json
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from lightkube import Client
+from lightkube.config.kubeconfig import KubeConfig
+from lightkube.resources.core_v1 import ConfigMap
+from ops.charm import CharmBase
+from ops.testing import Harness
+
+from hook_timing import HookTimings
+
+
+@pytest.fixture()
+def harness():
+    harness = Harness(CharmBase, meta="name: test-charm")
+    harness.begin()
+    yield harness
+    harness.cleanup()
+
+
+@pytest.fixture()
+def hook_timings(harness):
+    yield HookTimings(harness.charm, "hook-timings", history=2)
+
+
+def _client(handler):
+    config = KubeConfig.from_dict(
+        {
+            "clusters": [{"name": "cluster", "cluster": {"server": "https://localhost:6443"}}],
+            "users": [{"name": "user", "user": {}}],
+            "contexts": [{"name": "context", "context": {"cluster": "cluster", "user": "user"}}],
+            "current-context": "context",
+        }
+    )
+    return Client(config=config, transport=httpx.MockTransport(handler))
+
+
+def test_phase_records_duration_and_api_calls(hook_timings):
+    client = hook_timings.count_api_calls(
+        _client(lambda _: httpx.Response(200, json=ConfigMap().to_dict()))
+    )
+
+    with hook_timings.phase("first"):
+        client.get(ConfigMap, "cm", namespace="ns")
+        client.get(ConfigMap, "cm", namespace="ns")
+    with hook_timings.phase("second"):
+        pass
+
+    assert hook_timings.api_calls == 2
+    assert [(p["phase"], p["api-calls"]) for p in hook_timings._phases] == [
+        ("first", 2),
+        ("second", 0),
+    ]
+
+
+def test_phase_is_recorded_when_it_raises(hook_timings):
+    with pytest.raises(ValueError):
+        with hook_timings.phase("failing"):
+            raise ValueError()
+
+    assert hook_timings._phases[0]["phase"] == "failing"
+
+
+def test_count_api_calls_ignores_unknown_clients(hook_timings):
+    client = MagicMock()
+
+    assert hook_timings.count_api_calls(client) is client
+
+
+@patch.dict("os.environ", {"JUJU_DISPATCH_PATH": "hooks/config-changed"})
+def test_commit_keeps_last_hooks(harness, hook_timings):
+    for phase in ["first", "second", "third"]:
+        hook_timings._phases = []
+        with hook_timings.phase(phase):
+            pass
+        harness.framework.commit()
+
+    hooks = hook_timings.hooks
+    assert [hook["phases"][0]["phase"] for hook in hooks] == ["second", "third"]
+    assert all(hook["hook"] == "config-changed" for hook in hooks)
+    assert json.loads(json.dumps(hooks)) == hooks
+
+
+def test_commit_skips_hooks_without_phases(harness, hook_timings):
+    harness.framework.commit()
+
+    assert hook_timings.hooks == []
@@ -0,0 +1,195 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+import json
+from unittest.mock import patch
+
+import pytest
+from lightkube.models.meta_v1 import ObjectMeta
+from lightkube.resources.autoscaling_v2 import HorizontalPodAutoscaler
+from lightkube.resources.core_v1 import ConfigMap
+from lightkube.resources.rbac_authorization_v1 import ClusterRole
+from ops.charm import CharmBase
+from ops.testing import Harness
+
+from reconcile_state import (
+    AppliedManifests,
+    ReconcileGeneration,
+    ResourceReference,
+    manifests_digest,
+)
+
+TEMPLATE = """apiVersion: v1
+kind: ConfigMap
+metadata:
+  name: {{ name }}
+"""
+
+
+@pytest.fixture()
+def template_file(tmp_path):
+    template_file = tmp_path / "configmap.yaml.j2"
+    template_file.write_text(TEMPLATE)
+    yield template_file
+
+
+@pytest.fixture()
+def applied_manifests():
+    harness = Harness(CharmBase, meta="name: test-charm")
+    harness.begin()
+    yield AppliedManifests(harness.charm, "applied-manifests", reapply_interval=60)
+    harness.cleanup()
+
+
+@pytest.fixture()
+def harness():
+    harness = Harness(CharmBase, meta="name: test-charm")
+    harness.begin()
+    yield harness
+    harness.cleanup()
+
+
+@pytest.fixture()
+def reconcile_generation(harness):
+    yield ReconcileGeneration(harness.charm, "reconcile-generation", reconcile_interval=60)
+
+
+def test_manifests_digest_changes_with_template_and_context(template_file):
+    context = {"name": "cm", "namespace": "ns"}
+    digest = manifests_digest([template_file], context)
+
+    assert digest == manifests_digest([template_file], dict(context))
+    assert digest != manifests_digest([template_file], {**context, "name": "other"})
+
+    template_file.write_text(TEMPLATE + "data: {}\n")
+    assert digest != manifests_digest([template_file], context)
+
+
+def test_applied_manifests_up_to_date(applied_manifests):
+    assert applied_manifests.is_up_to_date("digest") is False
+
+    applied_manifests.record("digest")
+
+    assert applied_manifests.is_up_to_date("digest") is True
+    assert applied_manifests.is_up_to_date("other-digest") is False
+
+
+def test_applied_manifests_forces_reapply_after_interval(applied_manifests):
+    with patch("reconcile_state.time.time", return_value=1000.0):
+        applied_manifests.record("digest")
+
+    with patch("reconcile_state.time.time", return_value=1059.0):
+        assert applied_manifests.is_up_to_date("digest") is True
+    with patch("reconcile_state.time.time", return_value=1060.0):
+        assert applied_manifests.is_up_to_date("digest") is False
+
+
+def test_applied_manifests_reset(applied_manifests):
+    applied_manifests.record("digest")
+
+    applied_manifests.reset()
+
+    assert applied_manifests.is_up_to_date("digest") is False
+
+
+def test_applied_manifests_inventory(applied_manifests):
+    config_map = ConfigMap(metadata=ObjectMeta(name="cm", namespace="ns"))
+    cluster_role = ClusterRole(metadata=ObjectMeta(name="cluster-role"))
+
+    applied_manifests.add_to_inventory([config_map])
+    applied_manifests.add_to_inventory([config_map, cluster_role])
+    applied_manifests.reset()
+
+    assert applied_manifests.inventory == [
+        ResourceReference("v1", "ConfigMap", "cm", "ns"),
+        ResourceReference("rbac.authorization.k8s.io/v1", "ClusterRole", "cluster-role", None),
+    ]
+
+
+def test_applied_manifests_stale_references(applied_manifests):
+    config_map = ConfigMap(metadata=ObjectMeta(name="cm", namespace="ns"))
+    cluster_role = ClusterRole(metadata=ObjectMeta(name="cluster-role"))
+    applied_manifests.add_to_inventory([config_map, cluster_role])
+
+    stale = applied_manifests.stale_references([config_map])
+    assert stale == [
+        ResourceReference("rbac.authorization.k8s.io/v1", "ClusterRole", "cluster-role", None)
+    ]
+
+    applied_manifests.remove_from_inventory(stale)
+    assert applied_manifests.inventory == [ResourceReference("v1", "ConfigMap", "cm", "ns")]
+
+
+def test_applied_manifests_new_api_version_is_not_stale(applied_manifests):
+    hpa = HorizontalPodAutoscaler.from_dict(
+        {
+            "metadata": {"name": "hpa", "namespace": "ns"},
+            "spec": {"maxReplicas": 2, "scaleTargetRef": {"kind": "Deployment", "name": "d"}},
+        }
+    )
+    applied_manifests.add_to_inventory([ConfigMap(metadata=ObjectMeta(name="cm", namespace="ns"))])
+    applied_manifests._stored.inventory = json.dumps(
+        applied_manifests.inventory
+        + [ResourceReference("autoscaling/v2beta2", "HorizontalPodAutoscaler", "hpa", "ns")]
+    )
+
+    applied_manifests.add_to_inventory([hpa])
+
+    assert applied_manifests.stale_references([hpa]) == [
+        ResourceReference("v1", "ConfigMap", "cm", "ns")
+    ]
+    assert applied_manifests.inventory == [
+        ResourceReference("v1", "ConfigMap", "cm", "ns"),
+        ResourceReference("autoscaling/v2", "HorizontalPodAutoscaler", "hpa", "ns"),
+    ]
+
+
+def test_applied_manifests_stale_deployed_references(applied_manifests):
+    config_map = ConfigMap(metadata=ObjectMeta(name="cm", namespace="ns"))
+    other_config_map = ConfigMap(metadata=ObjectMeta(name="other-cm", namespace="ns"))
+    applied_manifests.add_to_inventory([config_map])
+
+    # Objects applied before the inventory was lost are found among the deployed ones
+    stale = applied_manifests.stale_references([], deployed=[config_map, other_config_map])
+
+    assert stale == [
+        ResourceReference("v1", "ConfigMap", "cm", "ns"),
+        ResourceReference("v1", "ConfigMap", "other-cm", "ns"),
+    ]
+
+
+def test_reconcile_generation_coalesces_unchanged_state(reconcile_generation):
+    assert reconcile_generation.is_reconciled("fingerprint") is False
+
+    reconcile_generation.record("fingerprint")
+
+    assert reconcile_generation.is_reconciled("fingerprint") is True
+    assert reconcile_generation.generation == 1
+
+
+def test_reconcile_generation_bumped_by_new_fingerprint(reconcile_generation):
+    reconcile_generation.record("fingerprint")
+
+    assert reconcile_generation.is_reconciled("other-fingerprint") is False
+    assert reconcile_generation.generation == 2
+    # Going back to a previous desired state is a new generation as well
+    assert reconcile_generation.is_reconciled("fingerprint") is False
+    assert reconcile_generation.generation == 3
+
+
+def test_reconcile_generation_forces_reconcile_after_interval(reconcile_generation):
+    with patch("reconcile_state.time.time", return_value=1000.0):
+        reconcile_generation.record("fingerprint")
+
+    with patch("reconcile_state.time.time", return_value=1059.0):
+        assert reconcile_generation.is_reconciled("fingerprint") is True
+    with patch("reconcile_state.time.time", return_value=1060.0):
+        assert reconcile_generation.is_reconciled("fingerprint") is False
+
+
+def test_reconcile_generation_bumped_on_upgrade_charm(harness, reconcile_generation):
+    reconcile_generation.record("fingerprint")
+
+    harness.charm.on.upgrade_charm.emit()
+
+    assert reconcile_generation.is_reconciled("fingerprint") is False
+    assert reconcile_generation.generation == 2
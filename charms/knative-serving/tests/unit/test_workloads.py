@@ -0,0 +1,149 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+import pytest
+import yaml
+
+from workloads import (
+    parse_workload_autoscaling,
+    parse_workload_replicas,
+    parse_workload_resources,
+    workloads,
+)
+
+
+@pytest.mark.parametrize(
+    "workload_replicas, expected_replicas",
+    [
+        ("", {}),
+        ("{activator: 3, webhook: 2}", {"activator": 3, "webhook": 2}),
+        ('{"net-istio-controller": 2}', {"net-istio-controller": 2}),
+    ],
+)
+def test_parse_workload_replicas(workload_replicas, expected_replicas):
+    assert parse_workload_replicas(workload_replicas) == expected_replicas
+
+
+@pytest.mark.parametrize(
+    "workload_replicas",
+    ["- activator", "{ingress: 2}", "{activator: 0}", "{activator: two}", "{activator: true}"],
+)
+def test_parse_workload_replicas_invalid(workload_replicas):
+    with pytest.raises(ValueError):
+        parse_workload_replicas(workload_replicas)
+
+
+def test_parse_workload_replicas_invalid_yaml():
+    with pytest.raises(yaml.YAMLError):
+        parse_workload_replicas("{")
+
+
+@pytest.mark.parametrize(
+    "workload_resources, expected_resources",
+    [
+        ("", {}),
+        (
+            "{activator: {requests: {cpu: 500m, memory: 100Mi}, limits: {cpu: 2}}}",
+            {
+                "activator": {
+                    "requests": {"cpu": "500m", "memory": "100Mi"},
+                    "limits": {"cpu": "2"},
+                }
+            },
+        ),
+        (
+            '{"net-istio-webhook": {"limits": {"memory": "1Gi"}}}',
+            {"net-istio-webhook": {"limits": {"memory": "1Gi"}}},
+        ),
+    ],
+)
+def test_parse_workload_resources(workload_resources, expected_resources):
+    assert parse_workload_resources(workload_resources) == expected_resources
+
+
+@pytest.mark.parametrize(
+    "workload_resources",
+    [
+        "- activator",
+        "{ingress: {requests: {cpu: 1}}}",
+        "{activator: 1}",
+        "{activator: {claims: {cpu: 1}}}",
+        "{activator: {requests: {gpu: 1}}}",
+        "{activator: {requests: {cpu: lots}}}",
+        "{activator: {requests: {memory: 2Gi}, limits: {memory: 1Gi}}}",
+    ],
+)
+def test_parse_workload_resources_invalid(workload_resources):
+    with pytest.raises(ValueError):
+        parse_workload_resources(workload_resources)
+
+
+@pytest.mark.parametrize(
+    "workload_autoscaling, expected_autoscaling",
+    [
+        ("", {}),
+        (
+            "{activator: {min-replicas: 2, max-replicas: 40, target-cpu-utilization: 70}}",
+            {"activator": {"min-replicas": 2, "max-replicas": 40, "target-cpu-utilization": 70}},
+        ),
+        (
+            '{"webhook": {"max-replicas": 5}}',
+            {"webhook": {"min-replicas": 1, "max-replicas": 5, "target-cpu-utilization": 100}},
+        ),
+    ],
+)
+def test_parse_workload_autoscaling(workload_autoscaling, expected_autoscaling):
+    assert parse_workload_autoscaling(workload_autoscaling) == expected_autoscaling
+
+
+@pytest.mark.parametrize(
+    "workload_autoscaling",
+    [
+        "- activator",
+        "{controller: {max-replicas: 5}}",
+        "{activator: 5}",
+        "{activator: {min-replicas: 2}}",
+        "{activator: {max-replicas: 5, scale-down-delay: 60}}",
+        "{activator: {min-replicas: 6, max-replicas: 5}}",
+        "{activator: {max-replicas: 5, target-cpu-utilization: 0}}",
+    ],
+)
+def test_parse_workload_autoscaling_invalid(workload_autoscaling):
+    with pytest.raises(ValueError):
+        parse_workload_autoscaling(workload_autoscaling)
+
+
+def test_workloads():
+    assert workloads(
+        replicas={"webhook": 2, "controller": 3},
+        env={
+            "controller": {"controller": {"HTTP_PROXY": "proxy:3128", "NO_PROXY": ""}},
+            "activator": {"activator": {"HTTP_PROXY": ""}},
+        },
+        resources={
+            "controller": {"requests": {"cpu": "100m"}},
+            "net-istio-controller": {"limits": {"memory": "1Gi"}},
+            "webhook": {},
+        },
+    ) == [
+        {
+            "name": "controller",
+            "replicas": 3,
+            "env": [
+                {
+                    "container": "controller",
+                    "envVars": [{"name": "HTTP_PROXY", "value": "proxy:3128"}],
+                }
+            ],
+            "resources": [{"container": "controller", "requests": {"cpu": "100m"}}],
+        },
+        {
+            "name": "net-istio-controller",
+            "resources": [{"container": "controller", "limits": {"memory": "1Gi"}}],
+        },
+        {"name": "webhook", "replicas": 2},
+    ]
+
+
+def test_workloads_without_overrides():
+    assert workloads() == []
+    assert workloads(env={"controller": {"controller": {"HTTP_PROXY": ""}}}) == []